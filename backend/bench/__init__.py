@@ -0,0 +1 @@
+# Benchmarks for backend hot paths
@@ -0,0 +1,74 @@
+import argparse
+import json
+import statistics
+import time
+from typing import Dict, List, Any
+
+import httpx
+
+"""
+Bytes and time-to-first-byte of /audio responses, original vs compact variant.
+
+Run against a live backend with audio IDs taken from the cache directory:
+
+    python -m bench.audio_serving --base http://127.0.0.1:8000 <audio_id> [...]
+
+``original`` requests send ``Accept: */*`` (what clients received before
+compact variants existed); ``compact`` requests prefer ``audio/ogg``.
+"""
+
+VARIANTS = {
+    'original': '*/*',
+    'compact': 'audio/ogg, audio/wav;q=0.8, */*;q=0.5',
+}
+
+
+def measure(client: httpx.Client, url: str, accept: str) -> Dict[str, Any]:
+    """Fetch one URL and return its size, content type, TTFB and total time."""
+    started = time.perf_counter()
+    ttfb = None
+    size = 0
+    with client.stream('GET', url, headers={'Accept': accept, 'Cache-Control': 'no-cache'}) as r:
+        r.raise_for_status()
+        for chunk in r.iter_raw():
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+            size += len(chunk)
+        content_type = r.headers.get('content-type')
+    return {'bytes': size, 'content_type': content_type, 'ttfb': ttfb or 0.0, 'total': time.perf_counter() - started}
+
+
+def run(base: str, audio_ids: List[str], repeat: int) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    with httpx.Client(base_url=base) as client:
+        for name, accept in VARIANTS.items():
+            samples = [measure(client, f'/audio/{audio_id}', accept) for audio_id in audio_ids for _ in range(repeat)]
+            results[name] = {
+                'requests': len(samples),
+                'bytes_per_file': statistics.mean(s['bytes'] for s in samples),
+                'ttfb_ms_p50': statistics.median(s['ttfb'] for s in samples) * 1000,
+                'total_ms_p50': statistics.median(s['total'] for s in samples) * 1000,
+                'content_types': sorted({s['content_type'] for s in samples}),
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('audio_ids', nargs='+')
+    parser.add_argument('--base', default='http://127.0.0.1:8000')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='also write results to this file')
+    args = parser.parse_args()
+
+    results = run(args.base, args.audio_ids, args.repeat)
+    for name, r in results.items():
+        print(f"{name:>8}: {r['bytes_per_file']:>10.0f} B/file  ttfb p50 {r['ttfb_ms_p50']:.2f} ms  "
+              f"total p50 {r['total_ms_p50']:.2f} ms  {', '.join(r['content_types'])}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pubsub import UnixSocketBus  # noqa: E402
+
+"""
+Cross-worker delivery latency of the Unix socket bus.
+
+Starts ``--workers`` processes that join one bus, as uvicorn workers do.
+Worker 0 publishes timestamped messages; every other worker records how
+long each took to arrive (CLOCK_MONOTONIC is shared by all processes).
+Worker 1 starts first and becomes the hub, so the publisher is a peer and
+both the peer -> hub and peer -> hub -> peer paths are measured:
+
+    python -m bench.bus_latency --workers 4 --messages 2000
+"""
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else 0.0
+
+
+def worker(index: int, path: str, workers: int, messages: int, rate: float, joined, results) -> None:
+    async def main():
+        latencies: List[float] = []
+        done = asyncio.Event()
+
+        def handler(topic, message, key):
+            if topic == 'bench':
+                latencies.append(time.monotonic() - json.loads(message)['t'])
+            elif topic == 'done':
+                done.set()
+
+        bus = UnixSocketBus(path)
+        await bus.start(handler)
+        joined.put(index)
+        if index == 0:
+            while joined.qsize() < workers:
+                await asyncio.sleep(0.05)
+            await asyncio.sleep(0.2)
+            for n in range(messages):
+                bus.publish('bench', json.dumps({'n': n, 't': time.monotonic()}))
+                await asyncio.sleep(1.0 / rate)
+            await asyncio.sleep(0.2)
+            bus.publish('done', '{}')
+        else:
+            await asyncio.wait_for(done.wait(), timeout=messages / rate + 30)
+        results.put({'worker': index, 'role': bus.role, 'received': len(latencies), 'latencies': latencies})
+        await asyncio.sleep(0.2)
+        await bus.close()
+
+    asyncio.run(main())
+
+
+def run(workers: int, messages: int, rate: float) -> Dict[str, Any]:
+    path = os.path.join(tempfile.mkdtemp(), 'bench-bus.sock')
+    joined, results = multiprocessing.Queue(), multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=worker, args=(i, path, workers, messages, rate, joined, results))
+             for i in range(workers)]
+    # worker 1 becomes the hub; the others, publisher included, join as peers
+    procs[1].start()
+    time.sleep(0.3)
+    for p in procs[:1] + procs[2:]:
+        p.start()
+    reports = [results.get(timeout=messages / rate + 60) for _ in procs]
+    for p in procs:
+        p.join()
+    receivers = [r for r in reports if r['worker'] != 0]
+    latencies = [x for r in receivers for x in r['latencies']]
+    by_role = {}
+    for role in ('hub', 'peer'):
+        samples = [x for r in receivers if r['role'] == role for x in r['latencies']]
+        if samples:
+            by_role[role] = {'p50_us': _percentile(samples, 50) * 1e6, 'p99_us': _percentile(samples, 99) * 1e6}
+    return {
+        'workers': workers,
+        'messages': messages,
+        'delivered': sum(r['received'] for r in receivers),
+        'expected': messages * (workers - 1),
+        'latency_us_p50': _percentile(latencies, 50) * 1e6,
+        'latency_us_p99': _percentile(latencies, 99) * 1e6,
+        'latency_us_max': max(latencies, default=0.0) * 1e6,
+        'by_receiver_role': by_role,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Cross-worker bus latency benchmark')
+    parser.add_argument('--workers', type=int, default=4, help='at least 2')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=1000.0, help='messages per second')
+    args = parser.parse_args()
+    print(json.dumps(run(args.workers, args.messages, args.rate), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Any
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+"""
+Cold-start time of each model, from the hub versus from the model store.
+
+Every measurement runs in a fresh interpreter, so nothing is cached in
+memory; the hub and Hugging Face download caches on disk are left warm, as
+on a node that has started before. Import time of torch and the model code
+is reported separately from the load itself:
+
+    python -m model_store build        # once, to create the artifacts
+    python -m bench.cold_start --runs 3
+"""
+
+# Run in the child: import, then load one model, then report both durations
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import torch
+if sys.argv[1] == 'stt':
+    from pipeline.stt import load_stt_model as load
+else:
+    from load_model import load_emotion_model as load
+imported = time.perf_counter()
+load()
+print(json.dumps({'import_s': imported - started, 'load_s': time.perf_counter() - imported}))
+'''
+
+MODELS = ('stt', 'emotion')
+SOURCES = ('hub', 'artifacts')
+
+
+def measure(model: str, source: str) -> Dict[str, float]:
+    """Load one model in a new interpreter and return its timings.
+
+    Raises:
+        RuntimeError: If the child process fails
+    """
+    env = dict(os.environ, IHUB_MODEL_SOURCE=source)
+    proc = subprocess.run([sys.executable, '-c', CHILD, model], cwd=BACKEND, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'{model} from {source} failed: {proc.stderr.strip().splitlines()[-1:]}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int, models: List[str], sources: List[str]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for model in models:
+        for source in sources:
+            key = f'{model}.{source}'
+            try:
+                samples = [measure(model, source) for _ in range(runs)]
+            except RuntimeError as e:
+                results[key] = {'error': str(e)}
+                continue
+            results[key] = {
+                'load_s': round(statistics.median(s['load_s'] for s in samples), 3),
+                'import_s': round(statistics.median(s['import_s'] for s in samples), 3),
+                'runs': runs,
+            }
+        hub, local = results.get(f'{model}.hub', {}), results.get(f'{model}.artifacts', {})
+        if 'load_s' in hub and 'load_s' in local and local['load_s'] > 0:
+            results[f'{model}.speedup'] = round(hub['load_s'] / local['load_s'], 1)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Model cold-start benchmark')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--models', default=','.join(MODELS))
+    parser.add_argument('--sources', default=','.join(SOURCES))
+    args = parser.parse_args()
+    print(json.dumps(run(args.runs, args.models.split(','), args.sources.split(',')), indent=2))
+
+
+if __name__ == '__main__':
+    main()
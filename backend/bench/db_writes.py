@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+
+"""
+Insert throughput and commit latency of DatabaseManager under concurrent sessions.
+
+Each session is a thread inserting a user message and an AI response per
+turn, as ``Pipeline`` does. ``legacy`` replays the previous write path (shared
+connection, rollback journal, commit plus SELECT per insert) for comparison;
+``writer`` goes through the background writer with group commit:
+
+    python -m bench.db_writes --sessions 16 --turns 200
+"""
+
+TIMELINE = [{'time': 0.0, 'trigger': 'wave', 'expression': 'happy'},
+            {'time': 1.5, 'trigger': 'nod', 'expression': 'neutral'}]
+
+
+class LegacyWriter:
+    """The write path before the background writer, kept for comparison."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY AUTOINCREMENT, role TEXT NOT NULL, '
+                           'text TEXT, expression TEXT, created_at TEXT NOT NULL, audio_id TEXT)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS ai_responses (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                           'text TEXT NOT NULL, timeline TEXT, audio_id TEXT, created_at TEXT NOT NULL)')
+        self._conn.commit()
+        # the original had no lock; one is needed here to keep the threads from corrupting cursors
+        self._lock = threading.Lock()
+
+    def insert_message(self, role, text, audio_id=None, expression=None):
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute('INSERT INTO messages (role, text, audio_id, expression, created_at) VALUES (?, ?, ?, ?, ?)',
+                        (role, text, audio_id, expression, datetime.utcnow().isoformat() + 'Z'))
+            self._conn.commit()
+            cur.execute('SELECT * FROM messages WHERE id=?', (cur.lastrowid,))
+            return dict(cur.fetchone())
+
+    def insert_ai_response(self, text, timeline, audio_id=None):
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute('INSERT INTO ai_responses (text, timeline, audio_id, created_at) VALUES (?, ?, ?, ?)',
+                        (text, json.dumps(timeline), audio_id, datetime.utcnow().isoformat() + 'Z'))
+            self._conn.commit()
+            cur.execute('SELECT * FROM ai_responses WHERE id=?', (cur.lastrowid,))
+            return dict(cur.fetchone())
+
+    def close(self):
+        self._conn.close()
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+def run(mode: str, sessions: int, turns: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        store = LegacyWriter(path) if mode == 'legacy' else DatabaseManager(path)
+        latencies: List[float] = []
+        lock = threading.Lock()
+
+        def session(n: int) -> None:
+            local = []
+            for turn in range(turns):
+                started = time.perf_counter()
+                store.insert_message('user', f'session {n} turn {turn}', expression='neutral')
+                local.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                store.insert_ai_response(f'reply {n}/{turn}', TIMELINE, f'{n:04d}{turn:06d}')
+                local.append(time.perf_counter() - started)
+            with lock:
+                latencies.extend(local)
+
+        threads = [threading.Thread(target=session, args=(n,)) for n in range(sessions)]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+        result = {
+            'inserts': len(latencies),
+            'inserts_per_sec': len(latencies) / elapsed,
+            'latency_ms_p50': _percentile(latencies, 50) * 1000,
+            'latency_ms_p99': _percentile(latencies, 99) * 1000,
+        }
+        if mode == 'writer':
+            result['writer'] = store.write_stats()
+        store.close()
+        return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='SQLite insert benchmark')
+    parser.add_argument('--sessions', type=int, default=16)
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--mode', choices=['legacy', 'writer', 'both'], default='both')
+    args = parser.parse_args()
+    modes = ['legacy', 'writer'] if args.mode == 'both' else [args.mode]
+    print(json.dumps({mode: run(mode, args.sessions, args.turns) for mode in modes}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench.ws_load import load_wav  # noqa: E402
+from pipeline.longform import SAMPLE_RATE, plan_windows, word_error_rate  # noqa: E402
+
+"""
+Long-form STT against the single-pass baseline.
+
+For each recording, transcribes it in one forward pass and in overlapping
+windows with each worker count, and reports wall-clock time, speedup and
+the word error rate of the windowed transcript against the single-pass
+one. If ``<name>.txt`` sits next to ``<name>.wav`` both transcripts are
+also scored against it. Short clips can be joined into one long utterance
+with ``--concat``:
+
+    python -m bench.longform_stt --wav talk1.wav talk2.wav --workers 1,2,4
+    python -m bench.longform_stt --wav clips/*.wav --concat --window 6 --overlap 1
+
+Needs torch and the STT model (see ``model_store``).
+"""
+
+
+def _time(fn, repeats: int):
+    times, result = [], None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - started)
+    return statistics.median(times), result
+
+
+def _reference(path: str) -> str:
+    txt = os.path.splitext(path)[0] + '.txt'
+    if not os.path.exists(txt):
+        return ''
+    with open(txt) as f:
+        return f.read().strip()
+
+
+def run(recordings: List[Dict[str, Any]], workers: List[int], window: float, overlap: float,
+        repeats: int) -> Dict[str, Any]:
+    from pipeline.stt import STT
+
+    stt = STT(longform_seconds=0)
+    stt.transcribe_single(recordings[0]['audio'][:SAMPLE_RATE])  # warm up
+
+    report: Dict[str, Any] = {'window_seconds': window, 'overlap_seconds': overlap, 'recordings': []}
+    for rec in recordings:
+        audio = rec['audio']
+        single_s, baseline = _time(lambda: stt.transcribe_single(audio), repeats)
+        windows = plan_windows(audio, SAMPLE_RATE, window, overlap)
+        entry: Dict[str, Any] = {
+            'name': rec['name'],
+            'seconds': round(len(audio) / SAMPLE_RATE, 1),
+            'windows': len(windows),
+            'single_pass_s': round(single_s, 3),
+            'longform': {},
+        }
+        if rec['reference']:
+            entry['single_pass_wer'] = round(word_error_rate(rec['reference'], baseline), 4)
+        for n in workers:
+            with ThreadPoolExecutor(max_workers=n) as pool:
+                long_s, text = _time(lambda: stt.transcribe_long(audio, pool, window, overlap), repeats)
+            result = {
+                'seconds': round(long_s, 3),
+                'speedup': round(single_s / long_s, 2) if long_s else None,
+                'wer_vs_single_pass': round(word_error_rate(baseline, text), 4),
+            }
+            if rec['reference']:
+                result['wer'] = round(word_error_rate(rec['reference'], text), 4)
+            entry['longform'][str(n)] = result
+        report['recordings'].append(entry)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Long-form STT benchmark')
+    parser.add_argument('--wav', nargs='+', required=True, help='16-bit PCM recordings of speech')
+    parser.add_argument('--concat', action='store_true', help='join all recordings into one utterance')
+    parser.add_argument('--workers', default='1,2,4', help='comma-separated worker counts')
+    parser.add_argument('--window', type=float, default=8.0, help='target window seconds')
+    parser.add_argument('--overlap', type=float, default=1.0, help='overlap seconds')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    recordings = [{'name': os.path.basename(p), 'audio': load_wav(p), 'reference': _reference(p)}
+                  for p in args.wav]
+    if args.concat:
+        gap = np.zeros(int(0.3 * SAMPLE_RATE), dtype=np.float32)
+        audio = np.concatenate([part for r in recordings for part in (r['audio'], gap)])
+        references = [r['reference'] for r in recordings]
+        recordings = [{
+            'name': f'{len(recordings)} clips',
+            'audio': audio,
+            'reference': ' '.join(references) if all(references) else '',
+        }]
+    workers = [int(n) for n in args.workers.split(',')]
+    print(json.dumps(run(recordings, workers, args.window, args.overlap, args.repeats), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from metrics import Registry, FRAME_BUCKETS  # noqa: E402
+
+"""
+Cost of recording metrics on the per-frame audio path.
+
+Times what ``/ws-vad`` adds to every audio frame (two ``perf_counter``
+calls, a histogram observation and a counter increment) against an empty
+loop, plus each operation on its own:
+
+    python -m bench.metrics_overhead --iterations 1000000
+"""
+
+
+def _per_call_ns(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    fn(iterations)
+    return (time.perf_counter() - started) * 1e9 / iterations
+
+
+def run(iterations: int) -> Dict[str, Any]:
+    registry = Registry()
+    histogram = registry.histogram('bench_frame_seconds', 'bench', buckets=FRAME_BUCKETS)
+    counter = registry.counter('bench_frames', 'bench')
+    perf_counter = time.perf_counter
+
+    def baseline(n):
+        for _ in range(n):
+            pass
+
+    def frame(n):
+        for _ in range(n):
+            started = perf_counter()
+            histogram.observe(perf_counter() - started)
+            counter.inc()
+
+    def observe(n):
+        for _ in range(n):
+            histogram.observe(0.0003)
+
+    def inc(n):
+        for _ in range(n):
+            counter.inc()
+
+    base = _per_call_ns(baseline, iterations)
+    result = {name: _per_call_ns(fn, iterations) - base for name, fn in
+              (('frame_ns', frame), ('observe_ns', observe), ('inc_ns', inc))}
+    result['iterations'] = iterations
+    result['under_1us'] = result['frame_ns'] < 1000
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Per-frame metrics overhead benchmark')
+    parser.add_argument('--iterations', type=int, default=1000000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.iterations), indent=2))
+
+
+if __name__ == '__main__':
+    main()
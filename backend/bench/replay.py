@@ -0,0 +1,310 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from typing import Dict, List, Any
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recorder import read_recording, to_message, VIDEO  # noqa: E402
+from bench.ws_load import scrape, histogram_summary, _percentiles  # noqa: E402
+
+"""
+Replay recorded sessions against a server and report per-stage timings.
+
+Feeds recordings made with ``IHUB_RECORD`` (see ``recorder``) back to
+/ws-vad and /ws-video with their original timing, or ``--speed`` times
+faster. The VAD segments speech by frame count, so turns are cut at the
+same frames at any speed. Recordings given together start at their
+original relative times, so a client's audio and video play side by side.
+
+With ``--spawn`` the tool starts its own backend with the LLM and TTS
+replaced by the offline stand-ins at fixed latencies, a seeded fake LLM
+and empty caches, so runs of the same recording are comparable across
+builds:
+
+    python -m bench.replay recordings/*-abc123-*.ihrec --spawn --output run.json
+    python -m bench.replay recordings/*-abc123-*.ihrec --spawn --compare run.json
+
+Without ``--spawn`` it replays against ``--url``. The report has per-stage
+latencies from each reply's trace timings, time to first audio, video
+frame latency and, from ``/metrics``, the server's stage histograms.
+``--compare`` exits 1 if a stage's mean grew by more than ``--threshold``.
+"""
+
+# Stage mean changes smaller than this (seconds) are never regressions
+MIN_REGRESSION_SECONDS = 0.005
+
+
+class Replay:
+    """Events and timings observed while replaying."""
+
+    def __init__(self, drain: float):
+        self.drain = drain
+        self.stages: Dict[str, List[float]] = {}
+        self.first_audio: List[float] = []
+        self.turns = 0
+        self.rejected = 0
+        self.queued = 0
+        self.expected = 0
+        self.frame_latency: List[float] = []
+        self.frames_sent = 0
+        self.refused = 0
+
+    def settled(self) -> bool:
+        """Return whether every turn started so far has been answered or rejected."""
+        return self.turns + self.rejected >= self.expected
+
+
+async def replay_vad(ws_url: str, path: str, delay: float, speed: float, state: Replay) -> None:
+    import websockets
+
+    meta, messages = read_recording(path)
+    await asyncio.sleep(delay)
+    async with websockets.connect(f"{ws_url}{meta['endpoint']}", max_size=None) as ws:
+        async def receive():
+            async for message in ws:
+                try:
+                    payload = json.loads(message)
+                except ValueError:
+                    continue
+                event = payload.get('event')
+                if event == 'speech_started':
+                    state.expected += 1
+                elif event == 'queued':
+                    state.queued += 1
+                elif event == 'turn_rejected':
+                    state.rejected += 1
+                elif event == 'busy':
+                    state.refused += 1
+                elif event == 'ai_response':
+                    state.turns += 1
+                    for stage, seconds in (payload.get('timings') or {}).items():
+                        state.stages.setdefault(stage, []).append(seconds)
+                    if payload.get('time_to_first_audio') is not None:
+                        state.first_audio.append(payload['time_to_first_audio'])
+
+        receiver = asyncio.create_task(receive())
+        started = time.monotonic()
+        try:
+            for offset, kind, payload in messages:
+                await asyncio.sleep(max(0.0, started + offset / speed - time.monotonic()))
+                message = to_message(kind, payload)
+                if json.loads(message).get('type') == 'text':
+                    state.expected += 1
+                await ws.send(message)
+            # wait for the replies to turns still running when the recording ended
+            deadline = time.monotonic() + state.drain
+            while not state.settled() and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+        finally:
+            receiver.cancel()
+
+
+async def replay_video(ws_url: str, path: str, delay: float, speed: float, state: Replay) -> None:
+    import websockets
+
+    meta, messages = read_recording(path)
+    await asyncio.sleep(delay)
+    sent_at: deque = deque()
+    async with websockets.connect(f"{ws_url}{meta['endpoint']}", max_size=None) as ws:
+        async def receive():
+            async for message in ws:
+                try:
+                    payload = json.loads(message)
+                except ValueError:
+                    continue
+                if 'frames_received' in payload and 'status' in payload and sent_at:
+                    state.frame_latency.append(time.monotonic() - sent_at.popleft())
+
+        receiver = asyncio.create_task(receive())
+        started = time.monotonic()
+        try:
+            for offset, kind, payload in messages:
+                await asyncio.sleep(max(0.0, started + offset / speed - time.monotonic()))
+                if kind == VIDEO:
+                    sent_at.append(time.monotonic())
+                    state.frames_sent += 1
+                await ws.send(to_message(kind, payload))
+            await asyncio.sleep(1.0)
+        finally:
+            receiver.cancel()
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_backend(args) -> Dict[str, Any]:
+    """Start the TTS stand-in and a backend using it and the fake LLM.
+
+    Returns:
+        Dict with the backend 'url', the 'processes' and the temporary 'workdir'
+
+    Raises:
+        RuntimeError: If the backend does not come up
+    """
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix='ihub-replay-')
+    tts_port, port = _free_port(), _free_port()
+    env = dict(os.environ, IHUB_FAKE_TTS_LATENCY=args.tts_latency, IHUB_RECORD='off')
+    processes = [subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'tools.fake_indextts:app', '--port', str(tts_port), '--log-level', 'warning'],
+        cwd=backend, env=env)]
+    env.update({
+        'IHUB_LLM_BACKEND': 'fake',
+        'IHUB_FAKE_LLM_LATENCY': args.llm_latency,
+        'IHUB_FAKE_LLM_SEED': str(args.seed),
+        'IHUB_TTS_BASE': f'http://127.0.0.1:{tts_port}',
+        'IHUB_CACHE_DIR': os.path.join(workdir, 'cache'),
+        'IHUB_SQLITE_PATH': os.path.join(workdir, 'database.db'),
+    })
+    processes.append(subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=backend, env=env))
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if any(p.poll() is not None for p in processes):
+            break
+        try:
+            if httpx.get(url + '/', timeout=1).status_code < 500:
+                return {'url': url, 'processes': processes, 'workdir': workdir}
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    stop_backend({'processes': processes, 'workdir': workdir})
+    raise RuntimeError('Backend did not start')
+
+
+def stop_backend(spawned: Dict[str, Any]) -> None:
+    import shutil
+
+    for p in spawned['processes']:
+        p.terminate()
+    for p in spawned['processes']:
+        try:
+            p.wait(10)
+        except subprocess.TimeoutExpired:
+            p.kill()
+    shutil.rmtree(spawned['workdir'], ignore_errors=True)
+
+
+def _stage_summary(samples: List[float]) -> Dict[str, Any]:
+    summary = _percentiles(samples)
+    summary['mean'] = round(sum(samples) / len(samples) * 1000, 1) if samples else None
+    return summary
+
+
+async def run(args, url: str) -> Dict[str, Any]:
+    base = url.rstrip('/')
+    ws_url = 'ws' + base[4:] if base.startswith('http') else base
+    metas = [read_recording(path)[0] for path in args.recordings]
+    origin = min(meta['started'] for meta in metas)
+    state = Replay(args.drain)
+
+    async with httpx.AsyncClient(base_url=base, timeout=10) as http:
+        before = await scrape(http)
+        started = time.monotonic()
+        tasks = []
+        for path, meta in zip(args.recordings, metas):
+            delay = (meta['started'] - origin) / args.speed
+            replay = replay_video if meta['endpoint'] == '/ws-video' else replay_vad
+            tasks.append(asyncio.create_task(replay(ws_url, path, delay, args.speed, state)))
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+        after = await scrape(http)
+
+    report: Dict[str, Any] = {
+        'recordings': [os.path.basename(p) for p in args.recordings],
+        'speed': args.speed,
+        'seconds': round(elapsed, 1),
+        'turns': state.turns,
+        'turns_expected': state.expected,
+        'turns_queued': state.queued,
+        'turns_rejected': state.rejected,
+        'sessions_refused': state.refused,
+        'stages_ms': {stage: _stage_summary(samples) for stage, samples in sorted(state.stages.items())},
+        'time_to_first_audio_ms': _stage_summary(state.first_audio),
+    }
+    if state.frames_sent:
+        report['video'] = {'frames_sent': state.frames_sent, 'frame_latency_ms': _percentiles(state.frame_latency)}
+    if after:
+        stages = sorted({k[len('ihub_stage_seconds_count{stage="'):-2] for k in after
+                         if k.startswith('ihub_stage_seconds_count{')})
+        report['server'] = {
+            'loop_lag': histogram_summary(after, before, 'ihub_loop_lag_seconds'),
+            'stages': {s: histogram_summary(after, before, 'ihub_stage_seconds', f'stage="{s}"') for s in stages},
+        }
+    return report
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Compare stage means with an earlier report of the same recordings."""
+    rows = []
+    for stage, summary in current['stages_ms'].items():
+        old = previous.get('stages_ms', {}).get(stage, {}).get('mean')
+        new = summary.get('mean')
+        if old is None or new is None:
+            rows.append({'stage': stage, 'previous_ms': old, 'current_ms': new, 'status': 'new'})
+            continue
+        ratio = new / old if old else None
+        regressed = (ratio is not None and ratio > 1 + threshold
+                     and (new - old) / 1000 > MIN_REGRESSION_SECONDS)
+        rows.append({'stage': stage, 'previous_ms': old, 'current_ms': new,
+                     'ratio': round(ratio, 2) if ratio is not None else None,
+                     'status': 'regression' if regressed else 'ok'})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Replay recorded sessions and report stage timings')
+    parser.add_argument('recordings', nargs='+', help='.ihrec files to replay together')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--spawn', action='store_true', help='start a backend with stubbed LLM and TTS')
+    parser.add_argument('--speed', type=float, default=1.0, help='playback speed factor')
+    parser.add_argument('--drain', type=float, default=60.0, help='seconds to wait for replies after the last frame')
+    parser.add_argument('--llm-latency', default='fixed:0.8', help='fake LLM latency with --spawn')
+    parser.add_argument('--tts-latency', default='fixed:0.5', help='fake TTS latency with --spawn')
+    parser.add_argument('--seed', type=int, default=0, help='fake LLM seed with --spawn')
+    parser.add_argument('--startup-timeout', type=float, default=120.0)
+    parser.add_argument('--output', help='write the report here')
+    parser.add_argument('--compare', help='earlier report to compare stage means with')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args()
+    if args.speed <= 0:
+        parser.error('--speed must be positive')
+
+    spawned = spawn_backend(args) if args.spawn else None
+    try:
+        report = asyncio.run(run(args, spawned['url'] if spawned else args.url))
+    finally:
+        if spawned:
+            stop_backend(spawned)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            report['comparison'] = compare(report, json.load(f), args.threshold)
+        regressions = [row for row in report['comparison'] if row['status'] == 'regression']
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    if regressions:
+        print(f'{len(regressions)} stage(s) slower by more than {args.threshold:.0%}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
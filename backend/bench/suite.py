@@ -0,0 +1,443 @@
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+"""
+Microbenchmarks for the backend's hot paths, with regression tracking.
+
+Cases cover the per-frame work of /ws-vad, utterance assembly and STT,
+video frame decoding and emotion inference, DatabaseManager reads and
+writes at several table sizes, ConnectionManager fan-out and the audio
+cache lookup behind /audio. Cases whose dependencies (torch, the models)
+are unavailable are reported as skipped.
+
+Each case is timed in batches calibrated to ``--min-time``; the median of
+``--repeats`` batches is its time per operation. Results are written as
+JSON and compared with a stored baseline. A case slower than the baseline
+by more than ``--threshold`` is a regression and makes the run exit 1:
+
+    python -m bench.suite --output results.json          # compare with bench/baseline.json
+    python -m bench.suite --update-baseline              # record a new baseline
+    python -m bench.suite --filter vad,db --quick
+
+Baselines are only comparable on the same machine; record one per CI runner.
+"""
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Relative slowdown against the baseline that counts as a regression
+DEFAULT_THRESHOLD = 0.2
+
+SAMPLE_RATE = 16000
+
+# Samples in one chunk as sent by the frontend (60 ms at 16 kHz)
+FRAME_SAMPLES = 960
+
+UTTERANCE_SECONDS = (1, 5, 15)
+TABLE_SIZES = (1000, 10000, 100000)
+FANOUT_CLIENTS = (10, 100, 1000)
+CACHE_ENTRIES = (1000, 50000)
+
+TIMELINE = [{'time': 0.0, 'expressions': ['Smile.exp3'], 'triggers': ['happytrigger'], 'trigger_speed': 1.0},
+            {'time': 1.5, 'expressions': ['Normal.exp3'], 'triggers': ['headnodtrigger'], 'trigger_speed': 1.0}]
+
+
+class Skip(Exception):
+    """Raised by a case whose dependencies are unavailable."""
+
+
+# Each case is a generator yielding (variant, run); run(n) performs n operations
+Case = Callable[[argparse.Namespace], Iterator[Tuple[str, Callable[[int], Any]]]]
+CASES: List[Tuple[str, Case]] = []
+
+
+def case(name: str) -> Callable[[Case], Case]:
+    def register(factory: Case) -> Case:
+        CASES.append((name, factory))
+        return factory
+    return register
+
+
+def _audio_message(rng: np.random.Generator) -> str:
+    pcm = (rng.normal(0, 0.1, FRAME_SAMPLES).clip(-1, 1) * 32767).astype('<i2')
+    return json.dumps({'type': 'audio', 'sampleRate': SAMPLE_RATE, 'data': base64.b64encode(pcm.tobytes()).decode()})
+
+
+@case('vad')
+def vad_frame(args):
+    """The per-chunk work of websocket_vad, step by step and in total."""
+    msg = _audio_message(np.random.default_rng(0))
+    payload = json.loads(msg)
+    raw = base64.b64decode(payload['data'])
+    pcm = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def json_parse(n):
+        for _ in range(n):
+            json.loads(msg)
+
+    def b64decode(n):
+        data = payload['data']
+        for _ in range(n):
+            base64.b64decode(data)
+
+    def to_float32(n):
+        for _ in range(n):
+            np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+
+    def rms(n):
+        for _ in range(n):
+            np.sqrt(np.mean(pcm ** 2)) if pcm.size > 0 else 0.0
+
+    def frame(n):
+        for _ in range(n):
+            p = json.loads(msg)
+            samples = np.frombuffer(base64.b64decode(p.get('data')), dtype=np.int16).astype(np.float32) / 32768.0
+            np.sqrt(np.mean(samples ** 2)) if samples.size > 0 else 0.0
+
+    yield 'json_parse', json_parse
+    yield 'b64decode', b64decode
+    yield 'int16_to_float32', to_float32
+    yield 'rms', rms
+    yield 'frame_total', frame
+
+
+@case('stt')
+def stt(args):
+    """Joining an utterance's chunks, then transcribing it."""
+    rng = np.random.default_rng(0)
+    utterances = {}
+    for seconds in UTTERANCE_SECONDS:
+        frames = [rng.normal(0, 0.1, FRAME_SAMPLES).astype(np.float32)
+                  for _ in range(int(seconds * SAMPLE_RATE / FRAME_SAMPLES))]
+        utterances[seconds] = frames
+
+        def concatenate(n, frames=frames):
+            for _ in range(n):
+                np.concatenate(frames)
+        yield f'concatenate_{seconds}s', concatenate
+
+    try:
+        from pipeline.stt import STT
+        model = STT()
+    except Exception as e:
+        raise Skip(f'STT unavailable: {e}')
+    for seconds, frames in utterances.items():
+        audio = np.concatenate(frames)
+
+        def transcribe(n, audio=audio):
+            for _ in range(n):
+                model.transcribe(audio)
+        yield f'transcribe_{seconds}s', transcribe
+
+
+def _jpeg(width: int = 640, height: int = 480) -> str:
+    from PIL import Image
+
+    y, x = np.mgrid[0:height, 0:width]
+    image = Image.fromarray(np.stack([x % 256, y % 256, (x + y) % 256], axis=-1).astype(np.uint8))
+    buf = io.BytesIO()
+    image.save(buf, format='JPEG', quality=70)
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+@case('emotion')
+def emotion(args):
+    """Decoding a /ws-video frame, the processor's preprocessing and model inference."""
+    try:
+        from PIL import Image
+    except ImportError as e:
+        raise Skip(f'Pillow unavailable: {e}')
+    data = _jpeg()
+
+    def decode(n):
+        for _ in range(n):
+            Image.open(io.BytesIO(base64.b64decode(data))).convert('RGB')
+    yield 'decode_frame', decode
+
+    try:
+        import torch
+        from load_model import load_emotion_model, detect_emotion
+        model, processor = load_emotion_model()
+    except Exception as e:
+        raise Skip(f'emotion model unavailable: {e}')
+    image = Image.open(io.BytesIO(base64.b64decode(data))).convert('RGB')
+    inputs = processor(images=image, return_tensors='pt')
+
+    def preprocess(n):
+        for _ in range(n):
+            processor(images=image, return_tensors='pt')
+
+    def inference(n):
+        with torch.no_grad():
+            for _ in range(n):
+                model(**inputs)
+
+    def detect(n):
+        for _ in range(n):
+            detect_emotion(image, model, processor)
+
+    yield 'preprocess', preprocess
+    yield 'inference', inference
+    yield 'detect_emotion', detect
+
+
+def _fill(db, rows: int) -> None:
+    """Bulk-insert ``rows`` messages and AI responses through the writer."""
+    from timeline_codec import encode_timeline
+
+    stamp = datetime.now(timezone.utc).isoformat()
+    timeline = encode_timeline(TIMELINE)
+
+    def job(conn):
+        conn.executemany(
+            'INSERT INTO messages (role, text, expression, created_at) VALUES (?, ?, ?, ?)',
+            (('user', f'message number {i} about the weather', 'happy', stamp) for i in range(rows))
+        )
+        conn.executemany(
+            'INSERT INTO ai_responses (text, timeline, audio_id, created_at) VALUES (?, ?, ?, ?)',
+            ((f'reply number {i} with some words', timeline, f'{i:032x}', stamp) for i in range(rows))
+        )
+    db.submit_write(job).result()
+
+
+@case('db')
+def database(args):
+    """DatabaseManager writes and the recent-responses read at several table sizes."""
+    from database import DatabaseManager
+
+    sizes = TABLE_SIZES[:2] if args.quick else TABLE_SIZES
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db = DatabaseManager(os.path.join(tmp, 'bench.db'))
+            try:
+                _fill(db, size)
+
+                def insert_message(n):
+                    for i in range(n):
+                        db.insert_message('user', f'benchmark message {i}', expression='neutral')
+
+                def insert_ai_response(n):
+                    for i in range(n):
+                        db.insert_ai_response(f'benchmark reply {i}', TIMELINE, f'{i:032x}')
+
+                def get_ai_responses(n):
+                    for _ in range(n):
+                        for row in db.get_ai_responses(50):
+                            row['timeline']
+
+                yield f'insert_message_{size}', insert_message
+                yield f'insert_ai_response_{size}', insert_ai_response
+                yield f'get_ai_responses_{size}', get_ai_responses
+            finally:
+                db.close()
+
+
+class _Socket:
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+@case('broadcast')
+def broadcast(args):
+    """One broadcast, from publish until every client's writer has sent it."""
+    from connections import ConnectionManager
+
+    loop = asyncio.new_event_loop()
+    try:
+        for clients in FANOUT_CLIENTS:
+            manager = ConnectionManager()
+
+            async def setup(manager=manager, clients=clients):
+                for _ in range(clients):
+                    manager.register(_Socket())
+            loop.run_until_complete(setup())
+
+            async def fanout(n, manager=manager):
+                for i in range(n):
+                    manager.publish({'event': 'speech_started', 'n': i})
+                    while any(c.queue for c in manager.clients.values()):
+                        await asyncio.sleep(0)
+
+            yield f'fanout_{clients}', lambda n, fanout=fanout: loop.run_until_complete(fanout(n))
+
+            async def teardown(manager=manager):
+                tasks = [c.task for c in manager.clients.values()]
+                for ws in list(manager.clients):
+                    manager.disconnect(ws)
+                await asyncio.gather(*tasks, return_exceptions=True)
+            loop.run_until_complete(teardown())
+    finally:
+        loop.close()
+
+
+@case('audio')
+def audio_lookup(args):
+    """The cache lookup and stat /audio performs, in a directory with many entries."""
+    from cache_manager import CacheManager
+
+    for entries in CACHE_ENTRIES:
+        with tempfile.TemporaryDirectory() as tmp:
+            ids = [f'{i:032x}' for i in range(entries)]
+            for eid in ids:
+                open(os.path.join(tmp, eid + '.wav'), 'wb').close()
+            cache = CacheManager(tmp)
+            cache.scan()
+            probe = ids[::max(1, entries // 1000)]
+
+            def lookup(n, cache=cache, probe=probe):
+                for i in range(n):
+                    path = cache.lookup(probe[i % len(probe)])
+                    os.stat(path)
+
+            def miss(n, cache=cache):
+                for _ in range(n):
+                    cache.lookup('f' * 32)
+
+            yield f'lookup_{entries}', lookup
+            yield f'miss_{entries}', miss
+
+
+def measure(run: Callable[[int], Any], min_time: float, repeats: int) -> Dict[str, Any]:
+    """Time ``run`` in batches of at least ``min_time`` seconds; return ns per operation."""
+    n = 1
+    while True:
+        started = time.perf_counter()
+        run(n)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or n >= 1 << 24:
+            break
+        n = max(n * 2, int(n * min_time / max(elapsed, 1e-9) * 1.2))
+    samples = [elapsed / n]
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        run(n)
+        samples.append((time.perf_counter() - started) / n)
+    return {
+        'ns_per_op': statistics.median(samples) * 1e9,
+        'min_ns_per_op': min(samples) * 1e9,
+        'ops_per_batch': n,
+        'repeats': len(samples),
+    }
+
+
+def _metadata() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+    }
+
+
+def run_suite(args) -> Dict[str, Any]:
+    """Run every selected case and return the results document."""
+    selected = [s.strip() for s in args.filter.split(',')] if args.filter else None
+    results: Dict[str, Any] = {}
+    for name, factory in CASES:
+        if selected and not any(name.startswith(s) for s in selected):
+            continue
+        try:
+            for variant, run in factory(args):
+                key = f'{name}.{variant}'
+                results[key] = measure(run, args.min_time, args.repeats)
+                print(f"{key:<40} {results[key]['ns_per_op'] / 1000:>12.2f} us", file=sys.stderr)
+        except Skip as e:
+            results[f'{name}.*'] = {'skipped': str(e)}
+            print(f'{name + ".*":<40} skipped: {e}', file=sys.stderr)
+    return {'meta': _metadata(), 'results': results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """Compare results with a baseline.
+
+    Returns:
+        One row per case with the baseline and current time per operation,
+        their ratio and a status: ok, regression, improved or new
+    """
+    rows = []
+    for key, result in current['results'].items():
+        if 'skipped' in result:
+            continue
+        base = baseline.get('results', {}).get(key)
+        if not base or 'ns_per_op' not in base:
+            rows.append({'case': key, 'baseline_ns': None, 'current_ns': result['ns_per_op'],
+                         'ratio': None, 'status': 'new'})
+            continue
+        ratio = result['ns_per_op'] / base['ns_per_op']
+        status = 'regression' if ratio > 1 + threshold else 'improved' if ratio < 1 - threshold else 'ok'
+        rows.append({'case': key, 'baseline_ns': base['ns_per_op'], 'current_ns': result['ns_per_op'],
+                     'ratio': ratio, 'status': status})
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Backend microbenchmark suite')
+    parser.add_argument('--filter', help='comma-separated case prefixes, e.g. vad,db')
+    parser.add_argument('--output', default='bench-results.json', help='where to write the results')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline to compare with')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='relative slowdown counted as a regression (0.2 = 20%%)')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per timed batch')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='skip the largest table size')
+    args = parser.parse_args()
+
+    current = run_suite(args)
+    baseline: Optional[Dict[str, Any]] = None
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        current['comparison'] = {'baseline': args.baseline, 'threshold': args.threshold,
+                                 'cases': compare(current, baseline, args.threshold)}
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+        print(f'Baseline written to {args.baseline}', file=sys.stderr)
+        return
+    if baseline is None:
+        print(f'No baseline at {args.baseline}; results written to {args.output}', file=sys.stderr)
+        return
+
+    regressions = [row for row in current['comparison']['cases'] if row['status'] == 'regression']
+    for row in current['comparison']['cases']:
+        ratio = f"{row['ratio']:.2f}x" if row['ratio'] is not None else '-'
+        print(f"{row['case']:<40} {ratio:>8}  {row['status']}")
+    if regressions:
+        print(f'{len(regressions)} regression(s) beyond {args.threshold:.0%}', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import Dict, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import ai_response_dict  # noqa: E402
+from timeline_codec import NAMES, encode_timeline, decode_timeline  # noqa: E402
+
+"""
+Storage size and read time of ai_responses timelines, JSON vs compact encoding.
+
+Fills two databases with the same generated responses, one storing
+``json.dumps(timeline)`` as before and one storing ``encode_timeline``, then
+compares file size and the time to list rows with and without touching the
+timeline:
+
+    python -m bench.timeline_storage --rows 50000
+"""
+
+TRIGGERS = [n for n in NAMES if n.endswith('trigger')]
+EXPRESSIONS = [n for n in NAMES if n.endswith('.exp3')]
+
+
+def make_timeline(rng: random.Random) -> List[Dict[str, Any]]:
+    """Generate a timeline shaped like Gemini's structured output."""
+    events, t = [], 0.0
+    for _ in range(rng.randint(2, 6)):
+        events.append({
+            'time': round(t, 3),
+            'expressions': rng.sample(EXPRESSIONS, rng.randint(1, 2)),
+            'triggers': rng.sample(TRIGGERS, rng.randint(0, 2)),
+            'trigger_speed': round(rng.uniform(0.5, 1.5), 2),
+        })
+        t += rng.uniform(1.0, 3.0)
+    return events
+
+
+def fill(path: str, rows: int, encode) -> None:
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE ai_responses (id INTEGER PRIMARY KEY AUTOINCREMENT, text TEXT NOT NULL, '
+                 'timeline TEXT, audio_id TEXT, created_at TEXT NOT NULL)')
+    conn.executemany(
+        'INSERT INTO ai_responses (text, timeline, audio_id, created_at) VALUES (?, ?, ?, ?)',
+        ((f'reply {i}', encode(make_timeline(rng)), f'{i:032x}', f'2026-01-01T00:00:{i:09d}Z') for i in range(rows))
+    )
+    conn.commit()
+    conn.execute('VACUUM')
+    conn.close()
+
+
+def read_time(path: str, limit: int, decode_rows, touch_timeline: bool, repeat: int = 5) -> float:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = decode_rows(conn.execute('SELECT * FROM ai_responses ORDER BY id DESC LIMIT ?', (limit,)).fetchall())
+        if touch_timeline:
+            for row in rows:
+                row['timeline']
+        else:
+            for row in rows:
+                row['text']
+        best = min(best, time.perf_counter() - started)
+    conn.close()
+    return best * 1000
+
+
+def json_rows(rows):
+    """The previous get_ai_responses: parse every timeline up front."""
+    result = []
+    for row in rows:
+        d = dict(row)
+        d['timeline'] = json.loads(d['timeline']) if d['timeline'] else None
+        result.append(d)
+    return result
+
+
+def text_rows(rows):
+    """Feed items without include_timeline: timelines are not decoded."""
+    return [dict(row) for row in rows]
+
+
+def compact_rows(rows):
+    """Rows with their timelines decoded, as get_ai_responses returns them."""
+    return [ai_response_dict(row) for row in rows]
+
+
+def run(rows: int, limit: int) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy, compact = os.path.join(tmp, 'json.db'), os.path.join(tmp, 'compact.db')
+        fill(legacy, rows, json.dumps)
+        fill(compact, rows, encode_timeline)
+
+        sample = make_timeline(random.Random(7))
+        assert decode_timeline(encode_timeline(sample)) == sample
+        return {
+            'rows': rows,
+            'file_bytes': {'json': os.path.getsize(legacy), 'compact': os.path.getsize(compact)},
+            'timeline_bytes_sample': {'json': len(json.dumps(sample)), 'compact': len(encode_timeline(sample))},
+            f'list_{limit}_text_only_ms': {
+                'json': read_time(legacy, limit, json_rows, False),
+                'compact': read_time(compact, limit, text_rows, False),
+            },
+            f'list_{limit}_with_timeline_ms': {
+                'json': read_time(legacy, limit, json_rows, True),
+                'compact': read_time(compact, limit, compact_rows, True),
+            },
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Timeline storage benchmark')
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--limit', type=int, default=1000)
+    args = parser.parse_args()
+    print(json.dumps(run(args.rows, args.limit), indent=2))
+
+
+if __name__ == '__main__':
+    main()
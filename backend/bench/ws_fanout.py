@@ -0,0 +1,121 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connections import ConnectionManager  # noqa: E402
+
+"""
+Broadcast fan-out latency with many simulated /ws clients.
+
+Clients are in-memory sockets. Most of them receive immediately; a few are
+slow (each send takes ``--slow-delay`` seconds). Every broadcast is timed
+from the call to delivery at each fast client. ``legacy`` replays the
+previous sequential ``await send_text`` loop for comparison:
+
+    python -m bench.ws_fanout --clients 1000 --slow 10 --messages 20
+"""
+
+
+class FakeSocket:
+    """Minimal WebSocket stand-in recording when each message arrived."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.received: List[float] = []
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(time.perf_counter())
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+class LegacyManager:
+    """The broadcast loop before per-client queues."""
+
+    def __init__(self):
+        self.active = []
+
+    async def connect(self, websocket):
+        await websocket.accept()
+        self.active.append(websocket)
+
+    async def broadcast(self, message: str):
+        for connection in list(self.active):
+            try:
+                await connection.send_text(message)
+            except Exception:
+                pass
+
+
+def _percentile(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else 0.0
+
+
+async def run(mode: str, clients: int, slow: int, messages: int, slow_delay: float) -> Dict[str, Any]:
+    manager = LegacyManager() if mode == 'legacy' else ConnectionManager(queue_size=8)
+    fast = [FakeSocket() for _ in range(clients - slow)]
+    # slow clients join first so they sit in front of the legacy loop
+    for ws in [FakeSocket(slow_delay) for _ in range(slow)] + fast:
+        await manager.connect(ws)
+
+    sent_at, call_times = [], []
+    for n in range(messages):
+        message = json.dumps({'event': 'speech_started', 'n': n})
+        started = time.perf_counter()
+        if mode == 'legacy':
+            await manager.broadcast(message)
+        else:
+            await manager.broadcast(message, key='speech_started')
+        call_times.append(time.perf_counter() - started)
+        sent_at.append(started)
+        await asyncio.sleep(0.01)
+    # let the fast clients' writers drain
+    deadline = time.perf_counter() + 30
+    while any(len(ws.received) < messages for ws in fast) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+    latencies = [ws.received[i] - sent_at[i] for ws in fast for i in range(min(messages, len(ws.received)))]
+    result = {
+        'clients': clients,
+        'slow_clients': slow,
+        'broadcast_call_ms_p50': _percentile(call_times, 50) * 1000,
+        'broadcast_call_ms_max': max(call_times) * 1000,
+        'fast_delivery_ms_p50': _percentile(latencies, 50) * 1000,
+        'fast_delivery_ms_p99': _percentile(latencies, 99) * 1000,
+        'fast_delivery_ms_max': max(latencies) * 1000,
+    }
+    if mode == 'queued':
+        result['manager'] = manager.stats()
+        for ws in list(manager.clients):
+            manager.disconnect(ws)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='WebSocket fan-out benchmark')
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--slow', type=int, default=10)
+    parser.add_argument('--messages', type=int, default=20)
+    parser.add_argument('--slow-delay', type=float, default=0.05)
+    parser.add_argument('--mode', choices=['legacy', 'queued', 'both'], default='both')
+    args = parser.parse_args()
+    modes = ['legacy', 'queued'] if args.mode == 'both' else [args.mode]
+    results = {m: asyncio.run(run(m, args.clients, args.slow, args.messages, args.slow_delay)) for m in modes}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,394 @@
+import argparse
+import asyncio
+import base64
+import io
+import json
+import random
+import time
+import wave
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
+
+import httpx
+import numpy as np
+
+"""
+End-to-end load generator for /ws-vad and /ws-video.
+
+Drives ``--clients`` simulated users against a running backend. Each user
+streams 60 ms PCM chunks over /ws-vad in real time, as the frontend does:
+a burst of speech (synthetic voiced audio, or ``--wav`` recordings), then
+silence until the reply arrives, then a pause. With ``--video-fps`` it also
+sends JPEG frames over /ws-video.
+
+Run the backend against the offline stand-ins so no external service is
+called, choosing their latency distributions (see ``tools.latency``):
+
+    IHUB_FAKE_TTS_LATENCY=lognormal:1.2,0.4 uvicorn tools.fake_indextts:app --port 7860
+    IHUB_LLM_BACKEND=fake IHUB_FAKE_LLM_LATENCY=lognormal:0.8,0.4 \\
+        IHUB_TTS_BASE=http://127.0.0.1:7860 uvicorn main:app --port 8000
+    python -m bench.ws_load --url http://127.0.0.1:8000 --clients 20 --turns 5
+
+Reports turn latency and time to first audio (both from the moment the
+server's VAD sees the end of speech), video frame throughput and latency,
+and from ``/metrics``: event-loop lag, per-stage server time and resident
+memory per session.
+"""
+
+SAMPLE_RATE = 16000
+
+# Chunk length the frontend sends
+CHUNK_SECONDS = 0.06
+
+# Consecutive quiet chunks after which /ws-vad ends the utterance (its SILENCE_THRESHOLD)
+SILENCE_CHUNKS = 8
+
+
+def _percentiles(samples: List[float], scale: float = 1000.0) -> Dict[str, Optional[float]]:
+    ordered = sorted(samples)
+    if not ordered:
+        return {'count': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None}
+
+    def pick(p):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * scale, 1)
+    return {'count': len(ordered), 'p50': pick(50), 'p90': pick(90), 'p99': pick(99),
+            'max': round(ordered[-1] * scale, 1)}
+
+
+def _encode(samples: np.ndarray) -> str:
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    return base64.b64encode(pcm.tobytes()).decode('ascii')
+
+
+def synthetic_speech(seconds: float, rng: np.random.Generator) -> np.ndarray:
+    """Voiced audio: harmonics of a gliding pitch under a syllable-rate envelope."""
+    n = int(seconds * SAMPLE_RATE)
+    t = np.arange(n) / SAMPLE_RATE
+    f0 = rng.uniform(100, 220) * (1 + 0.1 * np.sin(2 * np.pi * 0.7 * t))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voice = sum(np.sin(k * phase) / k for k in range(1, 6))
+    # syllables at ~4 Hz that never fall silent long enough to end the utterance
+    envelope = 0.55 + 0.45 * np.abs(np.sin(2 * np.pi * rng.uniform(3, 5) * t))
+    return (0.15 * voice * envelope + rng.normal(0, 0.003, n)).astype(np.float32)
+
+
+def silence(seconds: float, rng: np.random.Generator) -> np.ndarray:
+    """Room noise well under the VAD's RMS threshold."""
+    return rng.normal(0, 0.002, int(seconds * SAMPLE_RATE)).astype(np.float32)
+
+
+def load_wav(path: str) -> np.ndarray:
+    """Read a PCM WAV as mono float samples at 16 kHz."""
+    with wave.open(path, 'rb') as w:
+        if w.getsampwidth() != 2:
+            raise ValueError(f'{path}: only 16-bit PCM is supported')
+        rate, channels = w.getframerate(), w.getnchannels()
+        data = np.frombuffer(w.readframes(w.getnframes()), dtype='<i2').astype(np.float32) / 32768.0
+    data = data.reshape(-1, channels)[:, 0]
+    if rate != SAMPLE_RATE:
+        positions = np.arange(0, len(data), rate / SAMPLE_RATE)
+        data = np.interp(positions, np.arange(len(data)), data).astype(np.float32)
+    return data
+
+
+def jpeg_frames(count: int, size: Tuple[int, int], quality: int = 70) -> List[str]:
+    """Base64 JPEGs of moving gradients, like a webcam picture at the frontend's quality."""
+    from PIL import Image
+
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    frames = []
+    for i in range(count):
+        r = (x + 8 * i) % 256
+        g = (y + 5 * i) % 256
+        b = ((x + y) // 2 + 3 * i) % 256
+        image = Image.fromarray(np.stack([r, g, b], axis=-1).astype(np.uint8))
+        buf = io.BytesIO()
+        image.save(buf, format='JPEG', quality=quality)
+        frames.append(base64.b64encode(buf.getvalue()).decode('ascii'))
+    return frames
+
+
+def parse_metrics(text: str) -> Dict[str, float]:
+    """Parse Prometheus text into {'name{labels}': value}."""
+    values = {}
+    for line in text.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        key, _, value = line.rpartition(' ')
+        try:
+            values[key] = float(value)
+        except ValueError:
+            continue
+    return values
+
+
+def _delta(after: Dict[str, float], before: Dict[str, float], key: str) -> float:
+    return after.get(key, 0.0) - before.get(key, 0.0)
+
+
+def histogram_summary(after: Dict[str, float], before: Dict[str, float], name: str,
+                      labels: str = '') -> Dict[str, Optional[float]]:
+    """Mean and approximate p99 (bucket upper bound) of a histogram over the run, in ms."""
+    count = _delta(after, before, f'{name}_count{{{labels}}}' if labels else f'{name}_count')
+    total = _delta(after, before, f'{name}_sum{{{labels}}}' if labels else f'{name}_sum')
+    if count <= 0:
+        return {'count': 0, 'mean_ms': None, 'p99_ms_le': None}
+    prefix = f'{name}_bucket{{' + (labels + ',' if labels else '') + 'le="'
+    buckets = []
+    for key in after:
+        if key.startswith(prefix):
+            bound = key[len(prefix):-2]
+            buckets.append((float('inf') if bound == '+Inf' else float(bound), _delta(after, before, key)))
+    p99 = None
+    for bound, cumulative in sorted(buckets):
+        if cumulative >= 0.99 * count:
+            p99 = bound * 1000
+            break
+    return {'count': int(count), 'mean_ms': round(total / count * 1000, 2), 'p99_ms_le': p99}
+
+
+class Results:
+    """Measurements collected by all simulated clients."""
+
+    def __init__(self):
+        self.turns: List[float] = []
+        self.first_audio: List[float] = []
+        self.failed_turns = 0
+        self.rejected_turns = 0
+        self.queued_turns = 0
+        self.refused_sessions = 0
+        self.frames_sent = 0
+        self.frames_processed = 0
+        self.frame_latency: List[float] = []
+        self.connect_errors = 0
+        self.disconnects = 0
+
+
+async def vad_client(ws_url: str, index: int, args, results: Results, speech_clips: List[np.ndarray],
+                     connected: asyncio.Event, counter: List[int]) -> None:
+    import websockets
+
+    rng = np.random.default_rng(args.seed + index)
+    py_rng = random.Random(args.seed + index)
+    chunk = int(CHUNK_SECONDS * SAMPLE_RATE)
+    try:
+        ws = await websockets.connect(f'{ws_url}/ws-vad', max_size=None)
+    except Exception:
+        results.connect_errors += 1
+        counter[0] += 1
+        if counter[0] == args.clients:
+            connected.set()
+        return
+    counter[0] += 1
+    if counter[0] == args.clients:
+        connected.set()
+
+    reply = asyncio.Event()
+    turn = {'ended_at': None, 'first_audio': None, 'queued': False}
+
+    async def receive():
+        async for message in ws:
+            try:
+                event = json.loads(message).get('event')
+            except ValueError:
+                continue
+            if event == 'busy':
+                # refused by the turn scheduler; the server closes the session next
+                results.refused_sessions += 1
+                continue
+            if turn['ended_at'] is None:
+                continue
+            if event == 'queued' and not turn['queued']:
+                turn['queued'] = True
+                results.queued_turns += 1
+            elif event == 'turn_rejected':
+                results.rejected_turns += 1
+                reply.set()
+            elif event == 'audio_segment' and turn['first_audio'] is None:
+                turn['first_audio'] = time.monotonic() - turn['ended_at']
+            elif event == 'ai_response':
+                results.turns.append(time.monotonic() - turn['ended_at'])
+                if turn['first_audio'] is not None:
+                    results.first_audio.append(turn['first_audio'])
+                reply.set()
+
+    async def send(samples: np.ndarray, ends_turn: bool = False) -> None:
+        # paced like a live microphone
+        next_at = time.monotonic()
+        for start in range(0, len(samples) - chunk + 1, chunk):
+            await ws.send(json.dumps({'type': 'audio', 'sampleRate': SAMPLE_RATE,
+                                      'data': _encode(samples[start:start + chunk])}))
+            if ends_turn and start + 2 * chunk > len(samples):
+                # the server's VAD ends the utterance on this chunk
+                turn['ended_at'] = time.monotonic()
+            next_at += CHUNK_SECONDS
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+
+    receiver = asyncio.create_task(receive())
+    done = 0
+    try:
+        await connected.wait()
+        for done in range(args.turns):
+            if speech_clips:
+                speech = speech_clips[py_rng.randrange(len(speech_clips))]
+            else:
+                speech = synthetic_speech(py_rng.uniform(*args.speech), rng)
+            reply.clear()
+            turn['ended_at'] = turn['first_audio'] = None
+            turn['queued'] = False
+            await send(speech)
+            await send(silence(SILENCE_CHUNKS * CHUNK_SECONDS, rng), ends_turn=True)
+            # keep the microphone open while waiting, as a real client does
+            deadline = time.monotonic() + args.turn_timeout
+            while not reply.is_set() and time.monotonic() < deadline:
+                await send(silence(0.3, rng))
+            if not reply.is_set():
+                results.failed_turns += 1
+            turn['ended_at'] = None
+            await send(silence(py_rng.uniform(*args.pause), rng))
+        done = args.turns
+    except Exception:
+        # the server closed the session; its remaining turns count as failed
+        results.disconnects += 1
+        results.failed_turns += args.turns - done
+    finally:
+        receiver.cancel()
+        await ws.close()
+
+
+async def video_client(ws_url: str, args, results: Results, frames: List[str], stop: asyncio.Event) -> None:
+    import websockets
+
+    try:
+        ws = await websockets.connect(f'{ws_url}/ws-video', max_size=None)
+    except Exception:
+        results.connect_errors += 1
+        return
+    sent_at: deque = deque()
+
+    async def receive():
+        async for message in ws:
+            try:
+                payload = json.loads(message)
+            except ValueError:
+                continue
+            if 'frames_received' in payload and 'status' in payload and sent_at:
+                results.frames_processed += 1
+                results.frame_latency.append(time.monotonic() - sent_at.popleft())
+
+    receiver = asyncio.create_task(receive())
+    try:
+        interval, i = 1.0 / args.video_fps, 0
+        next_at = time.monotonic()
+        while not stop.is_set():
+            sent_at.append(time.monotonic())
+            await ws.send(json.dumps({'type': 'video_frame', 'data': frames[i % len(frames)],
+                                      'timestamp': int(time.time() * 1000)}))
+            results.frames_sent += 1
+            i += 1
+            next_at += interval
+            await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+    finally:
+        receiver.cancel()
+        await ws.close()
+
+
+async def scrape(http: httpx.AsyncClient) -> Dict[str, float]:
+    try:
+        r = await http.get('/metrics')
+        r.raise_for_status()
+        return parse_metrics(r.text)
+    except httpx.HTTPError:
+        return {}
+
+
+async def run(args) -> Dict[str, Any]:
+    base = args.url.rstrip('/')
+    ws_url = 'ws' + base[4:] if base.startswith('http') else base
+    results = Results()
+    speech_clips = [load_wav(path) for path in args.wav]
+    frames = jpeg_frames(30, args.frame_size) if args.video_fps > 0 else []
+
+    async with httpx.AsyncClient(base_url=base, timeout=10) as http:
+        before = await scrape(http)
+        connected, counter, stop = asyncio.Event(), [0], asyncio.Event()
+        started = time.monotonic()
+        tasks, video_tasks = [], []
+        for i in range(args.clients):
+            tasks.append(asyncio.create_task(vad_client(ws_url, i, args, results, speech_clips, connected, counter)))
+            if frames:
+                video_tasks.append(asyncio.create_task(video_client(ws_url, args, results, frames, stop)))
+            await asyncio.sleep(args.ramp / max(1, args.clients))
+        await connected.wait()
+        # let per-session setup (models, pipelines) settle before sampling memory
+        await asyncio.sleep(1.0)
+        loaded = await scrape(http)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        stop.set()
+        await asyncio.gather(*video_tasks, return_exceptions=True)
+        elapsed = time.monotonic() - started
+        after = await scrape(http)
+
+    rss = 'ihub_process_resident_bytes'
+    stages = sorted({k[len('ihub_stage_seconds_count{stage="'):-2] for k in after
+                     if k.startswith('ihub_stage_seconds_count{')})
+    report: Dict[str, Any] = {
+        'clients': args.clients,
+        'turns_per_client': args.turns,
+        'seconds': round(elapsed, 1),
+        'turns_completed': len(results.turns),
+        'turns_failed': results.failed_turns,
+        'turns_queued': results.queued_turns,
+        'turns_rejected': results.rejected_turns,
+        'sessions_refused': results.refused_sessions,
+        'connect_errors': results.connect_errors,
+        'disconnects': results.disconnects,
+        'turn_latency_ms': _percentiles(results.turns),
+        'time_to_first_audio_ms': _percentiles(results.first_audio),
+    }
+    if frames:
+        report['video'] = {
+            'frames_sent': results.frames_sent,
+            'frames_processed': results.frames_processed,
+            'processed_per_second': round(results.frames_processed / elapsed, 1),
+            'frame_latency_ms': _percentiles(results.frame_latency),
+        }
+    if after:
+        sessions = args.clients * (2 if frames else 1)
+        report['server'] = {
+            'loop_lag': histogram_summary(after, before, 'ihub_loop_lag_seconds'),
+            'stages': {s: histogram_summary(after, before, 'ihub_stage_seconds', f'stage="{s}"') for s in stages},
+            'resident_bytes_idle': before.get(rss),
+            'resident_bytes_loaded': loaded.get(rss),
+            'resident_bytes_per_session': (
+                round((loaded[rss] - before[rss]) / sessions) if rss in loaded and rss in before else None
+            ),
+        }
+    return report
+
+
+def _range(value: str) -> Tuple[float, float]:
+    low, _, high = value.partition('-')
+    return float(low), float(high or low)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='WebSocket load generator')
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--clients', type=int, default=10)
+    parser.add_argument('--turns', type=int, default=3, help='turns per client')
+    parser.add_argument('--ramp', type=float, default=5.0, help='seconds over which clients connect')
+    parser.add_argument('--speech', type=_range, default=(1.0, 3.0), help='utterance seconds, e.g. 1-3')
+    parser.add_argument('--pause', type=_range, default=(1.0, 4.0), help='seconds between turns, e.g. 1-4')
+    parser.add_argument('--wav', action='append', default=[], help='16-bit WAV to speak instead of synthetic audio')
+    parser.add_argument('--video-fps', type=float, default=10.0, help='0 disables /ws-video')
+    parser.add_argument('--frame-size', type=lambda v: tuple(int(x) for x in v.split('x')), default=(640, 480))
+    parser.add_argument('--turn-timeout', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, List, Any
+
+"""
+Audio cache directory manager.
+
+Keeps an in-memory index of ``backend/cache`` so lookups never scan the
+directory, and enforces a byte quota and maximum idle age with LRU eviction
+from a background janitor task.
+
+Files are grouped into entries by ID, the part of the filename before the
+first dot, so an audio file and any sidecar files derived from it
+(``<id>.wav``, ``<id>.ogg``, ...) are looked up and evicted together.
+"""
+
+CACHE_DIR = os.environ.get('IHUB_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'cache'))
+MAX_BYTES = int(os.environ.get('IHUB_CACHE_MAX_BYTES', str(1024 * 1024 * 1024)))
+MAX_AGE = float(os.environ.get('IHUB_CACHE_MAX_AGE', str(7 * 24 * 3600)))
+JANITOR_INTERVAL = float(os.environ.get('IHUB_CACHE_JANITOR_INTERVAL', '60'))
+
+# Preferred file when an entry is requested by ID alone
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.ogg', '.opus', '.flac')
+
+
+class CacheEntry:
+    """Files sharing one cache ID, with their sizes and last access time."""
+
+    __slots__ = ('id', 'files', 'last_access')
+
+    def __init__(self, entry_id: str, last_access: float):
+        self.id = entry_id
+        self.files: Dict[str, int] = {}
+        self.last_access = last_access
+
+    @property
+    def size(self) -> int:
+        return sum(self.files.values())
+
+    def primary(self) -> Optional[str]:
+        """Return the file served for a bare-ID request."""
+        for ext in AUDIO_EXTENSIONS:
+            name = self.id + ext
+            if name in self.files:
+                return name
+        return min(self.files) if self.files else None
+
+
+def entry_id(filename: str) -> str:
+    """Return the cache ID of a filename (everything before the first dot)."""
+    return filename.split('.', 1)[0]
+
+
+class CacheManager:
+    """Index, quota and eviction for one audio cache directory.
+
+    The index is built once by ``scan`` and kept current through ``register``
+    and ``remove``; the entry order doubles as the LRU list.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = MAX_BYTES, max_age: float = MAX_AGE):
+        """Initialize the manager and index the directory.
+
+        Args:
+            directory: Cache directory to manage
+            max_bytes: Total size the janitor trims the cache down to
+            max_age: Seconds an entry may go unused before it is removed
+        """
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._files: Dict[str, str] = {}
+        self.total_bytes = 0
+        self.evicted = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.scan()
+
+    def scan(self) -> None:
+        """Rebuild the index from the directory, oldest entries first."""
+        found = []
+        try:
+            with os.scandir(self.directory) as it:
+                for de in it:
+                    if de.name.startswith('.') or not de.is_file():
+                        continue
+                    st = de.stat()
+                    found.append((st.st_mtime, de.name, st.st_size))
+        except OSError:
+            pass
+        found.sort()
+        with self._lock:
+            self._entries.clear()
+            self._files.clear()
+            self.total_bytes = 0
+            for mtime, name, size in found:
+                self._add(name, size, mtime)
+
+    def _add(self, filename: str, size: int, now: float) -> None:
+        eid = entry_id(filename)
+        entry = self._entries.get(eid)
+        if entry is None:
+            entry = CacheEntry(eid, now)
+            self._entries[eid] = entry
+        else:
+            entry.last_access = max(entry.last_access, now)
+            self._entries.move_to_end(eid)
+        self.total_bytes += size - entry.files.get(filename, 0)
+        entry.files[filename] = size
+        self._files[filename] = eid
+
+    def register(self, filename: str) -> None:
+        """Add a newly written file to the index.
+
+        Args:
+            filename: Name of the file inside the cache directory
+        """
+        try:
+            size = os.path.getsize(os.path.join(self.directory, filename))
+        except OSError:
+            return
+        with self._lock:
+            self._add(filename, size, time.time())
+
+    def lookup(self, name: str) -> Optional[str]:
+        """Resolve a filename or bare ID to a path and mark the entry as used.
+
+        Args:
+            name: Exact filename, or an ID to resolve to its primary file
+
+        Returns:
+            Absolute path of the file, or None if it is not cached
+        """
+        with self._lock:
+            eid = self._files.get(name)
+            filename = name if eid else None
+            if eid is None:
+                eid = entry_id(name)
+                entry = self._entries.get(eid)
+                if entry is None:
+                    return None
+                # a partial name such as "<id>" or "<id>.ogg" without the full match
+                filename = entry.primary() if name == eid else None
+                if filename is None:
+                    return None
+            entry = self._entries[eid]
+            entry.last_access = time.time()
+            self._entries.move_to_end(eid)
+        return os.path.join(self.directory, filename)
+
+    def files(self, eid: str) -> List[str]:
+        """Return the filenames stored under an ID."""
+        with self._lock:
+            entry = self._entries.get(eid)
+            return list(entry.files) if entry else []
+
+    def remove(self, eid: str, unused_since: Optional[float] = None) -> int:
+        """Delete every file of an entry.
+
+        Args:
+            eid: Entry ID
+            unused_since: If given, keep the entry when it was looked up or
+                written at or after this time
+
+        Returns:
+            Bytes freed
+        """
+        with self._lock:
+            entry = self._entries.get(eid)
+            if entry is None or (unused_since is not None and entry.last_access >= unused_since):
+                return 0
+            del self._entries[eid]
+            for filename in entry.files:
+                self._files.pop(filename, None)
+            self.total_bytes -= entry.size
+        for filename in entry.files:
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+        return entry.size
+
+    def enforce(self) -> int:
+        """Remove idle entries, then least recently used ones until under quota.
+
+        Returns:
+            Number of entries evicted
+        """
+        cutoff = time.time() - self.max_age
+        victims = []
+        with self._lock:
+            over = self.total_bytes - self.max_bytes
+            for eid, entry in self._entries.items():
+                if entry.last_access < cutoff:
+                    victims.append(eid)
+                    over -= entry.size
+                elif over > 0:
+                    victims.append(eid)
+                    over -= entry.size
+                else:
+                    break
+        for eid in victims:
+            self.remove(eid)
+        self.evicted += len(victims)
+        return len(victims)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index size, byte usage and eviction count."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'max_age': self.max_age,
+                'evicted': self.evicted,
+            }
+
+    async def run_janitor(self, interval: float = JANITOR_INTERVAL) -> None:
+        """Enforce the quota every ``interval`` seconds until cancelled."""
+        while True:
+            try:
+                await asyncio.to_thread(self.enforce)
+            except Exception:
+                pass
+            await asyncio.sleep(interval)
+
+
+_managers: Dict[str, CacheManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_cache_manager(directory: str = CACHE_DIR) -> CacheManager:
+    """Return the manager for a directory, indexing it on first use."""
+    directory = os.path.abspath(directory)
+    with _managers_lock:
+        manager = _managers.get(directory)
+        if manager is None:
+            manager = CacheManager(directory)
+            _managers[directory] = manager
+        return manager
+
+
+# Global cache instance for backend/cache
+audio_cache = get_cache_manager()
@@ -0,0 +1,266 @@
+import asyncio
+import json
+import os
+from collections import deque
+from typing import Optional, Dict, Any, Union, Iterable
+
+from fastapi import WebSocket
+
+"""
+WebSocket fan-out with per-client bounded send queues.
+
+``broadcast`` serializes a message once and only appends it to each
+client's queue; a writer task per client drains its queue, so a slow or
+stalled client never delays delivery to the others or the caller. When a
+queue is full the slow-consumer policy decides what happens:
+
+- ``drop_oldest``: discard the oldest queued message
+- ``coalesce``: replace a queued message with the same key (e.g. the
+  previous ``speech_started``), otherwise discard the oldest
+- ``disconnect``: close the slow client
+
+Clients whose send fails or times out are evicted.
+
+Messages are published on a topic through a pub/sub bus (see ``pubsub``),
+so with a multi-worker bus they reach the clients of every worker. Each
+client receives all topics unless it subscribed to specific ones.
+"""
+
+# Messages queued per client before the slow-consumer policy applies
+SEND_QUEUE_SIZE = int(os.environ.get('IHUB_WS_QUEUE_SIZE', '64'))
+
+# drop_oldest | coalesce | disconnect
+SLOW_CONSUMER_POLICY = os.environ.get('IHUB_WS_SLOW_POLICY', 'coalesce')
+
+# Seconds a single send may take before the client is considered dead
+SEND_TIMEOUT = float(os.environ.get('IHUB_WS_SEND_TIMEOUT', '10'))
+
+POLICIES = ('drop_oldest', 'coalesce', 'disconnect')
+
+# Topic used when a broadcast names none
+DEFAULT_TOPIC = 'chat'
+
+# Close code for clients dropped for not keeping up ("try again later")
+CLOSE_SLOW_CONSUMER = 1013
+
+
+class Client:
+    """A connected socket, its outgoing queue and its writer task."""
+
+    __slots__ = ('websocket', 'topics', 'excluded', 'queue', 'ready', 'task', 'sent', 'dropped')
+
+    def __init__(self, websocket: WebSocket, topics: Optional[Iterable[str]] = None):
+        self.websocket = websocket
+        # None receives every topic
+        self.topics = set(topics) if topics is not None else None
+        # topics a client on every topic has unsubscribed from
+        self.excluded: set = set()
+        self.queue: deque = deque()
+        self.ready = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.dropped = 0
+
+    def wants(self, topic: str) -> bool:
+        """Return whether the client is subscribed to a topic."""
+        if self.topics is None:
+            return topic not in self.excluded
+        return topic in self.topics
+
+
+class ConnectionManager:
+    """Tracks /ws clients and fans messages out to them."""
+
+    def __init__(
+        self,
+        queue_size: int = SEND_QUEUE_SIZE,
+        policy: str = SLOW_CONSUMER_POLICY,
+        send_timeout: float = SEND_TIMEOUT,
+        bus=None
+    ):
+        """Initialize the manager.
+
+        Args:
+            queue_size: Messages queued per client before ``policy`` applies
+            policy: Slow-consumer policy, one of ``POLICIES``
+            send_timeout: Seconds a send may take before the client is evicted
+            bus: Pub/sub transport; None delivers to this process only
+
+        Raises:
+            ValueError: If the policy is unknown
+        """
+        if policy not in POLICIES:
+            raise ValueError(f'Unknown slow-consumer policy: {policy}')
+        self.queue_size = max(1, queue_size)
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.bus = bus
+        self.clients: Dict[WebSocket, Client] = {}
+        self.counters = {'broadcasts': 0, 'sent': 0, 'dropped': 0, 'coalesced': 0, 'evicted': 0}
+
+    @property
+    def active(self) -> list:
+        """Connected sockets."""
+        return list(self.clients)
+
+    async def start(self) -> None:
+        """Join the bus so messages from other workers reach local clients."""
+        if self.bus is not None:
+            await self.bus.start(self.deliver)
+
+    async def connect(self, websocket: WebSocket, topics: Optional[Iterable[str]] = None) -> None:
+        """Accept a socket and start its writer task.
+
+        Args:
+            websocket: Socket to accept
+            topics: Topics to receive; None for all
+        """
+        await websocket.accept()
+        self.register(websocket, topics)
+
+    def register(self, websocket: WebSocket, topics: Optional[Iterable[str]] = None) -> Client:
+        """Start delivering broadcasts to an already accepted socket."""
+        client = Client(websocket, topics)
+        client.task = asyncio.create_task(self._writer(client))
+        self.clients[websocket] = client
+        return client
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str]) -> None:
+        """Add topics to a client's subscriptions (a client on all topics stays so)."""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        if client.topics is None:
+            client.excluded.difference_update(topics)
+        else:
+            client.topics.update(topics)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]) -> None:
+        """Stop sending topics to a client; a client on all topics keeps the others."""
+        client = self.clients.get(websocket)
+        if client is None:
+            return
+        if client.topics is None:
+            client.excluded.update(topics)
+        else:
+            client.topics.difference_update(topics)
+
+    def disconnect(self, websocket: WebSocket) -> None:
+        """Stop delivering to a socket and discard its queue."""
+        client = self.clients.pop(websocket, None)
+        if client is None:
+            return
+        client.queue.clear()
+        client.ready.set()
+        if client.task and client.task is not asyncio.current_task():
+            client.task.cancel()
+
+    async def _evict(self, client: Client, code: int = 1011) -> None:
+        if self.clients.get(client.websocket) is not client:
+            return
+        self.counters['evicted'] += 1
+        self.disconnect(client.websocket)
+        try:
+            await asyncio.wait_for(client.websocket.close(code=code), 1.0)
+        except Exception:
+            pass
+
+    async def _writer(self, client: Client) -> None:
+        """Drain one client's queue in order, evicting it if a send fails."""
+        try:
+            # wait_for can swallow a cancel that lands as a send completes, so a
+            # disconnected client's writer also stops once it is unregistered
+            while self.clients.get(client.websocket) is client:
+                await client.ready.wait()
+                client.ready.clear()
+                while client.queue:
+                    _, message = client.queue.popleft()
+                    await asyncio.wait_for(client.websocket.send_text(message), self.send_timeout)
+                    client.sent += 1
+                    self.counters['sent'] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await self._evict(client)
+
+    def _enqueue(self, client: Client, message: str, key: Optional[str]) -> bool:
+        """Queue a message for one client; return False if it must be evicted."""
+        queue = client.queue
+        if len(queue) >= self.queue_size:
+            if self.policy == 'disconnect':
+                return False
+            if self.policy == 'coalesce' and key is not None:
+                for i in range(len(queue) - 1, -1, -1):
+                    if queue[i][0] == key:
+                        # the newer event supersedes the queued one
+                        del queue[i]
+                        self.counters['coalesced'] += 1
+                        break
+            if len(queue) >= self.queue_size:
+                queue.popleft()
+                client.dropped += 1
+                self.counters['dropped'] += 1
+        queue.append((key, message))
+        client.ready.set()
+        return True
+
+    def deliver(self, topic: str, message: str, key: Optional[str] = None) -> int:
+        """Queue an already serialized message for the local clients on a topic.
+
+        Returns:
+            Number of clients the message was queued for
+        """
+        self.counters['broadcasts'] += 1
+        slow, queued = [], 0
+        for client in list(self.clients.values()):
+            if not client.wants(topic):
+                continue
+            queued += 1
+            if not self._enqueue(client, message, key):
+                slow.append(client)
+        for client in slow:
+            asyncio.ensure_future(self._evict(client, CLOSE_SLOW_CONSUMER))
+        return queued
+
+    def publish(
+        self,
+        message: Union[str, Dict[str, Any]],
+        key: Optional[str] = None,
+        topic: str = DEFAULT_TOPIC
+    ) -> None:
+        """Send a message to every subscribed client without waiting for delivery.
+
+        Args:
+            message: Text, or a dict serialized once for all recipients
+            key: Coalescing key; defaults to the 'event' field of dict messages
+            topic: Topic the message is published on
+        """
+        if isinstance(message, dict):
+            key = key if key is not None else message.get('event')
+            message = json.dumps(message)
+        if self.bus is not None:
+            self.bus.publish(topic, message, key)
+        else:
+            self.deliver(topic, message, key)
+
+    async def broadcast(
+        self,
+        message: Union[str, Dict[str, Any]],
+        key: Optional[str] = None,
+        topic: str = DEFAULT_TOPIC
+    ) -> None:
+        """Awaitable ``publish``; returns as soon as the message is queued."""
+        self.publish(message, key, topic)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return client count, queue depths and delivery counters."""
+        depths = [len(c.queue) for c in self.clients.values()]
+        return {
+            'clients': len(depths),
+            'policy': self.policy,
+            'queue_size': self.queue_size,
+            'queued': sum(depths),
+            'max_queue_depth': max(depths, default=0),
+            **self.counters,
+            'bus': self.bus.stats() if self.bus is not None else None,
+        }
@@ -1,13 +1,205 @@
+import asyncio
+import atexit
+import base64
 import os
+import queue
 import sqlite3
 import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple, Iterator, AsyncIterator
+from urllib.parse import quote
+
+try:
+    from timeline_codec import encode_timeline, decode_timeline
+except Exception:
+    try:
+        from backend.timeline_codec import encode_timeline, decode_timeline
+    except Exception:
+        from .timeline_codec import encode_timeline, decode_timeline
 
 DEFAULT_DIR = os.path.join(os.path.dirname(__file__), 'database')
 os.makedirs(DEFAULT_DIR, exist_ok=True)
 DB_PATH = os.environ.get('IHUB_SQLITE_PATH', os.path.join(DEFAULT_DIR, 'database.db'))
 
+# Durability of the WAL: NORMAL syncs at checkpoints only, FULL on every commit
+SYNCHRONOUS = os.environ.get('IHUB_SQLITE_SYNCHRONOUS', 'NORMAL').upper()
+
+# Most inserts committed together in one transaction
+WRITE_BATCH_MAX = int(os.environ.get('IHUB_SQLITE_BATCH_MAX', '256'))
+
+# INSERT ... RETURNING needs SQLite 3.35
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Threads serving the async read API
+READ_WORKERS = int(os.environ.get('IHUB_SQLITE_READERS', str(min(4, os.cpu_count() or 1))))
+
+# Largest page served by the conversation feed
+FEED_MAX_LIMIT = 500
+
+# Feed item type -> (table, columns selected in feed order)
+FEED_SOURCES = {
+    'message': ('messages', 'role, text, expression, NULL AS timeline, audio_id, NULL AS audio_segments, created_at'),
+    'ai_response': ('ai_responses',
+                    "'ai' AS role, text, NULL AS expression, timeline, audio_id, audio_segments, created_at"),
+}
+
+# Items read per query while exporting
+EXPORT_BATCH = FEED_MAX_LIMIT
+
+# Largest page served by search
+SEARCH_MAX_LIMIT = 100
+
+# Full-text index over both tables. Rowids are derived from the source row
+# (id * 2 for messages, id * 2 + 1 for ai_responses) so triggers can find them.
+SEARCH_SCHEMA = (
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS conversation_fts USING fts5(
+        text, type UNINDEXED, ref_id UNINDEXED, role UNINDEXED,
+        expression UNINDEXED, created_at UNINDEXED, tokenize='porter unicode61'
+    )''',
+    '''CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO conversation_fts (rowid, text, type, ref_id, role, expression, created_at)
+        VALUES (new.id * 2, new.text, 'message', new.id, new.role, new.expression, new.created_at);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        DELETE FROM conversation_fts WHERE rowid = old.id * 2;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE ON messages BEGIN
+        INSERT OR REPLACE INTO conversation_fts (rowid, text, type, ref_id, role, expression, created_at)
+        VALUES (new.id * 2, new.text, 'message', new.id, new.role, new.expression, new.created_at);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS ai_responses_fts_insert AFTER INSERT ON ai_responses BEGIN
+        INSERT INTO conversation_fts (rowid, text, type, ref_id, role, expression, created_at)
+        VALUES (new.id * 2 + 1, new.text, 'ai_response', new.id, 'ai', NULL, new.created_at);
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS ai_responses_fts_delete AFTER DELETE ON ai_responses BEGIN
+        DELETE FROM conversation_fts WHERE rowid = old.id * 2 + 1;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS ai_responses_fts_update AFTER UPDATE ON ai_responses BEGIN
+        INSERT OR REPLACE INTO conversation_fts (rowid, text, type, ref_id, role, expression, created_at)
+        VALUES (new.id * 2 + 1, new.text, 'ai_response', new.id, 'ai', NULL, new.created_at);
+    END''',
+)
+
+# Indexes serving get_feed: each branch seeks the equality filter (role or
+# expression), then walks (created_at, id) from the cursor in keyset order
+FEED_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_messages_created_id ON messages (created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_messages_role_created_id ON messages (role, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_messages_expression_created_id ON messages (expression, created_at, id)',
+    'CREATE INDEX IF NOT EXISTS idx_ai_responses_created_id ON ai_responses (created_at, id)',
+)
+
+# Every audio ID a reply references (each segment), kept by triggers so
+# retention can check candidate IDs with an index lookup
+AUDIO_REFS_SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS audio_refs (
+        audio_id TEXT NOT NULL,
+        response_id INTEGER NOT NULL,
+        PRIMARY KEY (response_id, audio_id)
+    ) WITHOUT ROWID''',
+    'CREATE INDEX IF NOT EXISTS idx_audio_refs_audio_id ON audio_refs (audio_id)',
+    '''CREATE TRIGGER IF NOT EXISTS ai_responses_refs_insert AFTER INSERT ON ai_responses BEGIN
+        INSERT OR IGNORE INTO audio_refs (audio_id, response_id)
+        SELECT value, new.id FROM json_each(COALESCE(new.audio_segments, json_array(new.audio_id)))
+        WHERE value IS NOT NULL;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS ai_responses_refs_delete AFTER DELETE ON ai_responses BEGIN
+        DELETE FROM audio_refs WHERE response_id = old.id;
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS ai_responses_refs_update AFTER UPDATE OF audio_id, audio_segments ON ai_responses BEGIN
+        DELETE FROM audio_refs WHERE response_id = old.id;
+        INSERT OR IGNORE INTO audio_refs (audio_id, response_id)
+        SELECT value, new.id FROM json_each(COALESCE(new.audio_segments, json_array(new.audio_id)))
+        WHERE value IS NOT NULL;
+    END''',
+)
+
+# Rows indexed per transaction by rebuild_search_index
+SEARCH_REBUILD_BATCH = 5000
+
+# Stops the writer thread
+_STOP = object()
+
+# Marks a write job that runs on its own, outside any transaction
+_EXCLUSIVE = object()
+
+
+def encode_cursor(created_at: str, kind: str, row_id: int) -> str:
+    """Encode a feed position as an opaque URL-safe cursor."""
+    raw = json.dumps([created_at, kind, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str, int]:
+    """Decode a cursor produced by ``encode_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, kind, row_id = json.loads(raw)
+        if not isinstance(created_at, str) or kind not in FEED_SOURCES or not isinstance(row_id, int):
+            raise ValueError
+        return created_at, kind, row_id
+    except Exception:
+        raise ValueError(f'Invalid cursor: {cursor!r}')
+
+
+# Sorts before every feed item; where an export without a cursor starts
+EXPORT_START = encode_cursor('', 'ai_response', 0)
+
+
+def encode_audio_segments(segments: Optional[List[str]]) -> Optional[str]:
+    """Encode a reply's audio segment IDs, in playback order, for storage."""
+    return json.dumps(list(segments), separators=(',', ':')) if segments else None
+
+
+def decode_audio_segments(value: Optional[str], audio_id: Optional[str] = None) -> List[str]:
+    """Decode stored audio segment IDs.
+
+    Rows without the column set (single-file replies) fall back to their
+    ``audio_id``.
+    """
+    if value:
+        try:
+            segments = json.loads(value)
+            if isinstance(segments, list):
+                return [str(s) for s in segments if s]
+        except ValueError:
+            pass
+    return [audio_id] if audio_id else []
+
+
+def ai_response_dict(row) -> Dict[str, Any]:
+    """Return an AI response row as a plain dict with its timeline and audio segments decoded."""
+    result = dict(row)
+    result['timeline'] = decode_timeline(result.get('timeline'))
+    result['audio_segments'] = decode_audio_segments(result.get('audio_segments'), result.get('audio_id'))
+    return result
+
+
+# Row type returned for inserts into each table
+ROW_TYPES = {'ai_responses': ai_response_dict}
+
+
+def _fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query matching every word.
+
+    Each word is quoted so punctuation and FTS5 operators in user input are
+    taken literally; a trailing ``*`` keeps prefix matching.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '')
+        if word:
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
 
 def _resolve_db_path(path: str) -> str:
     """Resolve database path to absolute path, creating parent directories if needed.
@@ -46,11 +238,59 @@ class DatabaseManager:
         """
         self.path = _resolve_db_path(path)
         try:
-            self._conn = sqlite3.connect(self.path, check_same_thread=False)
-            self._conn.row_factory = sqlite3.Row
+            self._conn = self._connect()
         except sqlite3.Error as e:
             raise RuntimeError(f'Failed to open sqlite database at {self.path}: {e}')
-        self._ensure_db()
+        try:
+            self._ensure_db()
+        finally:
+            # schema only; reads use per-thread connections, writes the writer thread
+            self._conn.close()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._read_pool = ThreadPoolExecutor(max_workers=max(1, READ_WORKERS), thread_name_prefix='sqlite-read')
+        self._writes: queue.Queue = queue.Queue()
+        self._write_stats = {'rows': 0, 'commits': 0, 'errors': 0, 'max_batch': 0, 'commit_seconds': 0.0}
+        self._writer = threading.Thread(target=self._writer_loop, name='sqlite-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection in WAL mode with the configured sync level."""
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # must precede the first write; only new databases pick it up (see retention)
+        conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={SYNCHRONOUS}')
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Return the calling thread's read-only connection, opening it on first use.
+
+        In WAL mode readers see the last committed snapshot and never block
+        (or wait for) the writer thread.
+
+        Raises:
+            RuntimeError: If the connection cannot be opened
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            try:
+                conn = sqlite3.connect(f'file:{quote(self.path)}?mode=ro', uri=True, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                conn.execute('PRAGMA query_only=ON')
+            except sqlite3.Error as e:
+                raise RuntimeError(f'Failed to open sqlite reader at {self.path}: {e}')
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    async def _run_read(self, fn, *args):
+        """Run a blocking read on the read pool without blocking the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(self._read_pool, fn, *args)
 
     def _ensure_db(self) -> None:
         """Create database tables if they don't exist."""
@@ -72,13 +312,289 @@ class DatabaseManager:
                     text TEXT NOT NULL,
                     timeline TEXT,
                     audio_id TEXT,
-                    created_at TEXT NOT NULL
+                    created_at TEXT NOT NULL,
+                    audio_segments TEXT
                 )
             ''')
+            self._migrate_audio_segments(cur)
+            cur.execute('CREATE INDEX IF NOT EXISTS idx_messages_audio_id ON messages (audio_id) WHERE audio_id IS NOT NULL')
+            has_refs = cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'audio_refs'").fetchone()
+            for statement in AUDIO_REFS_SCHEMA:
+                cur.execute(statement)
+            if has_refs is None:
+                cur.execute('''
+                    INSERT OR IGNORE INTO audio_refs (audio_id, response_id)
+                    SELECT j.value, r.id FROM ai_responses r,
+                        json_each(COALESCE(r.audio_segments, json_array(r.audio_id))) j
+                    WHERE j.value IS NOT NULL
+                ''')
+            for statement in FEED_INDEXES:
+                cur.execute(statement)
+            # superseded by the composite indexes above
+            cur.execute('DROP INDEX IF EXISTS idx_messages_created_at')
+            cur.execute('DROP INDEX IF EXISTS idx_ai_responses_created_at')
+            indexed = cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'conversation_fts'").fetchone()
+            for statement in SEARCH_SCHEMA:
+                cur.execute(statement)
+            # rows written before the index existed are added by rebuild_search_index
+            self.search_index_stale = indexed is None and bool(
+                cur.execute('SELECT EXISTS (SELECT 1 FROM messages) OR EXISTS (SELECT 1 FROM ai_responses)').fetchone()[0]
+            )
             self._conn.commit()
         except sqlite3.Error as e:
             raise RuntimeError(f'Failed to create database tables: {e}')
 
+    @staticmethod
+    def _migrate_audio_segments(cur: sqlite3.Cursor) -> None:
+        """Add ``ai_responses.audio_segments`` to databases created without it.
+
+        Replies stored before the column existed joined their segment IDs
+        with commas in ``audio_id``; those are split into the new column and
+        ``audio_id`` keeps the first segment.
+        """
+        columns = {r[1] for r in cur.execute('PRAGMA table_info(ai_responses)')}
+        if 'audio_segments' in columns:
+            return
+        cur.execute('ALTER TABLE ai_responses ADD COLUMN audio_segments TEXT')
+        joined = cur.execute("SELECT id, audio_id FROM ai_responses WHERE audio_id LIKE '%,%'").fetchall()
+        updates = []
+        for row_id, value in joined:
+            segments = [a for a in value.split(',') if a]
+            updates.append((segments[0] if segments else None, encode_audio_segments(segments), row_id))
+        cur.executemany('UPDATE ai_responses SET audio_id = ?, audio_segments = ? WHERE id = ?', updates)
+
+    def _writer_loop(self) -> None:
+        """Drain the write queue on a dedicated connection, committing in batches.
+
+        Every insert waiting when the writer wakes up goes into the same
+        transaction, so concurrent sessions share one commit instead of paying
+        for one each. Futures are resolved only after the commit succeeds.
+        """
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            conn = None
+            error = RuntimeError(f'Failed to open sqlite writer connection: {e}')
+        while True:
+            item = self._writes.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            while len(batch) < WRITE_BATCH_MAX:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._writes.put(_STOP)
+                    break
+                batch.append(item)
+            if conn is None:
+                for _, _, _, future in batch:
+                    future.set_exception(error)
+                continue
+            start = 0
+            for i, (table, job, _, future) in enumerate(batch):
+                if table is _EXCLUSIVE:
+                    if i > start:
+                        self._commit_batch(conn, batch[start:i])
+                    self._run_exclusive(conn, job, future)
+                    start = i + 1
+            if start < len(batch):
+                self._commit_batch(conn, batch[start:])
+        if conn is not None:
+            conn.close()
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: List[Tuple[str, str, tuple, Future]]) -> None:
+        """Run a batch of inserts in one transaction and resolve their futures."""
+        started = time.perf_counter()
+        results = []
+        try:
+            conn.execute('BEGIN')
+            for table, sql, params, future in batch:
+                if callable(sql):
+                    results.append((future, *self._run_job(conn, sql)))
+                    continue
+                try:
+                    cur = conn.execute(sql, params)
+                    if HAS_RETURNING:
+                        row = cur.fetchone()
+                    else:
+                        row = conn.execute(f'SELECT * FROM {table} WHERE id=?', (cur.lastrowid,)).fetchone()
+                    results.append((future, ROW_TYPES.get(table, dict)(row) if row else {}, None))
+                except sqlite3.Error as e:
+                    # a failed statement is rolled back on its own; the batch goes on
+                    results.append((future, None, e))
+            conn.commit()
+        except sqlite3.Error as e:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            results = [(future, None, e) for _, _, _, future in batch]
+
+        stats = self._write_stats
+        stats['commits'] += 1
+        stats['max_batch'] = max(stats['max_batch'], len(batch))
+        stats['commit_seconds'] += time.perf_counter() - started
+        for future, row, error in results:
+            if error is None:
+                stats['rows'] += 1
+                future.set_result(row)
+            else:
+                stats['errors'] += 1
+                future.set_exception(RuntimeError(f'Failed to write row: {error}'))
+
+    @staticmethod
+    def _run_job(conn: sqlite3.Connection, job) -> Tuple[Any, Optional[Exception]]:
+        """Run a write job inside a savepoint so a failure undoes only its own changes."""
+        conn.execute('SAVEPOINT job')
+        try:
+            result = job(conn)
+        except Exception as e:
+            conn.execute('ROLLBACK TO job')
+            conn.execute('RELEASE job')
+            return None, e
+        conn.execute('RELEASE job')
+        return result, None
+
+    @staticmethod
+    def _run_exclusive(conn: sqlite3.Connection, job, future: Future) -> None:
+        try:
+            future.set_result(job(conn))
+        except Exception as e:
+            future.set_exception(RuntimeError(f'Failed to run maintenance job: {e}'))
+
+    def submit_exclusive(self, job) -> Future:
+        """Run ``job(conn)`` on the writer connection outside any transaction.
+
+        For statements SQLite refuses inside a transaction, such as ``VACUUM``.
+        Writes queued before it are committed first and later ones wait.
+
+        Args:
+            job: Callable taking the writer's sqlite3.Connection
+
+        Returns:
+            Future resolving to the job's return value
+        """
+        future: Future = Future()
+        if not self._writer.is_alive():
+            future.set_exception(RuntimeError('Database writer is closed'))
+            return future
+        self._writes.put((_EXCLUSIVE, job, None, future))
+        return future
+
+    def submit_write(self, job) -> Future:
+        """Run ``job(conn)`` on the writer connection, inside the next group commit.
+
+        For maintenance writes (deletes, vacuum slices) that must not contend
+        with the writer thread for the database lock.
+
+        Args:
+            job: Callable taking the writer's sqlite3.Connection; must not commit
+
+        Returns:
+            Future resolving to the job's return value once committed
+        """
+        future: Future = Future()
+        if not self._writer.is_alive():
+            future.set_exception(RuntimeError('Database writer is closed'))
+            return future
+        self._writes.put((None, job, None, future))
+        return future
+
+    def _submit(self, table: str, columns: Tuple[str, ...], values: tuple) -> Future:
+        """Queue an insert for the writer thread.
+
+        Returns:
+            Future resolving to the inserted row as a dictionary
+        """
+        future: Future = Future()
+        if not self._writer.is_alive():
+            future.set_exception(RuntimeError('Database writer is closed'))
+            return future
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        if HAS_RETURNING:
+            sql += ' RETURNING *'
+        self._writes.put((table, sql, values, future))
+        return future
+
+    def submit_message(
+        self,
+        role: str,
+        text: str,
+        audio_id: Optional[str] = None,
+        expression: Optional[str] = None
+    ) -> Future:
+        """Queue a message insert without waiting for the commit.
+
+        Args:
+            role: Message role ('user' or 'system')
+            text: Message text content
+            audio_id: Optional reference to audio file
+            expression: Optional detected user expression/emotion
+
+        Returns:
+            Future resolving to the inserted row; in async code wrap it with
+            ``asyncio.wrap_future``
+        """
+        created_at = datetime.utcnow().isoformat() + 'Z'
+        return self._submit(
+            'messages',
+            ('role', 'text', 'audio_id', 'expression', 'created_at'),
+            (role, text, audio_id, expression, created_at)
+        )
+
+    def submit_ai_response(
+        self,
+        text: str,
+        timeline: List[Dict[str, Any]],
+        audio_id: Optional[str] = None,
+        audio_segments: Optional[List[str]] = None
+    ) -> Future:
+        """Queue an AI response insert without waiting for the commit.
+
+        Args:
+            text: Response text content
+            timeline: Animation timeline data (list of animation states)
+            audio_id: Optional reference to generated audio file
+            audio_segments: Audio IDs of a reply synthesized in segments, in
+                playback order; ``audio_id`` should be the first of them
+
+        Returns:
+            Future resolving to the inserted row
+        """
+        created_at = datetime.utcnow().isoformat() + 'Z'
+        return self._submit(
+            'ai_responses',
+            ('text', 'timeline', 'audio_id', 'audio_segments', 'created_at'),
+            (text, encode_timeline(timeline), audio_id, encode_audio_segments(audio_segments), created_at)
+        )
+
+    def write_stats(self) -> Dict[str, Any]:
+        """Return writer counters: rows, commits, rows per commit and mean commit time."""
+        stats = dict(self._write_stats)
+        commits = stats['commits'] or 1
+        stats['rows_per_commit'] = stats['rows'] / commits
+        stats['commit_ms_mean'] = stats.pop('commit_seconds') * 1000 / commits
+        stats['queued'] = self._writes.qsize()
+        return stats
+
+    def close(self) -> None:
+        """Close readers, then flush pending writes and stop the writer thread."""
+        self._read_pool.shutdown(wait=True)
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for conn in readers:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        # the writer closes last so its connection checkpoints the WAL
+        if self._writer.is_alive():
+            self._writes.put(_STOP)
+            self._writer.join()
+
     def insert_message(
         self,
         role: str,
@@ -96,29 +612,21 @@ class DatabaseManager:
             
         Returns:
             Dictionary with inserted row data including id and created_at
+
+        Raises:
+            RuntimeError: If the insert fails
         """
         try:
-            cur = self._conn.cursor()
-            created_at = datetime.utcnow().isoformat() + 'Z'
-            cur.execute(
-                '''INSERT INTO messages 
-                   (role, text, audio_id, expression, created_at) 
-                   VALUES (?, ?, ?, ?, ?)''',
-                (role, text, audio_id, expression, created_at)
-            )
-            self._conn.commit()
-            rowid = cur.lastrowid
-            cur.execute('SELECT * FROM messages WHERE id=?', (rowid,))
-            row = cur.fetchone()
-            return dict(row) if row else {}
-        except sqlite3.Error as e:
+            return self.submit_message(role, text, audio_id, expression).result()
+        except RuntimeError as e:
             raise RuntimeError(f'Failed to insert message: {e}')
 
     def insert_ai_response(
         self,
         text: str,
         timeline: List[Dict[str, Any]],
-        audio_id: Optional[str] = None
+        audio_id: Optional[str] = None,
+        audio_segments: Optional[List[str]] = None
     ) -> Optional[Dict[str, Any]]:
         """Insert an AI response into the database.
         
@@ -126,26 +634,14 @@ class DatabaseManager:
             text: Response text content
             timeline: Animation timeline data (list of animation states)
             audio_id: Optional reference to generated audio file
+            audio_segments: Audio IDs of a segmented reply, in playback order
             
         Returns:
             Dictionary with inserted row data or None on error
         """
         try:
-            cur = self._conn.cursor()
-            timeline_json = json.dumps(timeline)
-            created_at = datetime.utcnow().isoformat() + 'Z'
-            cur.execute(
-                '''INSERT INTO ai_responses 
-                   (text, timeline, audio_id, created_at) 
-                   VALUES (?, ?, ?, ?)''',
-                (text, timeline_json, audio_id, created_at)
-            )
-            self._conn.commit()
-            rowid = cur.lastrowid
-            cur.execute('SELECT * FROM ai_responses WHERE id=?', (rowid,))
-            row = cur.fetchone()
-            return dict(row) if row else None
-        except sqlite3.Error as e:
+            return self.submit_ai_response(text, timeline, audio_id, audio_segments).result() or None
+        except RuntimeError as e:
             raise RuntimeError(f'Failed to insert AI response: {e}')
 
     def get_messages(self, limit: int = 50) -> List[Dict[str, Any]]:
@@ -158,7 +654,7 @@ class DatabaseManager:
             List of message dictionaries ordered by newest first
         """
         try:
-            cur = self._conn.cursor()
+            cur = self._reader().cursor()
             cur.execute(
                 'SELECT * FROM messages ORDER BY id DESC LIMIT ?',
                 (limit,)
@@ -174,26 +670,317 @@ class DatabaseManager:
             limit: Maximum number of responses to return
             
         Returns:
-            List of AI response dictionaries with parsed timeline
+            List of response dictionaries ordered by newest first
         """
         try:
-            cur = self._conn.cursor()
+            cur = self._reader().cursor()
             cur.execute(
                 'SELECT * FROM ai_responses ORDER BY id DESC LIMIT ?',
                 (limit,)
             )
-            results = []
-            for row in cur.fetchall():
-                row_dict = dict(row)
-                try:
-                    row_dict['timeline'] = json.loads(row_dict['timeline']) if row_dict.get('timeline') else None
-                except (json.JSONDecodeError, TypeError):
-                    row_dict['timeline'] = None
-                results.append(row_dict)
-            return results
+            return [ai_response_dict(row) for row in cur.fetchall()]
         except sqlite3.Error as e:
             raise RuntimeError(f'Failed to query AI responses: {e}')
 
+    def get_feed(
+        self,
+        limit: int = 100,
+        before: Optional[str] = None,
+        after: Optional[str] = None,
+        role: Optional[str] = None,
+        expression: Optional[str] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        include_timeline: bool = False
+    ) -> Dict[str, Any]:
+        """Return one page of messages and AI responses, newest first.
+
+        Both tables are merged and ordered in a single ``UNION ALL`` query on
+        ``(created_at, type, id)``. Each branch walks one of ``FEED_INDEXES``
+        from the cursor (led by the role or expression filter when given) and
+        stops after ``limit`` rows, so the cost of a page does not grow with
+        the table size.
+
+        Args:
+            limit: Maximum items to return (capped at ``FEED_MAX_LIMIT``)
+            before: Cursor; return items older than it
+            after: Cursor; return items newer than it
+            role: Only items with this role ('user', 'system' or 'ai')
+            expression: Only user messages with this expression
+            since: Only items created at or after this ISO timestamp
+            until: Only items created before this ISO timestamp
+            include_timeline: Decode and include each AI response's
+                'timeline'; lists leave it out
+
+        Returns:
+            Dictionary with 'items', 'next_cursor' (older page, or None) and
+            'prev_cursor' (newer items, for polling)
+
+        Raises:
+            ValueError: If a cursor is malformed or both cursors are given
+            RuntimeError: If the query fails
+        """
+        if before and after:
+            raise ValueError('Pass either before or after, not both')
+        limit = max(1, min(int(limit), FEED_MAX_LIMIT))
+        cursor = decode_cursor(before or after) if (before or after) else None
+        newer = after is not None
+        order = 'ASC' if newer else 'DESC'
+        op = '>' if newer else '<'
+
+        branches, params = [], []
+        for kind, (table, columns) in FEED_SOURCES.items():
+            if kind == 'ai_response' and ((role and role != 'ai') or expression):
+                continue
+            if kind == 'message' and role == 'ai':
+                continue
+            where, args = [], []
+            if kind == 'message' and role:
+                where.append('role = ?')
+                args.append(role)
+            if expression:
+                where.append('expression = ?')
+                args.append(expression)
+            if since:
+                where.append('created_at >= ?')
+                args.append(since)
+            if until:
+                where.append('created_at < ?')
+                args.append(until)
+            if cursor:
+                created_at, cursor_kind, row_id = cursor
+                if kind == cursor_kind:
+                    where.append(f'(created_at, id) {op} (?, ?)')
+                    args.extend([created_at, row_id])
+                elif (kind > cursor_kind) == newer:
+                    # same timestamp sorts on this side of the cursor
+                    where.append(f'created_at {op}= ?')
+                    args.append(created_at)
+                else:
+                    where.append(f'created_at {op} ?')
+                    args.append(created_at)
+            clause = ('WHERE ' + ' AND '.join(where)) if where else ''
+            branches.append(
+                f"SELECT * FROM (SELECT '{kind}' AS type, id, {columns} FROM {table} {clause} "
+                f"ORDER BY created_at {order}, id {order} LIMIT ?)"
+            )
+            params.extend(args + [limit + 1])
+        if not branches:
+            return {'items': [], 'next_cursor': None, 'prev_cursor': after}
+
+        sql = (' UNION ALL '.join(branches) +
+               f' ORDER BY created_at {order}, type {order}, id {order} LIMIT ?')
+        try:
+            rows = self._reader().execute(sql, params + [limit + 1]).fetchall()
+        except sqlite3.Error as e:
+            raise RuntimeError(f'Failed to query conversation feed: {e}')
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if newer:
+            rows.reverse()
+        items = [self._feed_item(row, include_timeline) for row in rows]
+
+        def cursor_of(item):
+            return encode_cursor(item['created_at'], item['type'], item['id'])
+
+        older_exist = newer or more
+        return {
+            'items': items,
+            'next_cursor': cursor_of(items[-1]) if items and older_exist else None,
+            'prev_cursor': cursor_of(items[0]) if items else (after or before),
+        }
+
+    @staticmethod
+    def _feed_item(row: sqlite3.Row, include_timeline: bool = False) -> Dict[str, Any]:
+        """Shape a feed row like the items /admin/conversations returns."""
+        if row['type'] == 'message':
+            return {
+                'type': 'message',
+                'id': row['id'],
+                'role': row['role'],
+                'text': row['text'],
+                'expression': row['expression'],
+                'created_at': row['created_at'],
+            }
+        item = {
+            'type': 'ai_response',
+            'id': row['id'],
+            'text': row['text'],
+            'audio_id': row['audio_id'],
+            'audio_segments': decode_audio_segments(row['audio_segments'], row['audio_id']),
+            'created_at': row['created_at'],
+        }
+        if include_timeline:
+            item['timeline'] = decode_timeline(row['timeline'])
+        return item
+
+    def export_batches(
+        self,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        after: Optional[str] = None,
+        batch: int = EXPORT_BATCH
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """Yield feed items oldest first, one keyset page at a time.
+
+        Each query reads one page and releases its snapshot, so exports of any
+        size use constant memory and never pin the WAL. Every item carries a
+        'cursor'; passing the last one received as ``after`` resumes the export.
+
+        Args:
+            since: Only items created at or after this ISO timestamp
+            until: Only items created before this ISO timestamp
+            after: Cursor to resume after
+            batch: Items per query
+
+        Raises:
+            ValueError: If the cursor is malformed
+            RuntimeError: If a query fails
+        """
+        cursor = after or EXPORT_START
+        while True:
+            items = self.get_feed(limit=batch, after=cursor, since=since, until=until, include_timeline=True)['items']
+            if not items:
+                return
+            items.reverse()
+            for item in items:
+                item['cursor'] = encode_cursor(item['created_at'], item['type'], item['id'])
+            cursor = items[-1]['cursor']
+            yield items
+
+    async def aexport_batches(self, **kwargs) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Async ``export_batches``; each page is read on the read pool."""
+        batches = self.export_batches(**kwargs)
+        while True:
+            items = await self._run_read(next, batches, None)
+            if items is None:
+                return
+            yield items
+
+    async def aget_feed(self, **kwargs) -> Dict[str, Any]:
+        """Async ``get_feed`` run on the read pool."""
+        return await self._run_read(lambda: self.get_feed(**kwargs))
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        role: Optional[str] = None,
+        expression: Optional[str] = None,
+        raw: bool = False
+    ) -> Dict[str, Any]:
+        """Full-text search over messages and AI responses, best match first.
+
+        Args:
+            query: Words to find (all must match; a trailing * matches a prefix)
+            limit: Maximum results (capped at ``SEARCH_MAX_LIMIT``)
+            offset: Results to skip, for paging
+            role: Only results with this role ('user', 'system' or 'ai')
+            expression: Only user messages with this expression
+            raw: Pass ``query`` to FTS5 unchanged (phrases, OR, NEAR, ...)
+
+        Returns:
+            Dictionary with 'items' (type, id, role, expression, created_at,
+            snippet with <mark> highlights, bm25 score) and 'next_offset'
+
+        Raises:
+            ValueError: If the query is empty or not valid FTS5 syntax
+            RuntimeError: If the query fails
+        """
+        match = query if raw else _fts_query(query)
+        if not match:
+            raise ValueError('Empty search query')
+        limit = max(1, min(int(limit), SEARCH_MAX_LIMIT))
+        offset = max(0, int(offset))
+        where, args = ['conversation_fts MATCH ?'], [match]
+        if role:
+            where.append('role = ?')
+            args.append(role)
+        if expression:
+            where.append('expression = ?')
+            args.append(expression)
+        sql = (
+            "SELECT type, ref_id, role, expression, created_at, "
+            "snippet(conversation_fts, 0, '<mark>', '</mark>', '…', 16) AS snippet, "
+            "bm25(conversation_fts) AS score "
+            f"FROM conversation_fts WHERE {' AND '.join(where)} ORDER BY rank LIMIT ? OFFSET ?"
+        )
+        try:
+            rows = self._reader().execute(sql, args + [limit + 1, offset]).fetchall()
+        except sqlite3.OperationalError as e:
+            # the statement itself is fixed, so syntax errors come from the query
+            if raw or 'fts5' in str(e):
+                raise ValueError(f'Invalid search query: {e}')
+            raise RuntimeError(f'Failed to search conversations: {e}')
+        except sqlite3.Error as e:
+            raise RuntimeError(f'Failed to search conversations: {e}')
+        more = len(rows) > limit
+        items = [{
+            'type': row['type'],
+            'id': row['ref_id'],
+            'role': row['role'],
+            'expression': row['expression'],
+            'created_at': row['created_at'],
+            'snippet': row['snippet'],
+            'score': row['score'],
+        } for row in rows[:limit]]
+        return {'items': items, 'next_offset': offset + limit if more else None}
+
+    async def asearch(self, query: str, **kwargs) -> Dict[str, Any]:
+        """Async ``search`` run on the read pool."""
+        return await self._run_read(lambda: self.search(query, **kwargs))
+
+    def rebuild_search_index(self, batch: int = SEARCH_REBUILD_BATCH) -> int:
+        """Rebuild the full-text index from both tables.
+
+        Runs as a series of small write jobs so live inserts keep flowing
+        between them; rows inserted meanwhile are indexed by the triggers.
+
+        Returns:
+            Number of rows indexed
+
+        Raises:
+            RuntimeError: If a write fails
+        """
+        self.submit_write(lambda conn: conn.execute('DELETE FROM conversation_fts')).result()
+        sources = (
+            ('messages', "id * 2, text, 'message', id, role, expression, created_at"),
+            ('ai_responses', "id * 2 + 1, text, 'ai_response', id, 'ai', NULL, created_at"),
+        )
+        total = 0
+        for table, columns in sources:
+            last_id = 0
+            while True:
+                def job(conn, last_id=last_id):
+                    rows = conn.execute(
+                        f'SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?', (last_id, batch)
+                    ).fetchall()
+                    if not rows:
+                        return 0, last_id
+                    conn.execute(
+                        'INSERT OR REPLACE INTO conversation_fts '
+                        '(rowid, text, type, ref_id, role, expression, created_at) '
+                        f'SELECT {columns} FROM {table} WHERE id > ? AND id <= ?',
+                        (last_id, rows[-1][0])
+                    )
+                    return len(rows), rows[-1][0]
+                count, last_id = self.submit_write(job).result()
+                if not count:
+                    break
+                total += count
+        self.search_index_stale = False
+        return total
+
+    async def aget_messages(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Async ``get_messages`` run on the read pool."""
+        return await self._run_read(self.get_messages, limit)
+
+    async def aget_ai_responses(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Async ``get_ai_responses`` run on the read pool."""
+        return await self._run_read(self.get_ai_responses, limit)
+
 
 # Global database instance
 db = DatabaseManager()
\ No newline at end of file
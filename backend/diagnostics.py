@@ -0,0 +1,213 @@
+import asyncio
+import hmac
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional, Dict, Any, List
+
+try:
+    from metrics import loop_lag_seconds
+except ImportError:
+    from .metrics import loop_lag_seconds
+
+"""
+Production diagnostics: an on-demand sampling profiler and an event-loop
+lag monitor.
+
+``SamplingProfiler`` samples the stack of every thread from a separate
+thread at a fixed interval (``sys._current_frames``), so the profiled code
+runs unmodified and the cost is one stack walk per thread per sample. The
+result is in collapsed-stack format (``thread;outer;...;inner count``),
+which flamegraph.pl, speedscope and inferno read directly.
+
+``LoopMonitor`` runs a heartbeat task on the event loop and a watchdog
+thread. When the heartbeat is late by more than the threshold, the watchdog
+logs the loop thread's stack while the blocking callback is still running.
+Every heartbeat's lateness goes into the ``ihub_loop_lag_seconds`` histogram.
+
+Both expose stacks, so their endpoints require ``IHUB_ADMIN_TOKEN``.
+"""
+
+# Token required by admin diagnostics endpoints; unset disables them
+ADMIN_TOKEN = os.environ.get('IHUB_ADMIN_TOKEN', '')
+
+# Seconds between profiler samples
+PROFILE_INTERVAL = float(os.environ.get('IHUB_PROFILE_INTERVAL', '0.01'))
+
+# Longest profile one request may take
+PROFILE_MAX_SECONDS = 120.0
+
+# Loop blocked for longer than this (seconds) is logged with its stack
+LOOP_LAG_THRESHOLD = float(os.environ.get('IHUB_LOOP_LAG_THRESHOLD', '0.25'))
+
+# Seconds between heartbeats
+LOOP_CHECK_INTERVAL = 0.05
+
+# Stalls kept for /admin/loop
+STALL_HISTORY = 20
+
+# Innermost frames logged for a stall
+STALL_STACK_DEPTH = 30
+
+logger = logging.getLogger('ihub.diagnostics')
+
+
+def check_admin_token(token: Optional[str]) -> bool:
+    """Return whether ``token`` matches ``IHUB_ADMIN_TOKEN`` (always False when unset)."""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over all threads of the process."""
+
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        """Initialize the profiler.
+
+        Args:
+            interval: Default seconds between samples
+        """
+        self.interval = interval
+        self._busy = threading.Lock()
+        self._labels: Dict[Any, str] = {}
+
+    def _label(self, frame) -> str:
+        code = frame.f_code
+        label = self._labels.get(code)
+        if label is None:
+            module = frame.f_globals.get('__name__', '?')
+            name = getattr(code, 'co_qualname', code.co_name)
+            # ';' separates frames and ' ' the count in collapsed stacks
+            label = f'{module}.{name}'.replace(';', ':').replace(' ', '_')
+            self._labels[code] = label
+        return label
+
+    def profile(self, seconds: float, interval: Optional[float] = None) -> Dict[str, Any]:
+        """Sample every thread for ``seconds``, blocking the calling thread.
+
+        Args:
+            seconds: Profiling duration, capped at ``PROFILE_MAX_SECONDS``
+            interval: Seconds between samples; defaults to the profiler's
+
+        Returns:
+            Dict with 'stacks' (collapsed stack -> sample count), 'samples'
+            and 'seconds'
+
+        Raises:
+            RuntimeError: If a profile is already running
+        """
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError('A profile is already running')
+        try:
+            interval = max(0.001, interval or self.interval)
+            me = threading.get_ident()
+            stacks: Dict[str, int] = {}
+            samples = 0
+            started = time.monotonic()
+            deadline = started + min(max(seconds, 0.0), PROFILE_MAX_SECONDS)
+            while time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == me:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(self._label(frame))
+                        frame = frame.f_back
+                    labels.append(names.get(ident, f'thread-{ident}').replace(';', ':').replace(' ', '_'))
+                    key = ';'.join(reversed(labels))
+                    stacks[key] = stacks.get(key, 0) + 1
+                samples += 1
+                time.sleep(interval)
+            return {'stacks': stacks, 'samples': samples, 'seconds': time.monotonic() - started}
+        finally:
+            self._busy.release()
+
+    @staticmethod
+    def collapsed(result: Dict[str, Any]) -> str:
+        """Format a profile as collapsed stacks, one ``stack count`` per line."""
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(result['stacks'].items()))
+
+
+class LoopMonitor:
+    """Detects callbacks that block the event loop and records loop lag."""
+
+    def __init__(self, threshold: float = LOOP_LAG_THRESHOLD, interval: float = LOOP_CHECK_INTERVAL):
+        """Initialize the monitor.
+
+        Args:
+            threshold: Seconds of blocking that get logged with a stack
+            interval: Seconds between heartbeats
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: deque = deque(maxlen=STALL_HISTORY)
+        self.max_lag = 0.0
+        self._beat = time.monotonic()
+        self._loop_thread: Optional[int] = None
+        self._pending: Optional[Dict[str, Any]] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    def start(self) -> None:
+        """Start monitoring the running event loop."""
+        if self._task is not None:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        threading.Thread(target=self._watchdog, name='loop-watchdog', daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop the heartbeat and the watchdog."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - before - self.interval)
+            self._beat = now
+            loop_lag_seconds.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+            stall = self._pending
+            if stall is not None:
+                # the blocking callback has returned; record how long it held the loop
+                stall['blocked_ms'] = round(lag * 1000, 1)
+                self._pending = None
+
+    def _watchdog(self) -> None:
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            late = time.monotonic() - beat - self.interval
+            if late <= self.threshold or self._pending is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = ''.join(traceback.format_stack(frame, STALL_STACK_DEPTH)) if frame is not None else ''
+            stall = {'at': time.time(), 'blocked_ms': round(late * 1000, 1), 'stack': stack}
+            self.stalls.append(stall)
+            self._pending = stall
+            logger.warning('Event loop blocked for over %.0f ms in:\n%s', late * 1000, stack)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the threshold, worst lag seen and the most recent stalls with their stacks."""
+        stalls: List[Dict[str, Any]] = list(self.stalls)
+        return {
+            'threshold_ms': self.threshold * 1000,
+            'max_lag_ms': round(self.max_lag * 1000, 1),
+            'stalls': stalls[::-1],
+        }
+
+
+profiler = SamplingProfiler()
+loop_monitor = LoopMonitor()
@@ -1,30 +1,21 @@
 import torch
 import torch.nn.functional as F
-from transformers import AutoImageProcessor, AutoModelForImageClassification
 from typing import Tuple, Dict, Optional
 from PIL.Image import Image
 
+try:
+    from model_store import get_store, fetch_emotion
+except ImportError:
+    from .model_store import get_store, fetch_emotion
+
 """
 Centralized model loading module for AI character pipeline.
 
-Provides cached loading of STT and emotion detection models to optimize
+Provides cached loading of the emotion detection model to optimize
 performance and ensure consistent model usage across the application.
+Speech-to-text models are loaded by ``pipeline.stt``.
 """
 
-# ============================================
-# STT Model Loading
-# ============================================
-try:
-    stt_model, stt_decoder, stt_utils = torch.hub.load(
-        repo_or_dir='snakers4/silero-models',
-        model='silero_stt',
-        language='en',
-        device='cpu'
-    )
-except Exception as e:
-    raise RuntimeError(f'Failed to initialize STT model: {e}')
-
-
 # ============================================
 # Emotion Detection Model Loading
 # ============================================
@@ -33,10 +24,11 @@ _emotion_processor_cache = None
 
 
 def load_emotion_model() -> Tuple[object, object]:
-    """Load emotion detection model from Hugging Face.
+    """Load emotion detection model.
     
-    Loads the facial emotion detection model with caching to avoid redundant
-    downloads and initialization on subsequent calls.
+    Loads the pre-quantized facial emotion detection model from the local
+    model store when one has been built, otherwise downloads it from Hugging
+    Face and quantizes it. Cached to avoid repeated loads.
     
     Returns:
         Tuple of (model, processor) for emotion detection
@@ -50,17 +42,11 @@ def load_emotion_model() -> Tuple[object, object]:
         return _emotion_model_cache, _emotion_processor_cache
     
     try:
-        model_name = "dima806/facial_emotions_image_detection"
-        
-        # Load processor and model
-        processor = AutoImageProcessor.from_pretrained(model_name, use_fast=True)
-        model = AutoModelForImageClassification.from_pretrained(model_name)
-        model.eval()
-        
-        # Quantize for CPU performance optimization
-        model = torch.quantization.quantize_dynamic(
-            model, {torch.nn.Linear}, dtype=torch.qint8
-        )
+        store = get_store()
+        if store is not None:
+            model, processor = store.load_emotion()
+        else:
+            model, processor = fetch_emotion()
         
         _emotion_model_cache = model
         _emotion_processor_cache = processor
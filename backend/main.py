@@ -1,6 +1,9 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
 from fastapi.staticfiles import StaticFiles
+import asyncio
+import json
 import os
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI(
@@ -21,31 +24,26 @@ app.add_middleware(
 )
 
 
-class ConnectionManager:
-    def __init__(self):
-        self.active: list[WebSocket] = []
+try:
+    from connections import ConnectionManager
+    from pubsub import create_bus
+except ImportError:
+    from .connections import ConnectionManager
+    from .pubsub import create_bus
 
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active.append(websocket)
 
-    def disconnect(self, websocket: WebSocket):
-        try:
-            self.active.remove(websocket)
-        except ValueError:
-            pass
+manager = ConnectionManager(bus=create_bus())
 
-    async def broadcast(self, message: str):
-        # send text message to all connected clients
-        for connection in list(self.active):
-            try:
-                await connection.send_text(message)
-            except Exception:
-                # ignore send errors
-                pass
+
+@app.on_event('startup')
+async def join_bus():
+    # With IHUB_BUS=unix, broadcasts reach the /ws clients of every worker
+    await manager.start()
 
 
-manager = ConnectionManager()
+@app.on_event('shutdown')
+async def leave_bus():
+    await manager.bus.close()
 
 
 @app.get("/")
@@ -54,17 +52,93 @@ async def root():
 
 
 # serve cache directory for audio files
-CACHE_DIR = os.path.join(os.path.dirname(__file__), 'cache')
-os.makedirs(CACHE_DIR, exist_ok=True)
+try:
+    from cache_manager import audio_cache, entry_id
+    from pipeline.transcode import COMPACT_EXT, COMPACT_MIME, TRANSCODE_ENABLED
+except ImportError:
+    from .cache_manager import audio_cache, entry_id
+    from .pipeline.transcode import COMPACT_EXT, COMPACT_MIME, TRANSCODE_ENABLED
+
+CACHE_DIR = audio_cache.directory
 app.mount('/cache', StaticFiles(directory=CACHE_DIR), name='cache')
 
 
+@app.on_event('startup')
+async def start_cache_janitor():
+    # Trim the audio cache to its quota and maximum age in the background
+    app.state.cache_janitor = asyncio.create_task(audio_cache.run_janitor())
+
+
+@app.get('/admin/cache/stats')
+async def admin_cache_stats():
+    """Return audio cache size, quota and eviction counters."""
+    return audio_cache.stats()
+
+
+# Cached audio never changes once written (IDs are content hashes or random), so clients may keep it
+AUDIO_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# For a bare ID served as the original while its preferred compact variant is still being encoded
+AUDIO_PENDING_CACHE_CONTROL = 'public, max-age=5, must-revalidate'
+
+# Responses and bytes served by /audio, per file extension
+audio_serving_stats = {'requests': 0, 'not_modified': 0, 'bytes': {}}
+
+
+def _accept_quality(accept: str, mime_type: str) -> float:
+    """Return the q-value an Accept header gives a MIME type (0 if not acceptable)."""
+    if not accept:
+        return 1.0
+    major = mime_type.split('/', 1)[0]
+    best, best_rank = 0.0, -1
+    for part in accept.split(','):
+        fields = [f.strip() for f in part.split(';')]
+        media = fields[0].lower()
+        rank = 2 if media == mime_type else 1 if media == f'{major}/*' else 0 if media == '*/*' else -1
+        if rank < best_rank or rank < 0:
+            continue
+        q = 1.0
+        for f in fields[1:]:
+            if f.startswith('q='):
+                try:
+                    q = float(f[2:])
+                except ValueError:
+                    q = 0.0
+        best, best_rank = q, rank
+    return best
+
+
+def _range_length(range_header: str, size: int) -> int:
+    """Return how many bytes a Range header asks for (the whole file if unparsable)."""
+    try:
+        unit, _, spec = range_header.partition('=')
+        if unit.strip() != 'bytes':
+            return size
+        total = 0
+        for part in spec.split(','):
+            start, _, end = part.strip().partition('-')
+            if not start:
+                total += min(size, int(end))
+            else:
+                total += min(size - 1, int(end) if end else size - 1) - int(start) + 1
+        return max(0, min(size, total))
+    except ValueError:
+        return size
+
+
 @app.get('/audio/{filename}')
-async def stream_audio(filename: str):
+async def stream_audio(filename: str, request: Request):
     """Stream an audio file from the cache directory.
+
+    A bare audio ID is served as its compact Opus variant when the client's
+    Accept header prefers it and the variant has been encoded. Responses
+    carry immutable cache headers and a strong ETag, except a bare ID served
+    as the original while its compact variant is pending, which clients
+    must revalidate. Range requests are answered with partial content.
     
     Args:
         filename: Audio filename (with or without extension)
+        request: Incoming request (Accept, If-None-Match and Range headers)
         
     Returns:
         FileResponse with appropriate content type
@@ -72,7 +146,7 @@ async def stream_audio(filename: str):
     Raises:
         HTTPException(404): When file is not found
     """
-    from fastapi.responses import FileResponse
+    from fastapi.responses import FileResponse, Response
     from fastapi import HTTPException
     import mimetypes
 
@@ -81,18 +155,26 @@ async def stream_audio(filename: str):
     if not safe_name:
         raise HTTPException(status_code=400, detail='Invalid filename')
 
-    # Attempt to find file
-    path = os.path.join(CACHE_DIR, safe_name)
-    if not os.path.exists(path):
-        # Try to find files that start with the requested name (handle missing extensions)
-        try:
-            candidates = [f for f in os.listdir(CACHE_DIR) if f.startswith(safe_name)]
-            if candidates:
-                path = os.path.join(CACHE_DIR, candidates[0])
-            else:
-                raise HTTPException(status_code=404, detail='Audio file not found')
-        except (OSError, FileNotFoundError):
-            raise HTTPException(status_code=404, detail='Audio file not found')
+    # Resolve the exact filename, or a bare audio ID to its file, from the cache index
+    path = audio_cache.lookup(safe_name)
+    if path is None:
+        raise HTTPException(status_code=404, detail='Audio file not found')
+
+    # Determine MIME type
+    mime_type, _ = mimetypes.guess_type(path)
+    mime_type = mime_type or 'application/octet-stream'
+
+    # Negotiate the compact variant for bare-ID requests
+    accept = request.headers.get('accept', '')
+    cache_control = AUDIO_CACHE_CONTROL
+    if safe_name == entry_id(safe_name) and mime_type != COMPACT_MIME:
+        if _accept_quality(accept, COMPACT_MIME) > _accept_quality(accept, mime_type):
+            compact_path = audio_cache.lookup(safe_name + COMPACT_EXT)
+            if compact_path:
+                path, mime_type = compact_path, COMPACT_MIME
+            elif TRANSCODE_ENABLED:
+                # the same URL will soon serve the compact variant; don't let clients pin this one
+                cache_control = AUDIO_PENDING_CACHE_CONTROL
 
     # Verify the file is within cache directory (security check)
     try:
@@ -103,73 +185,406 @@ async def stream_audio(filename: str):
     except (OSError, ValueError):
         raise HTTPException(status_code=403, detail='Access denied')
 
-    # Determine MIME type
-    mime_type, _ = mimetypes.guess_type(path)
-    mime_type = mime_type or 'application/octet-stream'
-
     try:
-        return FileResponse(
-            path,
-            media_type=mime_type,
-            filename=os.path.basename(path)
-        )
-    except (OSError, FileNotFoundError):
+        st = os.stat(path)
+    except OSError:
         raise HTTPException(status_code=404, detail='Audio file not accessible')
 
+    served_name = os.path.basename(path)
+    etag = f'"{served_name}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+    headers = {'Cache-Control': cache_control, 'ETag': etag, 'Vary': 'Accept'}
+    audio_serving_stats['requests'] += 1
+
+    if_none_match = request.headers.get('if-none-match', '')
+    if if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]:
+        audio_serving_stats['not_modified'] += 1
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get('range')
+    served = _range_length(range_header, st.st_size) if range_header else st.st_size
+    ext = os.path.splitext(served_name)[1] or 'none'
+    audio_serving_stats['bytes'][ext] = audio_serving_stats['bytes'].get(ext, 0) + served
+
+    # FileResponse answers Range / If-Range requests with 206 partial content
+    return FileResponse(
+        path,
+        media_type=mime_type,
+        filename=served_name,
+        headers=headers,
+        stat_result=st
+    )
+
+
+@app.get('/admin/audio/stats')
+async def admin_audio_stats():
+    """Return /audio request, revalidation and byte counters."""
+    return audio_serving_stats
+
 
 @app.websocket("/ws")
-async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+async def websocket_endpoint(websocket: WebSocket, topics: Optional[str] = None):
+    """Broadcast channel. ``?topics=speech,chat`` limits the topics received
+    (all by default); clients may also send ``{"action": "subscribe" |
+    "unsubscribe", "topics": [...]}``."""
+    await manager.connect(websocket, topics.split(',') if topics else None)
     try:
         while True:
             data = await websocket.receive_text()
+            try:
+                request = json.loads(data)
+            except ValueError:
+                request = None
+            if isinstance(request, dict) and 'action' in request:
+                topics = request.get('topics') or []
+                topics = [topics] if isinstance(topics, str) else [t for t in topics if isinstance(t, str)]
+                if request['action'] == 'subscribe':
+                    manager.subscribe(websocket, topics)
+                    continue
+                if request['action'] == 'unsubscribe':
+                    manager.unsubscribe(websocket, topics)
+                    continue
             # simple broadcast behavior: echo to all
             await manager.broadcast(data)
     except WebSocketDisconnect:
+        pass
+    finally:
         manager.disconnect(websocket)
 
 
+@app.get('/admin/connections')
+async def admin_connections():
+    """Return /ws client count, send queue depths and fan-out counters."""
+    return manager.stats()
+
+
 # Admin endpoint to fetch conversation history
 try:
     # package mode
-    from .database import db
+    from .database import db, decode_cursor
 except Exception:
     # script/module mode
-    from database import db
+    from database import db, decode_cursor
 
 
 @app.get('/admin/conversations')
-async def admin_conversations(limit: int = 100):
-    """Return recent messages and AI responses merged by created time (most recent first)."""
-    msgs = db.get_messages(limit=limit)
-    ais = db.get_ai_responses(limit=limit)
-
-    # Normalize rows with created_at
-    def normalize_msg(m):
-        return {
-            'type': 'message',
-            'id': m.get('id'),
-            'text': m.get('text'),
-            'created_at': m.get('created_at')
-        }
-
-    def normalize_ai(a):
-        return {
-            'type': 'ai_response',
-            'id': a.get('id'),
-            'text': a.get('text'),
-            'timeline': a.get('timeline'),
-            'audio_id': a.get('audio_id'),
-            'created_at': a.get('created_at')
-        }
-
-    combined = [normalize_msg(m) for m in msgs] + [normalize_ai(a) for a in ais]
-    # sort by created_at descending (DB stores ISO timestamps)
+async def admin_conversations(
+    limit: int = 100,
+    before: Optional[str] = None,
+    after: Optional[str] = None,
+    role: Optional[str] = None,
+    expression: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    include_timeline: bool = False
+):
+    """Return one page of messages and AI responses, most recent first.
+
+    Pass ``next_cursor`` back as ``before`` for older items, or
+    ``prev_cursor`` as ``after`` to poll for newer ones. AI responses carry
+    their animation 'timeline' only with ``include_timeline=true``.
+
+    Raises:
+        HTTPException(400): When a cursor is invalid
+    """
+    from fastapi import HTTPException
+
     try:
-        combined.sort(key=lambda x: x.get('created_at') or '', reverse=True)
-    except Exception:
-        pass
-    return {'items': combined}
+        return await db.aget_feed(
+            limit=limit, before=before, after=after, role=role,
+            expression=expression, since=since, until=until,
+            include_timeline=include_timeline
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.on_event('startup')
+async def build_search_index():
+    # Index rows written before full-text search existed, without delaying startup
+    if db.search_index_stale:
+        app.state.search_rebuild = asyncio.create_task(asyncio.to_thread(db.rebuild_search_index))
+
+
+@app.get('/admin/search')
+async def admin_search(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    role: Optional[str] = None,
+    expression: Optional[str] = None,
+    raw: bool = False
+):
+    """Full-text search over messages and AI responses, ranked by bm25.
+
+    Results carry a highlighted snippet; pass ``next_offset`` back as
+    ``offset`` for the next page.
+
+    Raises:
+        HTTPException(400): When the query is empty or invalid
+    """
+    from fastapi import HTTPException
+
+    try:
+        return await db.asearch(q, limit=limit, offset=offset, role=role, expression=expression, raw=raw)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post('/admin/search/rebuild')
+async def admin_search_rebuild(request: Request):
+    """Rebuild the full-text index from the conversation tables. Requires the admin token."""
+    require_admin(request)
+    indexed = await asyncio.to_thread(db.rebuild_search_index)
+    return {'indexed': indexed}
+
+
+@app.get('/admin/export')
+async def admin_export(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    after: Optional[str] = None,
+    gzip: bool = False
+):
+    """Stream every message and AI response as NDJSON, oldest first.
+
+    Rows are read in keyset pages and written as they are read, so memory
+    use does not depend on the export size. Each line carries a 'cursor';
+    pass the last one received as ``after`` to resume an interrupted export.
+    With ``gzip=true`` the body is gzip-compressed (Content-Encoding: gzip).
+
+    Raises:
+        HTTPException(400): When the cursor is invalid
+    """
+    import zlib
+    from fastapi import HTTPException
+    from fastapi.responses import StreamingResponse
+
+    if after:
+        try:
+            decode_cursor(after)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def lines():
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+        async for items in db.aexport_batches(since=since, until=until, after=after):
+            chunk = ''.join(json.dumps(item, separators=(',', ':')) + '\n' for item in items).encode('utf-8')
+            if compressor:
+                chunk = compressor.compress(chunk)
+            if chunk:
+                yield chunk
+        if compressor:
+            yield compressor.flush()
+
+    headers = {'Content-Disposition': 'attachment; filename="conversations.ndjson"'}
+    if gzip:
+        headers['Content-Encoding'] = 'gzip'
+    return StreamingResponse(lines(), media_type='application/x-ndjson', headers=headers)
+
+
+try:
+    from retention import retention, query_history
+except ImportError:
+    from .retention import retention, query_history
+
+
+@app.on_event('startup')
+async def start_retention():
+    # Archive old conversation rows and reclaim their space in the background; opt-in
+    if retention.enabled:
+        app.state.retention = asyncio.create_task(retention.run_scheduler())
+
+
+@app.get('/admin/retention')
+async def admin_retention():
+    """Return retention progress, settings and archive files."""
+    return retention.stats()
+
+
+@app.post('/admin/retention/run')
+async def admin_retention_run(request: Request):
+    """Run retention now and return its progress counters. Requires the admin token."""
+    require_admin(request)
+    await retention.run_once()
+    return retention.stats()
+
+
+@app.post('/admin/retention/vacuum')
+async def admin_retention_vacuum(request: Request):
+    """Switch the database to incremental auto_vacuum with a one-off VACUUM. Requires the admin token.
+
+    Needed once for databases created before retention existed. The VACUUM
+    rewrites the file and blocks writes while it runs.
+
+    Raises:
+        HTTPException(409): When a retention run is in progress
+    """
+    from fastapi import HTTPException
+
+    require_admin(request)
+    if retention.running:
+        raise HTTPException(status_code=409, detail='Retention is running; try again when it is idle')
+    return await retention.run_migrate_vacuum()
+
+
+@app.get('/admin/history')
+async def admin_history(
+    table: str = 'messages',
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 100
+):
+    """Return rows from the live database and the read-only archives, newest first.
+
+    Raises:
+        HTTPException(400): When the table is unknown
+    """
+    from fastapi import HTTPException
+
+    try:
+        items = await asyncio.to_thread(query_history, table, since, until, max(1, min(limit, 1000)))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'items': items}
+
+
+try:
+    from pipeline.tts_cache import cache_stats as tts_cache_stats
+except ImportError:
+    from .pipeline.tts_cache import cache_stats as tts_cache_stats
+
+
+@app.get('/admin/tts/stats')
+async def admin_tts_stats():
+    """Return TTS result cache hit ratio and the remote calls it avoided."""
+    return tts_cache_stats()
+
+
+try:
+    from pipeline.resilience import stats as resilience_stats
+except ImportError:
+    from .pipeline.resilience import stats as resilience_stats
+
+
+@app.get('/admin/resilience')
+async def admin_resilience():
+    """Return circuit breaker state, latency percentiles and hedge counters."""
+    return resilience_stats()
+
+
+try:
+    from pipeline.scheduler import turn_scheduler
+except ImportError:
+    from .pipeline.scheduler import turn_scheduler
+
+
+@app.get('/admin/turns')
+async def admin_turns():
+    """Return turn scheduler limits, running and waiting turns, and rejections."""
+    return turn_scheduler.stats()
+
+
+try:
+    from metrics import registry, sessions, queue_depth, cache_entries, cache_bytes, CONTENT_TYPE
+    from metrics import process_resident_bytes, resident_bytes, active_turns
+except ImportError:
+    from .metrics import registry, sessions, queue_depth, cache_entries, cache_bytes, CONTENT_TYPE
+    from .metrics import process_resident_bytes, resident_bytes, active_turns
+
+
+def collect_gauges():
+    """Refresh gauges that mirror other components' state."""
+    ws = manager.stats()
+    sessions.labels('ws').set(ws['clients'])
+    queue_depth.labels('ws_send').set(ws['queued'])
+    queue_depth.labels('db_write').set(db.write_stats()['queued'])
+    audio = audio_cache.stats()
+    cache_entries.labels('audio').set(audio['entries'])
+    cache_bytes.labels('audio').set(audio['bytes'])
+    cache_entries.labels('tts_result').set(tts_cache_stats()['entries'])
+    active_turns.set(turn_scheduler.running)
+    queue_depth.labels('turns').set(turn_scheduler.queued)
+    process_resident_bytes.set(resident_bytes())
+
+
+registry.add_collector(collect_gauges)
+
+
+@app.get('/metrics')
+async def metrics():
+    """Return stage latency histograms, counters and gauges in Prometheus text format."""
+    from fastapi.responses import Response
+
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
+
+try:
+    from diagnostics import profiler, loop_monitor, check_admin_token, SamplingProfiler, ADMIN_TOKEN
+except ImportError:
+    from .diagnostics import profiler, loop_monitor, check_admin_token, SamplingProfiler, ADMIN_TOKEN
+
+
+def require_admin(request: Request) -> None:
+    """Reject the request unless it carries the admin token.
+
+    The token is read from ``Authorization: Bearer <token>`` or ``X-Admin-Token``.
+
+    Raises:
+        HTTPException(403): When no admin token is configured
+        HTTPException(401): When the token is missing or wrong
+    """
+    from fastapi import HTTPException
+
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail='Set IHUB_ADMIN_TOKEN to enable this endpoint')
+    auth = request.headers.get('authorization', '')
+    token = auth[7:] if auth.lower().startswith('bearer ') else request.headers.get('x-admin-token')
+    if not check_admin_token(token):
+        raise HTTPException(status_code=401, detail='Invalid admin token')
+
+
+@app.on_event('startup')
+async def start_loop_monitor():
+    # Logs the stack of any callback blocking the loop past IHUB_LOOP_LAG_THRESHOLD
+    if os.environ.get('IHUB_LOOP_MONITOR', '1') != '0':
+        loop_monitor.start()
+
+
+@app.on_event('shutdown')
+async def stop_loop_monitor():
+    loop_monitor.stop()
+
+
+@app.post('/admin/profile')
+async def admin_profile(request: Request, seconds: float = 10.0, interval_ms: Optional[float] = None):
+    """Sample every thread for ``seconds`` and return collapsed stacks.
+
+    The response is plain text, one ``stack count`` line per distinct stack,
+    ready for flamegraph.pl or speedscope. Requires the admin token.
+
+    Raises:
+        HTTPException(409): When a profile is already running
+    """
+    from fastapi import HTTPException
+    from fastapi.responses import PlainTextResponse
+
+    require_admin(request)
+    interval = interval_ms / 1000 if interval_ms else None
+    try:
+        result = await asyncio.to_thread(profiler.profile, seconds, interval)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(
+        SamplingProfiler.collapsed(result),
+        headers={'X-Profile-Samples': str(result['samples']), 'X-Profile-Seconds': f"{result['seconds']:.2f}"},
+    )
+
+
+@app.get('/admin/loop')
+async def admin_loop(request: Request):
+    """Return event-loop lag and the stacks of recent stalls. Requires the admin token."""
+    require_admin(request)
+    return loop_monitor.stats()
 
 
 try:
@@ -0,0 +1,265 @@
+import math
+import os
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple, Callable, Sequence
+
+"""
+In-process metrics exposed in the Prometheus text format.
+
+Counters, gauges and histograms are plain Python objects whose updates are
+a few attribute operations, cheap enough for the per-frame audio path
+(well under a microsecond; see ``bench/metrics_overhead.py``). Updates take
+no lock: every series here is updated from the event loop, and a rare lost
+increment from another thread is acceptable for monitoring.
+
+Labelled series are created on first use by ``labels(...)``; hot paths
+should look a series up once and keep it. Gauges derived from other
+components (queue depths, cache sizes) are refreshed by collectors that
+run on each scrape.
+
+Each worker process keeps its own registry, so with several uvicorn
+workers every scrape of ``/metrics`` sees one worker.
+"""
+
+# Seconds; stage latencies from 1 ms to a minute
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Seconds; per-frame work from 10 us to 250 ms
+FRAME_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                 0.1, 0.25)
+
+
+class Counter:
+    """Monotonically increasing value."""
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f'{name}_total{labels} {_number(self.value)}']
+
+
+class Gauge:
+    """Value that goes up and down."""
+
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        return [f'{name}{labels} {_number(self.value)}']
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram: 'Histogram'):
+        self.histogram = histogram
+
+    def __enter__(self) -> '_Timer':
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.started)
+
+
+class Histogram:
+    """Distribution of observations over fixed buckets."""
+
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        # one slot per bound plus the +Inf overflow
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def time(self) -> _Timer:
+        """Context manager observing the seconds spent inside it."""
+        return _Timer(self)
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def samples(self, name: str, labels: str) -> List[str]:
+        # inner labels of the series, to be joined with 'le'
+        inner = labels[1:-1] + ',' if labels else ''
+        lines, cumulative = [], 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{inner}le="{_number(bound)}"}} {cumulative}')
+        lines.append(f'{name}_sum{labels} {_number(self.sum)}')
+        lines.append(f'{name}_count{labels} {cumulative}')
+        return lines
+
+
+class Metric:
+    """A named metric and its series, one per combination of label values."""
+
+    def __init__(self, name: str, help_text: str, kind: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.series: Dict[Tuple[str, ...], object] = {}
+
+    def _new(self):
+        if self.kind == 'counter':
+            return Counter()
+        if self.kind == 'gauge':
+            return Gauge()
+        return Histogram(self.buckets)
+
+    def labels(self, *values: str):
+        """Return the series for a combination of label values, creating it on first use.
+
+        Raises:
+            ValueError: If the number of values does not match the label names
+        """
+        series = self.series.get(values)
+        if series is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f'{self.name} expects labels {self.labelnames}, got {values}')
+            series = self.series[values] = self._new()
+        return series
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for values, series in list(self.series.items()):
+            labels = ''
+            if values:
+                labels = '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)) + '}'
+            lines.extend(series.samples(self.name, labels))
+        return lines
+
+
+class Registry:
+    """The metrics of this process and the collectors refreshing derived gauges."""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+        self.collectors: List[Callable[[], None]] = []
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f'Metric already registered: {metric.name}')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        """Register a counter; returns the series itself when it has no labels.
+
+        The ``_total`` suffix is added on output.
+        """
+        metric = self._register(Metric(name, help_text, 'counter', labelnames))
+        return metric.labels() if not labelnames else metric
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        """Register a gauge; returns the series itself when it has no labels."""
+        metric = self._register(Metric(name, help_text, 'gauge', labelnames))
+        return metric.labels() if not labelnames else metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS):
+        """Register a histogram; returns the series itself when it has no labels."""
+        metric = self._register(Metric(name, help_text, 'histogram', labelnames, buckets))
+        return metric.labels() if not labelnames else metric
+
+    def add_collector(self, fn: Callable[[], None]) -> None:
+        """Run ``fn`` before every render, typically to set gauges from component stats."""
+        self.collectors.append(fn)
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        for fn in self.collectors:
+            try:
+                fn()
+            except Exception:
+                pass
+        lines: List[str] = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def resident_bytes() -> int:
+    """Return this process's resident set size (the peak where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# Text exposition content type served by /metrics
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+registry = Registry()
+
+# Per-stage latency of a voice turn. Stages: vad_to_transcript, llm,
+# tts_local_wait, tts_queue_wait, tts_synthesis, tts_download, first_audio,
+# db_write, emotion
+stage_seconds = registry.histogram('ihub_stage_seconds', 'Seconds spent in each stage of a turn', ('stage',))
+
+turn_seconds = registry.histogram('ihub_turn_seconds', 'Seconds from input to the complete reply', ('mode',))
+
+degraded = registry.counter('ihub_degraded_turns', 'Turns answered without a stage, by stage', ('stage',))
+
+vad_frame_seconds = registry.histogram(
+    'ihub_vad_frame_seconds', 'Seconds spent decoding and classifying one audio frame', buckets=FRAME_BUCKETS
+)
+
+audio_frames = registry.counter('ihub_audio_frames', 'Audio frames received on /ws-vad')
+
+video_frames = registry.counter('ihub_video_frames', 'Video frames received on /ws-video')
+
+sessions = registry.gauge('ihub_active_sessions', 'Open WebSocket sessions', ('endpoint',))
+
+queue_depth = registry.gauge('ihub_queue_depth', 'Items waiting in internal queues', ('queue',))
+
+cache_entries = registry.gauge('ihub_cache_entries', 'Entries held by each cache', ('cache',))
+
+cache_bytes = registry.gauge('ihub_cache_bytes', 'Bytes held by each cache', ('cache',))
+
+loop_lag_seconds = registry.histogram('ihub_loop_lag_seconds', 'Seconds the event loop heartbeat ran late')
+
+active_turns = registry.gauge('ihub_active_turns', 'Turns holding a scheduler slot')
+
+process_resident_bytes = registry.gauge('ihub_process_resident_bytes', 'Resident memory of this worker')
@@ -0,0 +1,399 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from itertools import groupby
+from typing import Dict, List, Any, Optional, Tuple
+
+import torch
+
+"""
+Versioned local store of the models the backend runs.
+
+``python -m model_store build`` downloads every model once and writes it,
+ready to run, to a new version directory under ``IHUB_MODEL_DIR``:
+
+    models/
+      CURRENT                    # name of the active version
+      20261019-120000/
+        manifest.json            # versions, formats and sha256 of every file
+        stt/model.jit            # Silero STT as TorchScript
+        stt/labels.json          # decoder alphabet
+        emotion/model.pt         # emotion classifier, already quantized
+        emotion/processor/       # image processor config
+
+At runtime ``ModelStore`` loads from those files only: no torch.hub code,
+no Hugging Face requests and no quantization pass. Files are checked
+against the manifest before first use.
+
+``IHUB_MODEL_SOURCE`` selects where models come from: ``artifacts`` (the
+store only; fail if it is missing), ``hub`` (download as before) or
+``auto`` (the store when one has been built, otherwise download).
+"""
+
+MODEL_DIR = os.environ.get('IHUB_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+
+# Version to load; empty uses the one named in CURRENT
+MODEL_VERSION = os.environ.get('IHUB_MODEL_VERSION', '')
+
+MODEL_SOURCE = os.environ.get('IHUB_MODEL_SOURCE', 'auto')
+SOURCES = ('auto', 'artifacts', 'hub')
+
+# Check file checksums before loading (hashes ~100 MB once per process)
+VERIFY = os.environ.get('IHUB_MODEL_VERIFY', '1') != '0'
+
+STT_REPO = 'snakers4/silero-models'
+STT_LANGUAGE = 'en'
+EMOTION_MODEL = 'dima806/facial_emotions_image_detection'
+
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'
+FORMAT_VERSION = 1
+
+logger = logging.getLogger('ihub.models')
+
+
+def file_sha256(path: str) -> str:
+    """Return the hex sha256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class GreedyDecoder:
+    """Greedy CTC decoder for Silero STT output.
+
+    Same output as the decoder shipped with the hub model: blanks are
+    dropped, repeated characters collapsed, and the '2' token doubles the
+    previous character.
+    """
+
+    def __init__(self, labels: List[str]):
+        """Initialize the decoder.
+
+        Args:
+            labels: Model alphabet, indexed like the model's output classes
+        """
+        self.labels = list(labels)
+        self.blank_idx = self.labels.index('_')
+        self.repeat_idx = self.labels.index('2') if '2' in self.labels else None
+
+    def __call__(self, probs: torch.Tensor) -> str:
+        """Decode one utterance's (frames, classes) output to text."""
+        chars: List[str] = []
+        for i in torch.argmax(probs, dim=1).tolist():
+            if i == self.repeat_idx:
+                # '$' keeps the doubled character from being collapsed
+                chars.extend(('$', chars[-1]) if chars else (' ',))
+            elif i != self.blank_idx:
+                chars.append(self.labels[i])
+        return ''.join(c for c, _ in groupby(chars)).replace('$', '').strip()
+
+
+def fetch_stt(device: Optional[torch.device] = None) -> Tuple:
+    """Download Silero STT from PyTorch Hub.
+
+    Returns:
+        Tuple of (model, decoder, utils) as returned by the hub entry point
+    """
+    return torch.hub.load(
+        repo_or_dir=STT_REPO,
+        model='silero_stt',
+        language=STT_LANGUAGE,
+        device=device or torch.device('cpu')
+    )
+
+
+def quantize(model):
+    """Dynamically quantize a model's Linear layers to int8 for CPU inference."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def fetch_emotion() -> Tuple[object, object]:
+    """Download the emotion classifier from Hugging Face and quantize it.
+
+    Returns:
+        Tuple of (quantized model, image processor)
+    """
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+    processor = AutoImageProcessor.from_pretrained(EMOTION_MODEL, use_fast=True)
+    model = AutoModelForImageClassification.from_pretrained(EMOTION_MODEL)
+    model.eval()
+    return quantize(model), processor
+
+
+def _versions() -> Dict[str, str]:
+    versions = {'torch': torch.__version__, 'python': '.'.join(map(str, sys.version_info[:3]))}
+    try:
+        import transformers
+        versions['transformers'] = transformers.__version__
+    except ImportError:
+        pass
+    return versions
+
+
+def _record(root: str, files: List[str]) -> Dict[str, str]:
+    """Checksum files (paths relative to ``root``), expanding directories."""
+    sums = {}
+    for rel in files:
+        path = os.path.join(root, rel)
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                sums.update(_record(root, [os.path.join(rel, name)]))
+        else:
+            sums[rel.replace(os.sep, '/')] = file_sha256(path)
+    return sums
+
+
+def build(root: str = MODEL_DIR, version: Optional[str] = None, activate: bool = True) -> str:
+    """Download every model and write it to a new version of the store.
+
+    The version is written to a temporary directory and renamed into place
+    once complete, so a failed build never leaves a partial version.
+
+    Args:
+        root: Store directory
+        version: Version name; defaults to the current UTC time
+        activate: Point CURRENT at the new version
+
+    Returns:
+        Path of the new version directory
+
+    Raises:
+        RuntimeError: If a model cannot be fetched or the version exists
+    """
+    version = version or datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+    target = os.path.join(root, version)
+    if os.path.exists(target):
+        raise RuntimeError(f'Model version already exists: {target}')
+    staging = os.path.join(root, f'.{version}.tmp')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(os.path.join(staging, 'stt'))
+    os.makedirs(os.path.join(staging, 'emotion'))
+    models: Dict[str, Any] = {}
+    try:
+        started = time.perf_counter()
+        stt_model, stt_decoder, _ = fetch_stt()
+        torch.jit.save(stt_model, os.path.join(staging, 'stt', 'model.jit'))
+        with open(os.path.join(staging, 'stt', 'labels.json'), 'w') as f:
+            json.dump(list(stt_decoder.labels), f)
+        models['stt'] = {
+            'source': f'{STT_REPO}:silero_stt:{STT_LANGUAGE}',
+            'format': 'torchscript',
+            'files': _record(staging, ['stt/model.jit', 'stt/labels.json']),
+            'build_seconds': round(time.perf_counter() - started, 2),
+        }
+
+        started = time.perf_counter()
+        emotion_model, processor = fetch_emotion()
+        torch.save(emotion_model, os.path.join(staging, 'emotion', 'model.pt'))
+        processor.save_pretrained(os.path.join(staging, 'emotion', 'processor'))
+        models['emotion'] = {
+            'source': EMOTION_MODEL,
+            'format': 'torch-module',
+            'quantization': 'dynamic-int8-linear',
+            'labels': {str(k): v for k, v in emotion_model.config.id2label.items()},
+            'files': _record(staging, ['emotion/model.pt', 'emotion/processor']),
+            'build_seconds': round(time.perf_counter() - started, 2),
+        }
+    except Exception as e:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise RuntimeError(f'Failed to build model artifacts: {e}')
+
+    manifest = {
+        'format': FORMAT_VERSION,
+        'version': version,
+        'created': datetime.now(timezone.utc).isoformat(),
+        'runtime': _versions(),
+        'models': models,
+    }
+    with open(os.path.join(staging, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(staging, target)
+    if activate:
+        set_current(root, version)
+    return target
+
+
+def set_current(root: str, version: str) -> None:
+    """Make ``version`` the one loaded by default.
+
+    Raises:
+        ValueError: If the version has no manifest
+    """
+    if not os.path.exists(os.path.join(root, version, MANIFEST)):
+        raise ValueError(f'Unknown model version: {version}')
+    tmp = os.path.join(root, f'.{CURRENT}.tmp')
+    with open(tmp, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp, os.path.join(root, CURRENT))
+
+
+class ModelStore:
+    """Loads models from one version of the local store."""
+
+    def __init__(self, root: str = MODEL_DIR, version: str = MODEL_VERSION, verify: bool = VERIFY):
+        """Open a store version.
+
+        Args:
+            root: Store directory
+            version: Version to open; empty for the one in CURRENT
+            verify: Check file checksums before loading a model
+
+        Raises:
+            RuntimeError: If the version or its manifest is missing or unreadable
+        """
+        if not version:
+            try:
+                with open(os.path.join(root, CURRENT)) as f:
+                    version = f.read().strip()
+            except OSError:
+                raise RuntimeError(f'No model artifacts in {root}; run "python -m model_store build"')
+        self.root = root
+        self.version = version
+        self.path = os.path.join(root, version)
+        self.verify = verify
+        try:
+            with open(os.path.join(self.path, MANIFEST)) as f:
+                self.manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            raise RuntimeError(f'Unreadable model manifest for version {version}: {e}')
+        if self.manifest.get('format') != FORMAT_VERSION:
+            raise RuntimeError(f'Unsupported model store format: {self.manifest.get("format")}')
+        built = self.manifest.get('runtime', {}).get('torch')
+        if built and built.split('+')[0] != torch.__version__.split('+')[0]:
+            logger.warning('Model artifacts %s were built with torch %s, running %s', version, built, torch.__version__)
+        self._verified = set()
+        self._lock = threading.Lock()
+
+    def _entry(self, name: str) -> Dict[str, Any]:
+        entry = self.manifest.get('models', {}).get(name)
+        if entry is None:
+            raise RuntimeError(f'Model {name} is not in artifact version {self.version}')
+        return entry
+
+    def check(self, name: str) -> None:
+        """Verify a model's files against the manifest (once per process).
+
+        Raises:
+            RuntimeError: If a file is missing or its checksum differs
+        """
+        with self._lock:
+            if name in self._verified:
+                return
+            for rel, expected in self._entry(name)['files'].items():
+                path = os.path.join(self.path, rel)
+                if not os.path.exists(path):
+                    raise RuntimeError(f'Model artifact missing: {path}')
+                if file_sha256(path) != expected:
+                    raise RuntimeError(f'Model artifact checksum mismatch: {path}')
+            self._verified.add(name)
+
+    def _file(self, name: str, rel: str) -> str:
+        if self.verify:
+            self.check(name)
+        return os.path.join(self.path, rel)
+
+    def load_stt(self, device: Optional[torch.device] = None) -> Tuple:
+        """Load Silero STT.
+
+        Returns:
+            Tuple of (TorchScript model, GreedyDecoder)
+        """
+        model = torch.jit.load(self._file('stt', 'stt/model.jit'), map_location=device or torch.device('cpu'))
+        model.eval()
+        with open(self._file('stt', 'stt/labels.json')) as f:
+            labels = json.load(f)
+        return model, GreedyDecoder(labels)
+
+    def load_emotion(self) -> Tuple[object, object]:
+        """Load the quantized emotion classifier and its image processor.
+
+        Returns:
+            Tuple of (model, processor)
+        """
+        from transformers import AutoImageProcessor
+
+        model = torch.load(self._file('emotion', 'emotion/model.pt'), map_location='cpu', weights_only=False)
+        model.eval()
+        processor = AutoImageProcessor.from_pretrained(
+            self._file('emotion', 'emotion/processor'), use_fast=True, local_files_only=True
+        )
+        return model, processor
+
+    def verify_all(self) -> Dict[str, str]:
+        """Verify every model, returning 'ok' or the error for each."""
+        report = {}
+        for name in self.manifest.get('models', {}):
+            try:
+                self.check(name)
+                report[name] = 'ok'
+            except RuntimeError as e:
+                report[name] = str(e)
+        return report
+
+
+_store: Optional[ModelStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store(source: str = MODEL_SOURCE) -> Optional[ModelStore]:
+    """Return the store models should load from, or None to download them.
+
+    Raises:
+        ValueError: If the source is unknown
+        RuntimeError: If the source is 'artifacts' and no store is usable
+    """
+    global _store
+    if source not in SOURCES:
+        raise ValueError(f'Unknown model source: {source}')
+    if source == 'hub':
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = ModelStore()
+            except RuntimeError:
+                if source == 'artifacts':
+                    raise
+                return None
+        return _store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Build and check the local model store')
+    parser.add_argument('--root', default=MODEL_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+    build_cmd = commands.add_parser('build', help='download all models into a new version')
+    build_cmd.add_argument('--version')
+    build_cmd.add_argument('--no-activate', action='store_true', help='do not make it the current version')
+    verify_cmd = commands.add_parser('verify', help='check a version against its manifest')
+    verify_cmd.add_argument('--version', default='')
+    activate_cmd = commands.add_parser('activate', help='make a version current')
+    activate_cmd.add_argument('version')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        path = build(args.root, args.version, activate=not args.no_activate)
+        with open(os.path.join(path, MANIFEST)) as f:
+            print(f.read())
+    elif args.command == 'verify':
+        report = ModelStore(args.root, args.version, verify=False).verify_all()
+        print(json.dumps(report, indent=2))
+        if any(status != 'ok' for status in report.values()):
+            sys.exit(1)
+    else:
+        set_current(args.root, args.version)
+
+
+if __name__ == '__main__':
+    main()
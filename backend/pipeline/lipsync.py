@@ -0,0 +1,129 @@
+import json
+import os
+import uuid
+from typing import Optional, Dict, Any
+
+import numpy as np
+
+try:
+    from cache_manager import get_cache_manager
+except Exception:
+    try:
+        from backend.cache_manager import get_cache_manager
+    except Exception:
+        from ..cache_manager import get_cache_manager
+
+"""
+Mouth-movement tracks for synthesized speech.
+
+Computes a normalized RMS envelope at a fixed frame rate, plus a coarse
+viseme per frame, once per audio file. The track is cached next to the audio
+as ``<id>.lipsync.json`` and sent with the response so the client only has
+to schedule the values.
+"""
+
+FRAME_MS = 50
+LIPSYNC_SUFFIX = '.lipsync.json'
+
+# Visemes by spectral centroid: X = closed/silent, O = rounded, A = open, E = spread
+SILENCE_LEVEL = 0.1
+VISEME_BANDS = ((900.0, 'O'), (1800.0, 'A'))
+WIDE_VISEME = 'E'
+SILENT_VISEME = 'X'
+
+
+def _frames(samples: np.ndarray, frame: int) -> np.ndarray:
+    """Split samples into a (n_frames, frame) matrix, zero-padding the last frame."""
+    n = -(-samples.size // frame)
+    padded = np.zeros(n * frame, dtype=np.float32)
+    padded[:samples.size] = samples
+    return padded.reshape(n, frame)
+
+
+def compute_track(samples: np.ndarray, rate: int, frame_ms: int = FRAME_MS, visemes: bool = True) -> Dict[str, Any]:
+    """Compute the lip-sync track for mono samples.
+
+    Args:
+        samples: 1D float32 samples in [-1, 1]
+        rate: Sample rate in Hz
+        frame_ms: Frame length in milliseconds
+        visemes: Also classify a coarse viseme per frame
+
+    Returns:
+        Dictionary with 'frame_ms', 'envelope' (list of 0-1 floats, two
+        decimals) and optionally 'visemes' (one character per frame)
+    """
+    frame = max(1, int(rate * frame_ms / 1000))
+    if samples.size == 0:
+        return {'frame_ms': frame_ms, 'envelope': [], 'visemes': '' if visemes else None}
+
+    frames = _frames(samples.astype(np.float32, copy=False), frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    peak = rms.max()
+    envelope = np.round(rms.astype(np.float64) / peak, 2) if peak > 0 else np.zeros(rms.shape)
+    track: Dict[str, Any] = {'frame_ms': frame_ms, 'envelope': envelope.tolist()}
+
+    if visemes:
+        spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame).astype(np.float32), axis=1))
+        freqs = np.fft.rfftfreq(frame, 1.0 / rate)
+        power = spectrum.sum(axis=1)
+        centroid = np.divide(spectrum @ freqs, power, out=np.zeros_like(power), where=power > 0)
+        codes = np.full(centroid.shape, WIDE_VISEME, dtype='<U1')
+        for limit, viseme in reversed(VISEME_BANDS):
+            codes[centroid < limit] = viseme
+        codes[envelope < SILENCE_LEVEL] = SILENT_VISEME
+        track['visemes'] = ''.join(codes.tolist())
+    return track
+
+
+def compute_file_track(path: str, frame_ms: int = FRAME_MS) -> Dict[str, Any]:
+    """Decode an audio file and compute its lip-sync track.
+
+    Raises:
+        RuntimeError: If the file cannot be decoded
+    """
+    import soundfile as sf
+
+    try:
+        samples, rate = sf.read(path, dtype='float32', always_2d=True)
+    except Exception as e:
+        raise RuntimeError(f'Failed to decode {path}: {e}')
+    return compute_track(samples.mean(axis=1), rate, frame_ms)
+
+
+def load_lipsync(cache_dir: str, filename: str) -> Optional[Dict[str, Any]]:
+    """Return the cached lip-sync track for an audio file, computing it on first use.
+
+    Args:
+        cache_dir: Cache directory holding the audio
+        filename: Audio filename inside cache_dir
+
+    Returns:
+        Lip-sync track, or None if the audio cannot be decoded
+    """
+    audio_id = filename.split('.', 1)[0]
+    sidecar = audio_id + LIPSYNC_SUFFIX
+    sidecar_path = os.path.join(cache_dir, sidecar)
+    try:
+        with open(sidecar_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    try:
+        track = compute_file_track(os.path.join(cache_dir, filename))
+    except RuntimeError:
+        return None
+
+    tmp = os.path.join(cache_dir, f".{sidecar}.{uuid.uuid4().hex[:8]}.part")
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(track, f, separators=(',', ':'))
+        os.replace(tmp, sidecar_path)
+        get_cache_manager(cache_dir).register(sidecar)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+    return track
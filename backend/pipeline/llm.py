@@ -1,29 +1,34 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 import os
-import json
+import threading
 from typing import Optional, Dict, List, Any
 from dotenv import load_dotenv
 
+try:
+    from tracing import current_trace_id
+except Exception:
+    try:
+        from backend.tracing import current_trace_id
+    except Exception:
+        from ..tracing import current_trace_id
+
 """
 LLM response generation module using Google Gemini API.
 
 Generates structured AI responses with animation timelines and text formatting,
 with support for expression-aware context to create emotionally-aware character responses.
+
+The Gemini client is created on first use, so the module imports without
+``GOOGLE_API_KEY``. ``create_llm`` picks the backend named by
+``IHUB_LLM_BACKEND``: ``gemini`` (default) or ``fake``, an offline stand-in
+with a configurable latency distribution (see ``tools.fake_llm``).
 """
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize Gemini API key from environment variable
-api_key = os.environ.get("GOOGLE_API_KEY")
-if not api_key:
-    raise RuntimeError(
-        "GOOGLE_API_KEY environment variable not set. "
-        "Please configure it in your .env file or environment."
-    )
-os.environ["GOOGLE_API_KEY"] = api_key
+# gemini | fake
+LLM_BACKEND = os.environ.get('IHUB_LLM_BACKEND', 'gemini')
 
 
 # Pydantic models for structured output
@@ -103,17 +108,46 @@ Rules for Response:
 - Timing between animation emotions and text_box_data's duration is synchronised (each text box will appear after prev one duration is over)
 - text should feel coherent and emotionally expressive based on the input."""
 
-# Prompt template
-prompt = ChatPromptTemplate.from_messages([
-    ("system", SYSTEM_PROMPT),
-    ("human", "{user_input}")
-])
+_gemini = None
+_gemini_lock = threading.Lock()
 
-# Initialize Gemini
-gemini_llm = ChatGoogleGenerativeAI(
-    model="gemini-2.0-flash",
-    temperature=0.6,
-).with_structured_output(LLMResponse)
+
+def get_gemini():
+    """Return the shared (structured Gemini model, prompt template), creating them on first use.
+
+    Raises:
+        RuntimeError: If ``GOOGLE_API_KEY`` is not set
+    """
+    global _gemini
+    with _gemini_lock:
+        if _gemini is None:
+            if not os.environ.get("GOOGLE_API_KEY"):
+                raise RuntimeError(
+                    "GOOGLE_API_KEY environment variable not set. "
+                    "Please configure it in your .env file or environment."
+                )
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            from langchain_core.prompts import ChatPromptTemplate
+
+            prompt = ChatPromptTemplate.from_messages([
+                ("system", SYSTEM_PROMPT),
+                ("human", "{user_input}")
+            ])
+            gemini_llm = ChatGoogleGenerativeAI(
+                model="gemini-2.0-flash",
+                temperature=0.6,
+            ).with_structured_output(LLMResponse)
+            _gemini = (gemini_llm, prompt)
+        return _gemini
+
+
+def fallback_response() -> Dict[str, Any]:
+    """Return the canned reply used when generation fails."""
+    return {
+        'ai_text': [{'text': 'Error generating response', 'duration': 1.0, 'pos': 0, 'type': 0}],
+        'timeline': [],
+        'text': 'Error generating response'
+    }
 
 
 class LLM:
@@ -125,14 +159,18 @@ class LLM:
     """
     
     def __init__(self):
-        """Initialize LLM service with Gemini model and prompt template."""
-        self.llm = gemini_llm
-        self.prompt = prompt
+        """Initialize LLM service with Gemini model and prompt template.
+
+        Raises:
+            RuntimeError: If ``GOOGLE_API_KEY`` is not set
+        """
+        self.llm, self.prompt = get_gemini()
     
     def generate(
         self,
         user_input: str,
-        user_expression: Optional[str] = None
+        user_expression: Optional[str] = None,
+        raise_errors: bool = False
     ) -> Dict[str, Any]:
         """Generate structured response from user input with optional expression context.
         
@@ -144,6 +182,7 @@ class LLM:
         Args:
             user_input: User's text message
             user_expression: Optional user's detected emotion (e.g., "happy", "sad")
+            raise_errors: Raise RuntimeError on failure instead of returning the fallback
             
         Returns:
             Dictionary with keys:
@@ -152,7 +191,8 @@ class LLM:
                 - 'text': Plain text of all texts joined together
                 
         Raises:
-            Returns fallback error response if generation fails
+            RuntimeError: If generation fails and raise_errors is set; otherwise
+                the fallback error response is returned
         """
         try:
             # Enhance input with expression context if available
@@ -161,7 +201,8 @@ class LLM:
                 input_with_context = f"User Expression: {user_expression}\n\nUser Message: {user_input}"
             
             formatted_prompt = self.prompt.format_messages(user_input=input_with_context)
-            llm_response = self.llm.invoke(formatted_prompt)
+            # the trace ID reaches LangChain callbacks and tracers as run metadata
+            llm_response = self.llm.invoke(formatted_prompt, config={'metadata': {'trace_id': current_trace_id()}})
             
             # Parse structured output
             text_box_data = [box.model_dump() for box in llm_response.text_box_data]
@@ -176,11 +217,28 @@ class LLM:
                 'text': plain_text
             }
         except Exception as e:
+            if raise_errors:
+                raise RuntimeError(f'LLM generation failed: {e}')
             # Return fallback response on error
-            return {
-                'ai_text': [{'text': 'Error generating response', 'duration': 1.0, 'pos': 0, 'type': 0}],
-                'timeline': [],
-                'text': 'Error generating response'
-            }
+            return fallback_response()
+
 
+def create_llm(backend: str = LLM_BACKEND):
+    """Return the response generator for a backend name.
 
+    Args:
+        backend: ``gemini`` or ``fake``
+
+    Raises:
+        ValueError: If the backend is unknown
+        RuntimeError: If the Gemini backend is selected without an API key
+    """
+    if backend == 'gemini':
+        return LLM()
+    if backend == 'fake':
+        try:
+            from tools.fake_llm import FakeLLM
+        except ImportError:
+            from ..tools.fake_llm import FakeLLM
+        return FakeLLM()
+    raise ValueError(f'Unknown LLM backend: {backend}')
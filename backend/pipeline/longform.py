@@ -0,0 +1,166 @@
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+"""
+Splitting long utterances for parallel transcription, and joining the parts.
+
+``plan_windows`` cuts an utterance roughly every ``IHUB_STT_WINDOW_SECONDS``
+at the quietest 20 ms frame near the target, so cuts tend to fall between
+words. Each window extends ``IHUB_STT_OVERLAP_SECONDS`` / 2 past its cuts on
+both sides, so a word clipped by a cut is complete in one neighbour.
+
+``merge_transcripts`` joins the windows' texts, dropping the words each
+pair of neighbours transcribed twice in their overlap.
+"""
+
+SAMPLE_RATE = 16000
+
+# Utterances longer than this (seconds) are transcribed in windows; 0 disables
+LONGFORM_SECONDS = float(os.environ.get('IHUB_STT_LONGFORM_SECONDS', '12'))
+
+# Target window length in seconds, before overlap
+WINDOW_SECONDS = float(os.environ.get('IHUB_STT_WINDOW_SECONDS', '8'))
+
+# Audio shared by neighbouring windows, in seconds
+OVERLAP_SECONDS = float(os.environ.get('IHUB_STT_OVERLAP_SECONDS', '1.0'))
+
+# How far before the target a cut may move to find a quiet point, in seconds
+CUT_SEARCH_SECONDS = 1.5
+
+# Frame length for locating quiet points, in seconds
+ENERGY_FRAME_SECONDS = 0.02
+
+# Words at the edge of a window that may be clipped and differ from the neighbour's
+EDGE_WORDS = 1
+
+# Longest run of words compared when looking for the overlap
+MAX_OVERLAP_WORDS = 12
+
+# Shortest fragment accepted as a clipped version of a longer word
+MIN_CLIPPED_CHARS = 3
+
+
+def frame_energy(audio: np.ndarray, frame: int) -> np.ndarray:
+    """Return the mean square of each whole ``frame``-sample frame."""
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:count * frame].reshape(count, frame)
+    return np.einsum('ij,ij->i', frames, frames) / frame
+
+
+def plan_windows(
+    audio: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    window: float = WINDOW_SECONDS,
+    overlap: float = OVERLAP_SECONDS,
+    search: float = CUT_SEARCH_SECONDS
+) -> List[Tuple[int, int]]:
+    """Choose overlapping windows covering an utterance.
+
+    Args:
+        audio: 1D float32 samples
+        sample_rate: Samples per second
+        window: Target seconds between cuts
+        overlap: Seconds shared by neighbouring windows
+        search: Seconds before each target in which to look for a quiet point
+
+    Returns:
+        (start, end) sample offsets of each window, in order
+    """
+    total = len(audio)
+    step = int(window * sample_rate)
+    if step <= 0 or total <= step:
+        return [(0, total)]
+    frame = max(1, int(ENERGY_FRAME_SECONDS * sample_rate))
+    energy = frame_energy(audio, frame)
+    reach = int(search * sample_rate)
+
+    cuts = [0]
+    while total - cuts[-1] > step:
+        target = cuts[-1] + step
+        # quietest frame in [target - search, target], never so early the window shrinks below half
+        low = max(cuts[-1] + step // 2, target - reach) // frame
+        high = min(target // frame, len(energy))
+        if high > low:
+            cut = (low + int(np.argmin(energy[low:high]))) * frame + frame // 2
+        else:
+            cut = target
+        cuts.append(cut)
+    cuts.append(total)
+
+    half = int(overlap * sample_rate / 2)
+    return [(max(0, start - half), min(total, end + half)) for start, end in zip(cuts, cuts[1:])]
+
+
+def _normalize(word: str) -> str:
+    return ''.join(ch for ch in word.lower() if ch.isalnum())
+
+
+def _same(x: str, y: str, first: bool, last: bool) -> bool:
+    """Compare words of an overlap run; its edge words may be clipped by the cut."""
+    if x == y:
+        return True
+    short, long_ = sorted((x, y), key=len)
+    if len(short) < MIN_CLIPPED_CHARS:
+        return False
+    # the right window's first word may lack its start, the left window's last word its end
+    return (first and long_.endswith(short)) or (last and long_.startswith(short))
+
+
+def merge_pair(left: List[str], right: List[str]) -> List[str]:
+    """Join two windows' words, removing the run both transcribed.
+
+    Looks for the longest run of words ending ``left`` that also starts
+    ``right``, allowing the run's edge words to be clipped and up to
+    ``EDGE_WORDS`` garbled words at either edge. Where the two versions of
+    a word differ the longer is kept. Without such a run the texts are
+    simply concatenated.
+    """
+    a = [_normalize(w) for w in left]
+    b = [_normalize(w) for w in right]
+    best = None
+    for drop_left in range(min(EDGE_WORDS, len(a)) + 1):
+        end = len(a) - drop_left
+        for skip_right in range(min(EDGE_WORDS, len(b)) + 1):
+            longest = min(MAX_OVERLAP_WORDS, end, len(b) - skip_right)
+            for k in range(longest, 0, -1):
+                if k == 1 and drop_left + skip_right:
+                    # a lone word next to a garbled one is too weak a match
+                    break
+                start = end - k
+                if all(_same(a[start + i], b[skip_right + i], i == 0, i == k - 1) for i in range(k)):
+                    # prefer longer runs, then fewer dropped edge words
+                    key = (k, -(drop_left + skip_right))
+                    if best is None or key > best[0]:
+                        best = (key, start, skip_right)
+                    break
+    if best is None:
+        return left + right
+    (k, _), start, skip = best
+    run = [max(left[start + i], right[skip + i], key=len) for i in range(k)]
+    return left[:start] + run + right[skip + k:]
+
+
+def merge_transcripts(texts: List[str]) -> str:
+    """Join the transcripts of consecutive overlapping windows."""
+    words: List[str] = []
+    for text in texts:
+        words = merge_pair(words, text.split()) if words else text.split()
+    return ' '.join(words)
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level edit distance between two texts, relative to the reference length."""
+    ref = [_normalize(w) for w in reference.split()]
+    hyp = [_normalize(w) for w in hypothesis.split()]
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    row = list(range(len(hyp) + 1))
+    for i, r in enumerate(ref, 1):
+        prev, row[0] = row[0], i
+        for j, h in enumerate(hyp, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (r != h))
+    return row[-1] / len(ref)
@@ -1,10 +1,14 @@
 # pipeline.py
+import asyncio
 import numpy as np
 import os
-import uuid
+import time
 from .stt import STT
-from .tts import synthesize_text
-from .llm import LLM
+from .tts import asynthesize_text, run_sync
+from .llm import create_llm, fallback_response
+from .resilience import TurnBudget, llm_breaker, tts_breaker
+from .scheduler import turn_scheduler
+from .lipsync import load_lipsync
 
 try:
     from database import db
@@ -17,13 +21,86 @@ except Exception:
         except Exception:
             db = None
 
+try:
+    from cache_manager import audio_cache
+except Exception:
+    try:
+        from backend.cache_manager import audio_cache
+    except Exception:
+        from ..cache_manager import audio_cache
+
+try:
+    from metrics import turn_seconds, degraded as degraded_turns
+    from tracing import start_trace, current_trace_id, observe_stage, timed_stage
+except Exception:
+    try:
+        from backend.metrics import turn_seconds, degraded as degraded_turns
+        from backend.tracing import start_trace, current_trace_id, observe_stage, timed_stage
+    except Exception:
+        from ..metrics import turn_seconds, degraded as degraded_turns
+        from ..tracing import start_trace, current_trace_id, observe_stage, timed_stage
+
+# Maximum text boxes synthesized at the same time for one reply
+TTS_CONCURRENCY = int(os.environ.get('IHUB_TTS_CONCURRENCY', '3'))
+
 
 class Pipeline:
-    def __init__(self, device=None):
+    def __init__(self, device=None, tts_concurrency=TTS_CONCURRENCY, llm=None, scheduler=None):
         self.stt = STT(device=device)
-        self.llm = LLM()
+        self.llm = llm or create_llm()
+        self.tts_concurrency = max(1, tts_concurrency)
+        self.scheduler = scheduler or turn_scheduler
 
     def handle_input(self, audio_frames=None, user_text=None, response_mode='audio', user_expression=None):
+        """Blocking wrapper around ``ahandle_input`` for callers outside an event loop."""
+        return run_sync(self.ahandle_input(audio_frames, user_text, response_mode, user_expression))
+
+    async def ahandle_input(self, audio_frames=None, user_text=None, response_mode='audio', user_expression=None,
+                            on_audio_segment=None, trace_id=None, on_queued=None):
+        """Run one conversational turn under a new trace.
+
+        The turn first waits for a slot from the turn scheduler, queued
+        fairly with other sessions' turns; ``on_queued`` is awaited with its
+        (position, total waiting) while it waits. The result and every audio
+        segment carry the turn's ``trace_id``; the result also has the
+        per-stage ``timings`` in seconds, including 'turn_queue'.
+
+        Raises:
+            TurnRejected: If the scheduler is saturated or the turn waited
+                past its deadline
+        """
+        started = time.perf_counter()
+        with start_trace(trace_id) as trace:
+            async with self.scheduler.turn(self, on_queued) as waited:
+                observe_stage('turn_queue', waited)
+                result = await self._run_turn(audio_frames, user_text, response_mode, user_expression,
+                                              on_audio_segment, started)
+        result['trace_id'] = trace.id
+        result['timings'] = trace.timings
+        return result
+
+    async def _run_turn(self, audio_frames, user_text, response_mode, user_expression, on_audio_segment, started):
+        """Run one conversational turn.
+
+        In audio mode every text box is synthesized separately, up to
+        ``tts_concurrency`` at a time. ``on_audio_segment`` is awaited with each
+        segment as soon as it and all earlier segments are ready, so the client
+        can start playing the first bubble while later ones are still in flight.
+        The first segment delivered also carries the reply's timeline and text boxes.
+
+        The turn runs under a ``TurnBudget``. Gemini and IndexTTS calls go
+        through circuit breakers; when either fails or its circuit is open the
+        turn degrades (fallback text, or a text-only reply) instead of waiting.
+
+        Stage latencies are recorded in ``metrics.stage_seconds`` and on the
+        trace. ``started`` is when the turn was submitted, before it waited
+        for a slot, so for audio input the turn and time to first audio are
+        measured from the end of speech; the budget starts once the slot is
+        granted, as the queue has its own deadline.
+        """
+        budget = TurnBudget()
+        degraded = []
+
         # Step 1: Transcribe audio if needed
         if user_text is None:
             if not audio_frames:
@@ -31,12 +108,24 @@ class Pipeline:
             else:
                 try:
                     audio_data = np.concatenate(audio_frames) if isinstance(audio_frames, list) else np.array([], dtype=np.float32)
-                    user_text = self.stt.transcribe(audio_data)
+                    user_text = await asyncio.wait_for(
+                        asyncio.to_thread(self.stt.transcribe, audio_data), budget.allot('stt')
+                    )
                 except Exception:
                     user_text = ''
+                observe_stage('vad_to_transcript', time.perf_counter() - started)
 
         # Step 2: Get structured response from LLM with optional user expression context
-        llm_response = self.llm.generate(user_text, user_expression=user_expression)
+        llm_started = time.perf_counter()
+        try:
+            llm_response = await llm_breaker.call(
+                lambda: asyncio.to_thread(self.llm.generate, user_text, user_expression, True),
+                budget.allot('llm')
+            )
+        except Exception:
+            llm_response = fallback_response()
+            degraded.append('llm')
+        observe_stage('llm', time.perf_counter() - llm_started)
         ai_text = llm_response["ai_text"]
         timeline = llm_response["timeline"]
         text = llm_response["text"]
@@ -45,40 +134,110 @@ class Pipeline:
         user_row, ai_row = None, None
         try:
             if db:
-                user_row = db.insert_message('user', user_text or '', expression=user_expression)
+                with timed_stage('db_write'):
+                    user_row = await asyncio.wrap_future(
+                        db.submit_message('user', user_text or '', expression=user_expression)
+                    )
         except Exception:
             pass
 
-        # Step 4: Generate TTS if needed
-        cache_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache')
-        os.makedirs(cache_dir, exist_ok=True)
+        # Step 4: Generate TTS per text box if needed
+        cache_dir = audio_cache.directory
         audio_id = None
+        audio_segments = []
+        lipsync = []
+        time_to_first_audio = None
 
         if response_mode == 'audio':
-            try:
-                texts = ' '.join([s['text'] for s in ai_text])
-                filename = synthesize_text(texts, cache_dir)
-                audio_id = os.path.splitext(filename)[0]
-            except Exception:
-                audio_id = str(uuid.uuid4())
-                audio_path = os.path.join(cache_dir, f"{audio_id}.wav")
-                with open(audio_path, 'wb') as f:
-                    f.write(b'RIFF....WAVEfmt ')
+            deadline = time.monotonic() + budget.allot('tts')
+            async for segment in self._synthesize_segments(ai_text, timeline, cache_dir, deadline):
+                if time_to_first_audio is None:
+                    time_to_first_audio = time.perf_counter() - started
+                    observe_stage('first_audio', time_to_first_audio)
+                audio_segments.append(segment['audio_id'])
+                lipsync.append(segment['lipsync'])
+                if on_audio_segment:
+                    try:
+                        await on_audio_segment(segment)
+                    except Exception:
+                        pass
+            # audio_id stays a single cache ID: the first segment
+            audio_id = audio_segments[0] if audio_segments else None
+            if not audio_segments:
+                # TTS unavailable: reply with text only
+                degraded.append('tts')
+                response_mode = 'text'
 
         # Step 5: Save AI response
         try:
             if db:
-                ai_row = db.insert_ai_response(text, timeline, audio_id)
+                with timed_stage('db_write'):
+                    ai_row = await asyncio.wrap_future(db.submit_ai_response(text, timeline, audio_id, audio_segments)) or None
         except Exception:
             pass
 
+        turn_seconds.labels(response_mode).observe(time.perf_counter() - started)
+        for stage in degraded:
+            degraded_turns.labels(stage).inc()
+
         # Step 6: Return everything
         return {
             'ai_text': ai_text,
             'timeline': timeline,
             'audio_id': audio_id,
+            'audio_segments': audio_segments,
+            'lipsync': lipsync,
+            'time_to_first_audio': time_to_first_audio,
+            'response_mode': response_mode,
+            'degraded': degraded,
             'user_row': user_row,
             'ai_row': ai_row,
             'user_text': user_text,
             'user_expression': user_expression,
         }
+
+    async def _synthesize_segments(self, ai_text, timeline, cache_dir, deadline):
+        """Synthesize text boxes in parallel and yield them in order as they complete.
+
+        Segments that fail or miss the TTS deadline are skipped. Each segment
+        carries the lip-sync track of its audio.
+        """
+        boxes = [box for box in ai_text if (box.get('text') or '').strip()]
+        semaphore = asyncio.Semaphore(self.tts_concurrency)
+
+        async def synthesize(box):
+            queued = time.perf_counter()
+            async with semaphore:
+                observe_stage('tts_local_wait', time.perf_counter() - queued)
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    raise asyncio.TimeoutError()
+                filename = await asynthesize_text(box['text'], cache_dir, timeout=timeout, breaker=tts_breaker)
+            track = await asyncio.to_thread(load_lipsync, cache_dir, filename)
+            return os.path.splitext(filename)[0], track
+
+        tasks = [asyncio.create_task(synthesize(box)) for box in boxes]
+        first = True
+        try:
+            for index, (box, task) in enumerate(zip(boxes, tasks)):
+                try:
+                    audio_id, track = await task
+                except Exception:
+                    continue
+                segment = {
+                    'index': index,
+                    'count': len(boxes),
+                    'audio_id': audio_id,
+                    'text': box['text'],
+                    'duration': box.get('duration'),
+                    'lipsync': track,
+                    'trace_id': current_trace_id(),
+                }
+                if first:
+                    segment['timeline'] = timeline
+                    segment['ai_text'] = ai_text
+                    first = False
+                yield segment
+        finally:
+            for task in tasks:
+                task.cancel()
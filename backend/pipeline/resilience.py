@@ -0,0 +1,291 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+"""
+Failure handling for remote dependencies (Gemini and IndexTTS).
+
+Provides a per-turn latency budget split across pipeline stages, circuit
+breakers that fail fast while a dependency is unhealthy, and optional hedged
+requests that send a second attempt once the first is slower than the
+dependency's recent p95 latency.
+"""
+
+# End-to-end latency budget for one turn, in seconds
+TURN_BUDGET = float(os.environ.get('IHUB_TURN_BUDGET', '20'))
+
+# Share of the remaining budget each stage may use
+STAGE_SHARES = {'stt': 0.15, 'llm': 0.4, 'tts': 0.45}
+
+# Services that send a hedged second request, e.g. "tts" or "llm,tts"
+HEDGED_SERVICES = {s.strip() for s in os.environ.get('IHUB_HEDGE', '').split(',') if s.strip()}
+
+# Seconds a single call may take before it counts as a failure of the dependency
+LLM_CALL_TIMEOUT = float(os.environ.get('IHUB_LLM_CALL_TIMEOUT', '8'))
+TTS_CALL_TIMEOUT = float(os.environ.get('IHUB_TTS_CALL_TIMEOUT', '9'))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class TurnBudget:
+    """Latency budget for one turn, handed out stage by stage.
+
+    Each stage gets its share of whatever time remains, so time saved by an
+    early stage is passed on to later ones.
+    """
+
+    def __init__(self, total: float = TURN_BUDGET, shares: Optional[Dict[str, float]] = None):
+        """Initialize the budget.
+
+        Args:
+            total: Seconds available for the whole turn
+            shares: Relative weight of each stage, in execution order
+        """
+        self.total = total
+        self.started = time.monotonic()
+        self._pending = dict(shares or STAGE_SHARES)
+
+    def remaining(self) -> float:
+        """Return seconds left in the turn."""
+        return max(0.0, self.total - (time.monotonic() - self.started))
+
+    def allot(self, stage: str) -> float:
+        """Return the timeout for a stage that is about to start.
+
+        Args:
+            stage: Stage name from the shares mapping
+
+        Returns:
+            Seconds the stage may take
+        """
+        weight = self._pending.pop(stage, 0.0)
+        pending = weight + sum(self._pending.values())
+        if pending <= 0:
+            return self.remaining()
+        return self.remaining() * weight / pending
+
+
+class LatencyTracker:
+    """Sliding window of recent successful call latencies."""
+
+    def __init__(self, window: int = 100):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Return the p-th percentile (0-100), or None with too few samples."""
+        with self._lock:
+            if len(self._samples) < 10:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class CircuitBreaker:
+    """Circuit breaker with exponential back-off and optional hedging.
+
+    The circuit opens after ``failure_threshold`` consecutive failures. While
+    open, calls fail immediately with ``CircuitOpenError``. After the back-off
+    expires one trial call is let through (half-open); success closes the
+    circuit, failure reopens it with a doubled back-off.
+
+    Only the dependency's own faults count as failures: errors it raises and
+    calls outlasting ``call_timeout``. A call cut short by the caller's
+    smaller timeout (what is left of the turn budget) or cancelled (the
+    client went away, or a hedge lost) says nothing about its health.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 3,
+        reset_timeout: float = 5.0,
+        max_reset_timeout: float = 120.0,
+        hedge: bool = False,
+        call_timeout: Optional[float] = None
+    ):
+        """Initialize the breaker.
+
+        Args:
+            name: Dependency name used in errors and stats
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Initial seconds to stay open before a trial call
+            max_reset_timeout: Upper bound for the doubled back-off
+            hedge: Send a second request once a call exceeds p95 latency
+            call_timeout: Seconds after which a call fails as too slow; None for no limit
+        """
+        self.name = name
+        self.call_timeout = call_timeout
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.hedge = hedge
+        self.latency = LatencyTracker()
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._failures = 0
+        self._reset_timeout = reset_timeout
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.counters = {'calls': 0, 'successes': 0, 'failures': 0, 'rejected': 0, 'abandoned': 0,
+                         'hedges_sent': 0, 'hedge_wins': 0}
+
+    def allow(self) -> bool:
+        """Return True if a call may go out now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self._reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def is_available(self) -> bool:
+        """Return True unless the circuit is open and still backing off."""
+        with self._lock:
+            return not (self.state == self.OPEN and time.monotonic() - self._opened_at < self._reset_timeout)
+
+    def record_success(self, seconds: float) -> None:
+        self.latency.record(seconds)
+        with self._lock:
+            self.counters['successes'] += 1
+            self._failures = 0
+            self.state = self.CLOSED
+            self._reset_timeout = self.base_reset_timeout
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.counters['failures'] += 1
+            self._failures += 1
+            if self.state == self.HALF_OPEN:
+                self._reset_timeout = min(self.max_reset_timeout, self._reset_timeout * 2)
+                self._open()
+            elif self._failures >= self.failure_threshold:
+                self._open()
+
+    def record_abandoned(self) -> None:
+        """Count a call cut short by its caller; a half-open trial may be retried."""
+        with self._lock:
+            self.counters['abandoned'] += 1
+            self._trial_in_flight = False
+
+    def _open(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._trial_in_flight = False
+
+    async def call(self, factory: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """Run a call through the breaker.
+
+        Args:
+            factory: Returns a new awaitable for each attempt
+            timeout: Seconds the caller can wait for the call (including any
+                hedge); the breaker's ``call_timeout`` applies if smaller
+
+        Returns:
+            Result of the first successful attempt
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            asyncio.TimeoutError: If the call exceeds its timeout
+            Exception: Whatever the call raised
+        """
+        if not self.allow():
+            with self._lock:
+                self.counters['rejected'] += 1
+            raise CircuitOpenError(f'{self.name} circuit is open')
+        with self._lock:
+            self.counters['calls'] += 1
+        limit = timeout
+        own_limit = self.call_timeout is not None and (timeout is None or self.call_timeout <= timeout)
+        if own_limit:
+            limit = self.call_timeout
+        started = time.monotonic()
+        try:
+            result = await asyncio.wait_for(self._attempt(factory), limit)
+        except asyncio.CancelledError:
+            self.record_abandoned()
+            raise
+        except asyncio.TimeoutError:
+            # a timeout raised by the call itself, before the limit, is the dependency's own
+            if own_limit or limit is None or time.monotonic() - started < limit:
+                self.record_failure()
+            else:
+                self.record_abandoned()
+            raise
+        except Exception:
+            self.record_failure()
+            raise
+        except BaseException:
+            self.record_abandoned()
+            raise
+        self.record_success(time.monotonic() - started)
+        return result
+
+    async def _attempt(self, factory: Callable[[], Awaitable[Any]]) -> Any:
+        primary = asyncio.ensure_future(factory())
+        secondary = None
+        try:
+            hedge_after = self.latency.percentile(95) if self.hedge else None
+            if hedge_after is None:
+                return await primary
+
+            done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+            if done:
+                return primary.result()
+
+            with self._lock:
+                self.counters['hedges_sent'] += 1
+            secondary = asyncio.ensure_future(factory())
+            pending = {primary, secondary}
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is secondary:
+                            with self._lock:
+                                self.counters['hedge_wins'] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # the losing (or abandoned) attempt is not needed any more
+            for task in (primary, secondary):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return state, counters and recent latency percentiles."""
+        with self._lock:
+            data = {'state': self.state, 'reset_timeout': self._reset_timeout,
+                    'call_timeout': self.call_timeout, **self.counters}
+        data['p50'] = self.latency.percentile(50)
+        data['p95'] = self.latency.percentile(95)
+        return data
+
+
+llm_breaker = CircuitBreaker('llm', hedge='llm' in HEDGED_SERVICES, call_timeout=LLM_CALL_TIMEOUT)
+tts_breaker = CircuitBreaker('tts', hedge='tts' in HEDGED_SERVICES, call_timeout=TTS_CALL_TIMEOUT)
+
+
+def stats() -> Dict[str, Any]:
+    """Return breaker stats for every remote dependency."""
+    return {'turn_budget': TURN_BUDGET, 'llm': llm_breaker.stats(), 'tts': tts_breaker.stats()}
@@ -0,0 +1,265 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, Callable, Awaitable, Hashable
+
+try:
+    from metrics import registry
+except Exception:
+    try:
+        from backend.metrics import registry
+    except Exception:
+        from ..metrics import registry
+
+"""
+Admission control and fair scheduling of conversational turns.
+
+At most ``IHUB_MAX_TURNS`` turns run at once across all sessions. Further
+turns wait in per-session queues served round-robin, so a session that
+submits many turns gets one slot per round like everyone else. A turn still
+waiting after ``IHUB_TURN_QUEUE_DEADLINE`` seconds is dropped, since its
+reply would arrive too late to be useful. While waiting, the caller is told
+its position whenever it changes.
+
+When every slot is busy and ``IHUB_MAX_QUEUED_TURNS`` turns are waiting the
+scheduler is saturated: new turns are rejected and new sessions refused.
+"""
+
+# Turns running at the same time (STT, Gemini and TTS)
+MAX_TURNS = int(os.environ.get('IHUB_MAX_TURNS', '4'))
+
+# Turns waiting across all sessions before new ones are rejected
+MAX_QUEUED_TURNS = int(os.environ.get('IHUB_MAX_QUEUED_TURNS', '32'))
+
+# Seconds a turn may wait for a slot before it is dropped
+QUEUE_DEADLINE = float(os.environ.get('IHUB_TURN_QUEUE_DEADLINE', '15'))
+
+# Open sessions allowed at once; 0 for no limit besides saturation
+MAX_SESSIONS = int(os.environ.get('IHUB_MAX_SESSIONS', '0'))
+
+rejected_turns = registry.counter('ihub_rejected_turns', 'Turns not run, by reason', ('reason',))
+refused_sessions = registry.counter('ihub_refused_sessions', 'Sessions refused because the server was saturated')
+
+
+class TurnRejected(RuntimeError):
+    """Raised when a turn is not run; ``reason`` is 'saturated' or 'deadline'."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class _Ticket:
+    __slots__ = ('session', 'expires', 'moved', 'granted')
+
+    def __init__(self, session: Hashable, expires: float):
+        self.session = session
+        self.expires = expires
+        self.moved = asyncio.Event()
+        self.granted = False
+
+
+class TurnScheduler:
+    """Limits concurrent turns and hands free slots to sessions in turn."""
+
+    def __init__(
+        self,
+        max_turns: int = MAX_TURNS,
+        max_queued: int = MAX_QUEUED_TURNS,
+        deadline: float = QUEUE_DEADLINE,
+        max_sessions: int = MAX_SESSIONS
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            max_turns: Turns that may run at once
+            max_queued: Turns that may wait at once
+            deadline: Seconds a turn may wait before it is dropped
+            max_sessions: Sessions that may be open at once; 0 for no limit
+        """
+        self.max_turns = max(1, max_turns)
+        self.max_queued = max(0, max_queued)
+        self.deadline = deadline
+        self.max_sessions = max(0, max_sessions)
+        self.running = 0
+        self.sessions = 0
+        # sessions with waiting turns, in the order they are next served
+        self._queues: 'OrderedDict[Hashable, deque]' = OrderedDict()
+        self.queued = 0
+        self.counters = {'started': 0, 'waited': 0, 'expired': 0, 'rejected': 0, 'refused_sessions': 0}
+
+    def saturated(self) -> bool:
+        """Return whether every slot is busy and the queue is full."""
+        return self.running >= self.max_turns and self.queued >= self.max_queued
+
+    def open_session(self) -> bool:
+        """Register a new session; return False if it must be refused."""
+        if self.saturated() or (self.max_sessions and self.sessions >= self.max_sessions):
+            self.counters['refused_sessions'] += 1
+            refused_sessions.inc()
+            return False
+        self.sessions += 1
+        return True
+
+    def close_session(self) -> None:
+        """Unregister a session opened with ``open_session``."""
+        self.sessions = max(0, self.sessions - 1)
+
+    def position(self, ticket: _Ticket) -> int:
+        """Return a waiting turn's 1-based place in the round-robin order."""
+        queue = self._queues.get(ticket.session)
+        if queue is None or ticket not in queue:
+            return 0
+        index = queue.index(ticket)
+        ahead, before = index, True
+        for session, other in self._queues.items():
+            if session == ticket.session:
+                before = False
+                continue
+            # earlier sessions in the ring are served once more in this ticket's round
+            ahead += min(len(other), index + 1 if before else index)
+        return ahead + 1
+
+    def _remove(self, ticket: _Ticket) -> None:
+        queue = self._queues.get(ticket.session)
+        if queue is None or ticket not in queue:
+            return
+        queue.remove(ticket)
+        self.queued -= 1
+        if not queue:
+            del self._queues[ticket.session]
+        self._notify()
+
+    def _notify(self) -> None:
+        """Wake every waiter so it can report its new position."""
+        for queue in self._queues.values():
+            for ticket in queue:
+                ticket.moved.set()
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the next sessions in the ring."""
+        now = time.monotonic()
+        moved = False
+        while self.running < self.max_turns and self._queues:
+            session, queue = self._queues.popitem(last=False)
+            ticket = queue.popleft()
+            self.queued -= 1
+            if queue:
+                # back of the ring: every other waiting session goes first
+                self._queues[session] = queue
+            moved = True
+            if ticket.expires <= now:
+                # its waiter is about to time out; leave the slot to the next turn
+                ticket.moved.set()
+                continue
+            ticket.granted = True
+            self.running += 1
+            ticket.moved.set()
+        if moved:
+            self._notify()
+
+    async def acquire(
+        self,
+        session: Hashable,
+        on_queued: Optional[Callable[[int, int], Awaitable[None]]] = None,
+        deadline: Optional[float] = None
+    ) -> float:
+        """Wait for a turn slot.
+
+        Args:
+            session: Key of the session the turn belongs to
+            on_queued: Awaited with (position, total waiting) when the turn
+                has to wait and whenever its position changes
+            deadline: Seconds the turn may wait; defaults to the scheduler's
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            TurnRejected: If the scheduler is saturated or the deadline passes
+        """
+        if self.running < self.max_turns and not self._queues:
+            self.running += 1
+            self.counters['started'] += 1
+            return 0.0
+        if self.queued >= self.max_queued:
+            self.counters['rejected'] += 1
+            rejected_turns.labels('saturated').inc()
+            raise TurnRejected('saturated', 'Too many turns waiting')
+
+        started = time.monotonic()
+        ticket = _Ticket(session, started + (self.deadline if deadline is None else deadline))
+        self._queues.setdefault(session, deque()).append(ticket)
+        self.queued += 1
+        self.counters['waited'] += 1
+        self._notify()
+        reported = None
+        try:
+            while not ticket.granted:
+                position = self.position(ticket)
+                if position == 0:
+                    break
+                if on_queued is not None and position != reported:
+                    reported = position
+                    try:
+                        await on_queued(position, self.queued)
+                    except Exception:
+                        pass
+                    if ticket.granted:
+                        break
+                ticket.moved.clear()
+                remaining = ticket.expires - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(ticket.moved.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+        except BaseException:
+            # cancelled while waiting (the client went away): give up the place or the slot
+            if ticket.granted:
+                self.release()
+            else:
+                self._remove(ticket)
+            raise
+        if not ticket.granted:
+            self._remove(ticket)
+            self.counters['expired'] += 1
+            rejected_turns.labels('deadline').inc()
+            raise TurnRejected('deadline', 'Turn waited too long for a slot')
+        self.counters['started'] += 1
+        return time.monotonic() - started
+
+    def release(self) -> None:
+        """Free a slot taken by ``acquire`` and start the next waiting turn."""
+        self.running = max(0, self.running - 1)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def turn(self, session: Hashable, on_queued=None, deadline: Optional[float] = None):
+        """Hold a turn slot for the duration of the block; yields seconds waited."""
+        waited = await self.acquire(session, on_queued, deadline)
+        try:
+            yield waited
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return limits, current load and counters."""
+        return {
+            'max_turns': self.max_turns,
+            'max_queued': self.max_queued,
+            'max_sessions': self.max_sessions,
+            'deadline': self.deadline,
+            'running': self.running,
+            'queued': self.queued,
+            'waiting_sessions': len(self._queues),
+            'sessions': self.sessions,
+            'saturated': self.saturated(),
+            **self.counters,
+        }
+
+
+turn_scheduler = TurnScheduler()
@@ -1,28 +1,60 @@
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
 import torch
 import numpy as np
 from typing import Tuple, Optional
 
+from .longform import LONGFORM_SECONDS, WINDOW_SECONDS, OVERLAP_SECONDS, SAMPLE_RATE, plan_windows, merge_transcripts
+
+try:
+    from model_store import get_store, fetch_stt
+except Exception:
+    try:
+        from backend.model_store import get_store, fetch_stt
+    except Exception:
+        from ..model_store import get_store, fetch_stt
+
 """
 Speech-to-Text recognition module using Silero STT model.
 
 Provides efficient, on-device speech recognition using the Silero VAD model
-with automatic model caching for performance optimization.
+with automatic model caching for performance optimization. Utterances longer
+than ``IHUB_STT_LONGFORM_SECONDS`` are split into overlapping windows (see
+``pipeline.longform``) transcribed in parallel.
 """
 
+# Windows of long utterances transcribed at once, shared by all sessions.
+# Each forward pass also uses torch's intra-op threads, so keep
+# workers x torch.get_num_threads() near the core count.
+STT_WORKERS = int(os.environ.get('IHUB_STT_WORKERS', str(min(4, os.cpu_count() or 1))))
+
 _cached = {}
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _window_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, STT_WORKERS), thread_name_prefix='stt-window')
+        return _pool
 
 
 def load_stt_model(device: Optional[torch.device] = None) -> Tuple:
     """Load and cache Silero STT model.
     
-    Loads the Silero STT model from PyTorch Hub with caching to avoid
-    redundant downloads and initialization.
+    Loads the Silero STT model from the local model store when one has been
+    built (see ``model_store``), otherwise from PyTorch Hub, with caching to
+    avoid redundant loads.
     
     Args:
         device: Torch device to load model on. Defaults to CPU
         
     Returns:
-        Tuple of (model, decoder, utils) from Silero STT
+        Tuple of (model, decoder, utils) from Silero STT; utils is None
+        when loaded from the model store
         
     Raises:
         RuntimeError: If model loading fails
@@ -38,13 +70,12 @@ def load_stt_model(device: Optional[torch.device] = None) -> Tuple:
         device = torch.device(device)
 
     try:
-        # Load from official upstream PyTorch Hub
-        model, decoder, utils = torch.hub.load(
-            repo_or_dir='snakers4/silero-models',
-            model='silero_stt',
-            language='en',
-            device=device
-        )
+        store = get_store()
+        if store is not None:
+            model, decoder = store.load_stt(device)
+            utils = None
+        else:
+            model, decoder, utils = fetch_stt(device)
         _cached[key] = (model, decoder, utils)
         return _cached[key]
     except Exception as e:
@@ -54,16 +85,19 @@ def load_stt_model(device: Optional[torch.device] = None) -> Tuple:
 class STT:
     """Speech-to-Text transcription service using Silero model."""
 
-    def __init__(self, device: Optional[torch.device] = None):
+    def __init__(self, device: Optional[torch.device] = None, longform_seconds: float = LONGFORM_SECONDS):
         """Initialize STT service.
         
         Args:
             device: Torch device to use. Defaults to CPU
+            longform_seconds: Utterances longer than this are transcribed in
+                parallel windows; 0 always uses a single pass
             
         Raises:
             RuntimeError: If model loading fails
         """
         self.device = device or torch.device("cpu")
+        self.longform_seconds = longform_seconds
         try:
             self.model, self.decoder, self.utils = load_stt_model(device=self.device)
         except Exception as e:
@@ -75,6 +109,18 @@ class STT:
         Args:
             audio: 1D float32 numpy array with audio samples normalized to [-1, 1]
             
+        Returns:
+            Transcribed text string, empty string if transcription fails
+        """
+        if audio.size == 0:
+            return ""
+        if self.longform_seconds > 0 and audio.size > self.longform_seconds * SAMPLE_RATE:
+            return self.transcribe_long(audio)
+        return self.transcribe_single(audio)
+
+    def transcribe_single(self, audio: np.ndarray) -> str:
+        """Transcribe audio in one forward pass.
+        
         Returns:
             Transcribed text string, empty string if transcription fails
         """
@@ -91,3 +137,27 @@ class STT:
             return ""
         except Exception:
             return ""
+
+    def transcribe_long(
+        self,
+        audio: np.ndarray,
+        pool: Optional[Executor] = None,
+        window: float = WINDOW_SECONDS,
+        overlap: float = OVERLAP_SECONDS
+    ) -> str:
+        """Transcribe audio as overlapping windows in parallel and merge the texts.
+        
+        Args:
+            audio: 1D float32 numpy array at 16 kHz
+            pool: Executor to run windows on; defaults to the shared STT pool
+            window: Target seconds between cuts
+            overlap: Seconds shared by neighbouring windows
+            
+        Returns:
+            Transcribed text string, empty string if transcription fails
+        """
+        windows = plan_windows(audio, SAMPLE_RATE, window, overlap)
+        if len(windows) == 1:
+            return self.transcribe_single(audio)
+        texts = (pool or _window_pool()).map(lambda w: self.transcribe_single(audio[w[0]:w[1]]), windows)
+        return merge_transcripts([t for t in texts if t])
@@ -0,0 +1,100 @@
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Optional
+
+import numpy as np
+
+try:
+    from cache_manager import get_cache_manager
+except Exception:
+    try:
+        from backend.cache_manager import get_cache_manager
+    except Exception:
+        from ..cache_manager import get_cache_manager
+
+"""
+Background transcoding of synthesized speech to compact variants.
+
+After a TTS result is saved, an Opus-in-Ogg copy ``<id>.ogg`` is written next
+to it on a worker thread. ``/audio`` serves that copy to clients that accept
+it, cutting the download on slow links to a fraction of the WAV size.
+"""
+
+TRANSCODE_ENABLED = os.environ.get('IHUB_TRANSCODE', '1') != '0'
+
+COMPACT_EXT = '.ogg'
+COMPACT_MIME = 'audio/ogg'
+
+# Sample rates the Opus encoder accepts
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='transcode')
+
+
+def _resample(samples: np.ndarray, rate: int) -> tuple:
+    """Resample to the nearest Opus rate at or above ``rate`` by linear interpolation."""
+    target = next((r for r in OPUS_RATES if r >= rate), OPUS_RATES[-1])
+    if target == rate or samples.size == 0:
+        return samples, rate
+    n = int(round(samples.size * target / rate))
+    positions = np.linspace(0, samples.size - 1, n)
+    return np.interp(positions, np.arange(samples.size), samples).astype(np.float32), target
+
+
+def transcode_to_opus(src: str, dst: str) -> None:
+    """Encode an audio file as mono Opus in an Ogg container.
+
+    Args:
+        src: Source audio file path
+        dst: Destination path; written atomically
+
+    Raises:
+        RuntimeError: If the source cannot be decoded or the encode fails
+    """
+    import soundfile as sf
+
+    try:
+        samples, rate = sf.read(src, dtype='float32', always_2d=True)
+        mono, rate = _resample(samples.mean(axis=1), rate)
+        tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            sf.write(tmp, mono, rate, format='OGG', subtype='OPUS')
+            os.replace(tmp, dst)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    except Exception as e:
+        raise RuntimeError(f'Failed to transcode {src}: {e}')
+
+
+def compact_name(filename: str) -> str:
+    """Return the compact variant's filename for an audio file."""
+    return filename.split('.', 1)[0] + COMPACT_EXT
+
+
+def schedule_transcode(cache_dir: str, filename: str) -> Optional[Future]:
+    """Queue the compact variant of a cached file for encoding.
+
+    Args:
+        cache_dir: Cache directory holding the file
+        filename: Name of the source audio file
+
+    Returns:
+        Future for the job, or None if there is nothing to do
+    """
+    if not TRANSCODE_ENABLED or filename.endswith(COMPACT_EXT):
+        return None
+    dst_name = compact_name(filename)
+    dst = os.path.join(cache_dir, dst_name)
+    if os.path.exists(dst):
+        return None
+
+    def job():
+        transcode_to_opus(os.path.join(cache_dir, filename), dst)
+        get_cache_manager(cache_dir).register(dst_name)
+
+    future = _executor.submit(job)
+    # failures only mean the original is served; keep them out of the logs
+    future.add_done_callback(lambda f: f.exception())
+    return future
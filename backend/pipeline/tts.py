@@ -1,19 +1,43 @@
-import requests
+import httpx
+import asyncio
+import hashlib
 import json
 import os
+import threading
 import time
 import uuid
-from typing import Optional
+import weakref
+from typing import Optional, Dict, Tuple, Any
+from .tts_cache import synthesis_key, get_result_cache
+from .transcode import schedule_transcode
+
+try:
+    from metrics import queue_depth
+    from tracing import observe_stage, timed_stage, current_trace_id
+except Exception:
+    try:
+        from backend.metrics import queue_depth
+        from backend.tracing import observe_stage, timed_stage, current_trace_id
+    except Exception:
+        from ..metrics import queue_depth
+        from ..tracing import observe_stage, timed_stage, current_trace_id
 
 """
 Text-to-Speech synthesis module using remote IndexTTS service.
 
 This module provides functions to synthesize text into speech using a remote TTS API,
 with support for voice reference files and local caching of generated audio.
+
+Requests go through ``AsyncTTSClient``, which keeps a keep-alive connection pool,
+consumes the Gradio event stream once instead of polling, and streams the result
+to disk. ``synthesize_text`` remains available as a blocking wrapper.
+
+Results are content-addressed: a repeated (text, voice, parameters) request
+returns the existing file without contacting the service.
 """
 
 # Configuration for the IndexTTS demo service
-BASE = "https://indexteam-indextts-2-demo.hf.space"
+BASE = os.environ.get('IHUB_TTS_BASE', "https://indexteam-indextts-2-demo.hf.space").rstrip('/')
 UPLOAD_URL = f"{BASE}/gradio_api/upload?upload_id=python_upload"
 QUEUE_URL = f"{BASE}/gradio_api/queue/join?__theme=system"
 DATA_URL_TEMPLATE = f"{BASE}/gradio_api/queue/data?session_hash={{session_hash}}"
@@ -21,152 +45,511 @@ DATA_URL_TEMPLATE = f"{BASE}/gradio_api/queue/data?session_hash={{session_hash}}
 # Default voice reference file path
 DEFAULT_VOICE_REF = os.path.join(os.path.dirname(__file__), '..', 'sample', 'sample_1.mp3')
 
+# Seconds an uploaded voice reference is trusted before it is uploaded again
+VOICE_UPLOAD_TTL = float(os.environ.get('IHUB_TTS_UPLOAD_TTL', '1800'))
 
-def synthesize_text(
+# Connection pool size per event loop
+MAX_CONNECTIONS = int(os.environ.get('IHUB_TTS_MAX_CONNECTIONS', '8'))
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Times the event stream is reopened after dropping before the job completes
+STREAM_RECONNECTS = 2
+
+# Seconds before the first reopen; doubled for each further attempt
+STREAM_RECONNECT_DELAY = 0.5
+
+# Request header carrying the turn's trace ID
+TRACE_HEADER = 'X-Request-ID'
+
+# Emotion control mode and generation parameters sent with every request
+EMOTION_MODE = "Same as the voice reference"
+SYNTHESIS_PARAMS = [
+    0.8, 0, 0, 0, 0, 0, 0, 0, 0, "",
+    False, 120, True, 0.8, 30, 0.8, 0, 3, 10, 1500
+]
+
+
+class TTSRemoteRejected(RuntimeError):
+    """Raised when the TTS service rejects a queued synthesis job."""
+
+
+class VoiceReferenceCache:
+    """Cache of uploaded voice-reference files keyed by content hash.
+
+    The remote service only needs each reference uploaded once; the returned
+    Gradio ``file_info`` is reused until it expires or the remote rejects it.
+    Entries are keyed by the SHA-256 of the file contents, so several
+    characters sharing a reference also share the upload.
+    """
+
+    def __init__(self, ttl: float = VOICE_UPLOAD_TTL):
+        """Initialize the cache.
+
+        Args:
+            ttl: Seconds an uploaded reference stays valid
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._digests: Dict[Tuple[str, int, int], str] = {}
+
+    def content_hash(self, path: str) -> str:
+        """Return the SHA-256 of a voice reference, memoized by path, size and mtime.
+
+        Args:
+            path: Path to the voice reference file
+
+        Returns:
+            Hex digest of the file contents
+        """
+        st = os.stat(path)
+        key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest:
+            return digest
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with self._lock:
+            self._digests[key] = digest
+        return digest
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Return the cached ``file_info`` for a digest, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if not entry:
+                return None
+            uploaded_at, file_info = entry
+            if time.monotonic() - uploaded_at > self.ttl:
+                del self._entries[digest]
+                return None
+            return file_info
+
+    def put(self, digest: str, file_info: Dict[str, Any]) -> None:
+        """Store the ``file_info`` returned by an upload."""
+        with self._lock:
+            self._entries[digest] = (time.monotonic(), file_info)
+
+    def invalidate(self, digest: str) -> None:
+        """Forget an upload, forcing the next request to upload again."""
+        with self._lock:
+            self._entries.pop(digest, None)
+
+
+voice_cache = VoiceReferenceCache()
+
+
+class AsyncTTSClient:
+    """Asynchronous IndexTTS client backed by a pooled keep-alive HTTP connection.
+
+    One client is bound to one event loop; use ``get_client`` to obtain the
+    client for the running loop.
+    """
+
+    def __init__(self, max_connections: int = MAX_CONNECTIONS):
+        """Initialize the client.
+
+        Args:
+            max_connections: Maximum pooled connections to the TTS service
+        """
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(20.0),
+            headers={"Origin": BASE},
+        )
+
+    async def aclose(self) -> None:
+        """Close the connection pool."""
+        await self._http.aclose()
+
+    async def _upload_voice_ref(self, voice_ref: str) -> Optional[Dict[str, Any]]:
+        """Upload a voice reference and build the Gradio ``file_info`` payload.
+
+        Args:
+            voice_ref: Path to the voice reference file
+
+        Returns:
+            Gradio FileData dictionary, or None if the upload failed
+        """
+        try:
+            with open(voice_ref, 'rb') as vf:
+                content = vf.read()
+            files = {"files": (os.path.basename(voice_ref), content, 'audio/mpeg')}
+            resp = await self._http.post(UPLOAD_URL, files=files)
+            resp.raise_for_status()
+            upload_data = resp.json()
+            if not (isinstance(upload_data, list) and upload_data):
+                return None
+            upload_path = upload_data[0]
+            return {
+                "path": upload_path,
+                "url": f"{BASE}/gradio_api/file={upload_path}",
+                "orig_name": os.path.basename(voice_ref),
+                "size": len(content),
+                "mime_type": "audio/mpeg",
+                "meta": {"_type": "gradio.FileData"}
+            }
+        except Exception:
+            return None
+
+    async def get_voice_file_info(
+        self,
+        voice_ref: str,
+        refresh: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str], bool]:
+        """Return the uploaded ``file_info`` for a voice reference, uploading on a cache miss.
+
+        Args:
+            voice_ref: Path to the voice reference file
+            refresh: Ignore any cached upload and upload again
+
+        Returns:
+            Tuple of (file_info, content digest, whether file_info came from the cache)
+        """
+        if not voice_ref or not os.path.exists(voice_ref):
+            return None, None, False
+        try:
+            digest = voice_cache.content_hash(voice_ref)
+        except OSError:
+            return None, None, False
+
+        if refresh:
+            voice_cache.invalidate(digest)
+        else:
+            file_info = voice_cache.get(digest)
+            if file_info:
+                return file_info, digest, True
+
+        file_info = await self._upload_voice_ref(voice_ref)
+        if file_info:
+            voice_cache.put(digest, file_info)
+        return file_info, digest, False
+
+    async def _run_synthesis(self, text: str, file_info: Optional[Dict[str, Any]]) -> Any:
+        """Queue a synthesis job and wait for its completion event.
+
+        The queue/data endpoint is read as a server-sent event stream; the job
+        result is taken from the ``process_completed`` event as soon as it arrives.
+        Time spent queued on the remote (until ``process_starts``) and running
+        there are recorded as the ``tts_queue_wait`` and ``tts_synthesis`` stages.
+        A stream that drops before the result is reopened up to
+        ``STREAM_RECONNECTS`` times with backoff; ``close_stream`` without a
+        result fails at once, since the remote has dropped the job.
+
+        Returns:
+            The ``output.data`` list of the completed job
+
+        Raises:
+            TTSRemoteRejected: If the remote refuses the job or reports a failure
+            RuntimeError: If queuing fails or the stream ends without a result
+        """
+        session_hash = f"python_session_{uuid.uuid4().hex[:8]}"
+
+        # Build payload (closely following the original script's shape)
+        data_array = [EMOTION_MODE, file_info, text, None, *SYNTHESIS_PARAMS]
+
+        payload = {"data": data_array, "event_data": None, "fn_index": 6, "trigger_id": 7, "session_hash": session_hash}
+
+        # Send synthesis request, tagged with the turn's trace ID for correlation
+        trace_id = current_trace_id()
+        headers = {TRACE_HEADER: trace_id} if trace_id else None
+        try:
+            queue_response = await self._http.post(QUEUE_URL, json=payload, headers=headers)
+            if 400 <= queue_response.status_code < 500:
+                raise TTSRemoteRejected(f'TTS queue rejected request: HTTP {queue_response.status_code}')
+            queue_response.raise_for_status()
+            event_id = queue_response.json().get('event_id')
+            if not event_id:
+                raise RuntimeError('No event_id from TTS queue response')
+        except TTSRemoteRejected:
+            raise
+        except Exception as e:
+            raise RuntimeError(f'TTS queue request failed: {e}')
+
+        # Consume the event stream; reopen it a few times if it ends or drops before completion
+        joined = started = time.perf_counter()
+        data_url = DATA_URL_TEMPLATE.format(session_hash=session_hash)
+        stream_timeout = httpx.Timeout(20.0, read=None)
+        last_error = None
+        for attempt in range(STREAM_RECONNECTS + 1):
+            if attempt:
+                await asyncio.sleep(STREAM_RECONNECT_DELAY * 2 ** (attempt - 1))
+            try:
+                async with self._http.stream('GET', data_url, timeout=stream_timeout) as r:
+                    r.raise_for_status()
+                    async for line in r.aiter_lines():
+                        if not line.startswith('data: '):
+                            continue
+                        try:
+                            ev = json.loads(line[6:])
+                        except ValueError:
+                            continue
+                        msg = ev.get('msg')
+                        if msg == 'process_starts':
+                            started = time.perf_counter()
+                            observe_stage('tts_queue_wait', started - joined)
+                        elif msg == 'process_completed':
+                            observe_stage('tts_synthesis', time.perf_counter() - started)
+                            if ev.get('success') is False:
+                                raise TTSRemoteRejected(f"TTS job failed: {(ev.get('output') or {}).get('error')}")
+                            result_data = (ev.get('output') or {}).get('data')
+                            if not result_data:
+                                raise RuntimeError('TTS job completed without output')
+                            return result_data
+                        if msg == 'close_stream':
+                            # the remote has finished with this session; the job will not complete
+                            raise RuntimeError('TTS event stream closed without a result')
+            except (TTSRemoteRejected, RuntimeError):
+                raise
+            except httpx.TransportError as e:
+                # connection dropped mid-stream (read error, broken keep-alive): reconnect
+                last_error = e
+                continue
+            except httpx.HTTPError as e:
+                raise RuntimeError(f'TTS event stream failed: {e}')
+        reason = f': {last_error!r}' if last_error else ''
+        raise RuntimeError(f'TTS event stream ended without a result after {STREAM_RECONNECTS + 1} attempts{reason}')
+
+    async def _download(self, audio_url: str, cache_dir: str, audio_id: str) -> str:
+        """Stream the synthesized audio to disk in chunks.
+
+        Returns:
+            Filename (with extension) of the saved file in cache_dir
+        """
+        tmp_path = os.path.join(cache_dir, f".{audio_id}.{uuid.uuid4().hex[:8]}.part")
+        try:
+            async with self._http.stream('GET', audio_url) as r:
+                r.raise_for_status()
+                content_type = r.headers.get('content-type', '')
+                ext = '.wav' if 'wav' in content_type or audio_url.lower().endswith('.wav') else os.path.splitext(audio_url)[1] or '.wav'
+                with open(tmp_path, 'wb') as f:
+                    async for chunk in r.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+            filename = f"{audio_id}{ext}"
+            os.replace(tmp_path, os.path.join(cache_dir, filename))
+            return filename
+        except BaseException as e:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            if not isinstance(e, Exception):
+                raise
+            raise RuntimeError(f'Failed to download TTS audio: {e}')
+
+    async def synthesize(
+        self,
+        text: str,
+        cache_dir: str,
+        voice_ref: str,
+        timeout: float = 60,
+        audio_id: Optional[str] = None
+    ) -> str:
+        """Synthesize text and save the result into cache_dir.
+
+        Args:
+            text: Text to synthesize
+            cache_dir: Directory to save the audio file in
+            voice_ref: Path to voice reference audio file
+            timeout: Maximum seconds to wait for the job to complete
+            audio_id: File stem for the result. Defaults to a random ID
+
+        Returns:
+            Filename (with extension) of the generated audio file in cache_dir
+
+        Raises:
+            RuntimeError: If synthesis, streaming, or download fails
+        """
+        file_info, _, from_cache = await self.get_voice_file_info(voice_ref)
+        try:
+            try:
+                result_data = await asyncio.wait_for(self._run_synthesis(text, file_info), timeout)
+            except TTSRemoteRejected:
+                if not from_cache:
+                    raise
+                # The remote may have dropped our earlier upload; upload again and retry once
+                file_info, _, _ = await self.get_voice_file_info(voice_ref, refresh=True)
+                result_data = await asyncio.wait_for(self._run_synthesis(text, file_info), timeout)
+        except asyncio.TimeoutError:
+            raise RuntimeError('TTS synthesis timed out')
+
+        # Download first file from result_data
+        audio_url = None
+        if isinstance(result_data, list) and len(result_data) > 0:
+            first = result_data[0]
+            file_data = first.get('value') if isinstance(first, dict) and first.get('value') else first
+            if isinstance(file_data, dict) and file_data.get('url'):
+                audio_url = file_data.get('url')
+
+        if not audio_url:
+            raise RuntimeError('No audio URL in TTS result')
+
+        with timed_stage('tts_download'):
+            return await self._download(audio_url, cache_dir, audio_id or uuid.uuid4().hex)
+
+    async def synthesize_cached(
+        self,
+        text: str,
+        cache_dir: str,
+        voice_ref: str,
+        timeout: float = 60,
+        breaker: Optional[Any] = None
+    ) -> str:
+        """Return the content-addressed result for a request, synthesizing it on a miss.
+
+        Concurrent requests for the same key share a single synthesis. On a
+        miss the remote call goes through ``breaker`` when one is given, so
+        cached phrases are still served while the circuit is open.
+        """
+        cache = get_result_cache(cache_dir)
+        voice_hash = None
+        if voice_ref and os.path.exists(voice_ref):
+            voice_hash = voice_cache.content_hash(voice_ref)
+        key = synthesis_key(text, voice_hash, [EMOTION_MODE, *SYNTHESIS_PARAMS])
+
+        filename = cache.lookup(key)
+        if filename:
+            return filename
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            cache.record_coalesced()
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        inflight = queue_depth.labels('tts_inflight')
+        inflight.inc()
+        try:
+            if breaker is not None:
+                filename = await breaker.call(
+                    lambda: self.synthesize(text, cache_dir, voice_ref, timeout, audio_id=key), timeout
+                )
+            else:
+                filename = await self.synthesize(text, cache_dir, voice_ref, timeout, audio_id=key)
+            cache.store(key, filename)
+            schedule_transcode(cache_dir, filename)
+            future.set_result(filename)
+            return filename
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # waiters re-raise; mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            inflight.dec()
+
+
+# One client per event loop, since pooled connections cannot cross loops
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncTTSClient]" = weakref.WeakKeyDictionary()
+
+
+def get_client() -> AsyncTTSClient:
+    """Return the TTS client bound to the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = AsyncTTSClient()
+        _clients[loop] = client
+    return client
+
+
+def _default_cache_dir() -> str:
+    # IHUB_CACHE_DIR, else backend/cache relative to repo
+    return os.path.abspath(os.environ.get('IHUB_CACHE_DIR', os.path.join(os.path.dirname(__file__), '..', 'cache')))
+
+
+async def asynthesize_text(
     text: str,
     cache_dir: Optional[str] = None,
     voice_ref: Optional[str] = None,
-    timeout: int = 60
+    timeout: float = 60,
+    breaker: Optional[Any] = None
 ) -> str:
     """Synthesize text into speech using remote TTS service.
-    
+
     Converts text to speech using the IndexTTS service and caches the resulting
-    audio file locally for efficient retrieval.
-    
+    audio file locally for efficient retrieval. Results are stored under a hash
+    of the text, voice reference and parameters, so repeated phrases are served
+    from the cache. The voice reference upload is cached by content hash and
+    only repeated when it expires or the remote rejects the stale path.
+
     Args:
         text: Text to synthesize
         cache_dir: Directory to cache audio files. Defaults to backend/cache
         voice_ref: Path to voice reference audio file. Uses default if not provided
         timeout: Maximum seconds to wait for synthesis. Defaults to 60
-        
+        breaker: Optional circuit breaker guarding the remote call
+
     Returns:
         Filename (with extension) of the generated audio file in cache_dir
-        
+
     Raises:
-        RuntimeError: If synthesis, polling, or download fails
+        RuntimeError: If synthesis, streaming, or download fails, or the
+            breaker's circuit is open
     """
-    if cache_dir is None:
-        # default to backend/cache relative to repo
-        cache_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'cache'))
+    cache_dir = cache_dir or _default_cache_dir()
     os.makedirs(cache_dir, exist_ok=True)
+    return await get_client().synthesize_cached(text, cache_dir, voice_ref or DEFAULT_VOICE_REF, timeout, breaker)
 
-    voice_ref = voice_ref or DEFAULT_VOICE_REF
 
-    session_hash = f"python_session_{uuid.uuid4().hex[:8]}"
-    headers = {"Content-Type": "application/json", "Origin": BASE}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
 
-    # Upload voice reference if available
-    upload_path = None
-    if voice_ref and os.path.exists(voice_ref):
-        try:
-            with open(voice_ref, 'rb') as vf:
-                files = {"files": (os.path.basename(voice_ref), vf, 'audio/mpeg')}
-                resp = requests.post(UPLOAD_URL, files=files, timeout=20)
-                resp.raise_for_status()
-                upload_data = resp.json()
-                if isinstance(upload_data, list) and upload_data:
-                    upload_path = upload_data[0]
-        except Exception:
-            upload_path = None
 
-    # Build file_info only if we have an upload_path
-    file_info = None
-    if upload_path:
-        try:
-            file_info = {
-                "path": upload_path,
-                "url": f"{BASE}/gradio_api/file={upload_path}",
-                "orig_name": os.path.basename(voice_ref),
-                "size": os.path.getsize(voice_ref),
-                "mime_type": "audio/mpeg",
-                "meta": {"_type": "gradio.FileData"}
-            }
-        except Exception:
-            file_info = None
+def _background_loop() -> asyncio.AbstractEventLoop:
+    """Return a long-lived event loop thread used by the blocking wrapper."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='tts-client', daemon=True).start()
+        return _loop
 
-    # Build payload (closely following the original script's shape)
-    data_array = [
-        "Same as the voice reference",
-        file_info,
-        text,
-        None,
-        0.8, 0, 0, 0, 0, 0, 0, 0, 0, "",
-        False, 120, True, 0.8, 30, 0.8, 0, 3, 10, 1500
-    ]
 
-    payload = {"data": data_array, "event_data": None, "fn_index": 6, "trigger_id": 7, "session_hash": session_hash}
+def run_sync(coro: Any) -> Any:
+    """Run a coroutine on the background loop and block until it finishes.
 
-    # Send synthesis request
-    try:
-        queue_response = requests.post(QUEUE_URL, headers=headers, data=json.dumps(payload), timeout=20)
-        queue_response.raise_for_status()
-        queue_data = queue_response.json()
-        event_id = queue_data.get('event_id')
-        if not event_id:
-            raise RuntimeError('No event_id from TTS queue response')
-    except Exception as e:
-        raise RuntimeError(f'TTS queue request failed: {e}')
-
-    # Poll for result
-    data_url = DATA_URL_TEMPLATE.format(session_hash=session_hash)
-    attempts = 0
-    max_attempts = max(5, timeout)
-    result_data = None
-    while attempts < max_attempts:
-        attempts += 1
-        try:
-            r = requests.get(data_url, headers=headers, stream=True, timeout=10)
-            if r.status_code != 200:
-                time.sleep(1)
-                continue
-            for line in r.iter_lines():
-                if not line:
-                    continue
-                try:
-                    s = line.decode('utf-8')
-                except Exception:
-                    continue
-                if not s.startswith('data: '):
-                    continue
-                try:
-                    ev = json.loads(s[6:])
-                except Exception:
-                    continue
-                msg = ev.get('msg')
-                if msg == 'process_completed':
-                    result_data = ev.get('output', {}).get('data')
-                    break
-            if result_data:
-                break
-        except Exception:
-            time.sleep(1)
+    Args:
+        coro: Coroutine to run
+
+    Returns:
+        The coroutine's result
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _background_loop()).result()
+
+
+def synthesize_text(
+    text: str,
+    cache_dir: Optional[str] = None,
+    voice_ref: Optional[str] = None,
+    timeout: int = 60
+) -> str:
+    """Blocking wrapper around ``asynthesize_text``.
 
-    if not result_data:
-        raise RuntimeError('TTS polling timed out')
+    Runs on a dedicated background event loop so the connection pool is kept
+    across calls. Must not be called from that loop's own thread.
 
-    # Download first file from result_data
-    audio_url = None
-    if isinstance(result_data, list) and len(result_data) > 0:
-        first = result_data[0]
-        file_data = first.get('value') if isinstance(first, dict) and first.get('value') else first
-        if isinstance(file_data, dict) and file_data.get('url'):
-            audio_url = file_data.get('url')
+    Args:
+        text: Text to synthesize
+        cache_dir: Directory to cache audio files. Defaults to backend/cache
+        voice_ref: Path to voice reference audio file. Uses default if not provided
+        timeout: Maximum seconds to wait for synthesis. Defaults to 60
 
-    if not audio_url:
-        raise RuntimeError('No audio URL in TTS result')
+    Returns:
+        Filename (with extension) of the generated audio file in cache_dir
 
-    # Fetch audio and save to cache_dir with uuid
-    try:
-        r = requests.get(audio_url, timeout=20)
-        r.raise_for_status()
-        content_type = r.headers.get('content-type', '')
-        ext = '.wav' if 'wav' in content_type or audio_url.lower().endswith('.wav') else os.path.splitext(audio_url)[1] or '.wav'
-        audio_id = uuid.uuid4().hex
-        filename = f"{audio_id}{ext}"
-        out_path = os.path.join(cache_dir, filename)
-        with open(out_path, 'wb') as f:
-            f.write(r.content)
-        # return the saved filename (includes extension) so callers can fetch /cache/<filename>
-        return filename
-    except Exception as e:
-        raise RuntimeError(f'Failed to download TTS audio: {e}')
\ No newline at end of file
+    Raises:
+        RuntimeError: If synthesis, streaming, or download fails
+    """
+    return run_sync(asynthesize_text(text, cache_dir, voice_ref, timeout))
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Optional, Dict, Any, List
+
+try:
+    from cache_manager import get_cache_manager
+except Exception:
+    try:
+        from backend.cache_manager import get_cache_manager
+    except Exception:
+        from ..cache_manager import get_cache_manager
+
+"""
+Content-addressed cache for synthesized speech.
+
+Each TTS result is saved as ``<key><ext>`` where the key is a hash of the
+text, the voice reference contents and the synthesis parameters. A repeated
+request for the same phrase is answered from the cache directory index without
+contacting the TTS service.
+"""
+
+KEY_LENGTH = 32
+
+
+def synthesis_key(text: str, voice_hash: Optional[str], params: List[Any]) -> str:
+    """Return the cache key for one synthesis request.
+
+    Args:
+        text: Text to synthesize
+        voice_hash: SHA-256 of the voice reference, or None without one
+        params: Synthesis parameters sent to the remote service
+
+    Returns:
+        Hex key used as the audio ID and file stem
+    """
+    material = json.dumps([text, voice_hash, params], separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:KEY_LENGTH]
+
+
+class TTSResultCache:
+    """Synthesized audio lookups in one cache directory.
+
+    Entries live in the directory's ``CacheManager`` index, which also evicts
+    them; this class adds the hit and miss counters kept for reporting.
+    """
+
+    def __init__(self, cache_dir: str):
+        """Initialize the cache.
+
+        Args:
+            cache_dir: Directory holding the audio files
+        """
+        self.cache_dir = cache_dir
+        self.manager = get_cache_manager(cache_dir)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def lookup(self, key: str) -> Optional[str]:
+        """Return the cached filename for a key, counting the hit or miss."""
+        path = self.manager.lookup(key)
+        filename = os.path.basename(path) if path else None
+        with self._lock:
+            if filename:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return filename
+
+    def record_coalesced(self) -> None:
+        """Count a miss that joined an identical in-flight synthesis."""
+        with self._lock:
+            self.coalesced += 1
+
+    def store(self, key: str, filename: str) -> None:
+        """Record a newly synthesized file under its key."""
+        self.manager.register(filename)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return entry count and hit/miss counters."""
+        entries = self.manager.stats()['entries']
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                # each one is a synthesis, an event stream and a download not made
+                'remote_calls_avoided': self.hits + self.coalesced,
+            }
+
+
+_caches: Dict[str, TTSResultCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(cache_dir: str) -> TTSResultCache:
+    """Return the result cache for a directory, indexing it on first use."""
+    cache_dir = os.path.abspath(cache_dir)
+    with _caches_lock:
+        cache = _caches.get(cache_dir)
+        if cache is None:
+            cache = TTSResultCache(cache_dir)
+            _caches[cache_dir] = cache
+        return cache
+
+
+def cache_stats() -> Dict[str, Any]:
+    """Return counters summed over every cache directory in use."""
+    with _caches_lock:
+        caches = list(_caches.values())
+    totals = {'entries': 0, 'hits': 0, 'misses': 0, 'coalesced': 0, 'remote_calls_avoided': 0}
+    for cache in caches:
+        for key, value in cache.stats().items():
+            if key in totals:
+                totals[key] += value
+    lookups = totals['hits'] + totals['misses']
+    totals['hit_ratio'] = totals['hits'] / lookups if lookups else 0.0
+    return totals
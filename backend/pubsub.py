@@ -0,0 +1,221 @@
+import asyncio
+import fcntl
+import json
+import os
+import tempfile
+from typing import Optional, Dict, Any, Callable, Set
+
+"""
+Pluggable pub/sub transport for WebSocket broadcasts.
+
+``InProcessBus`` hands messages straight to the local ConnectionManager and
+is all a single worker needs. ``UnixSocketBus`` links the uvicorn workers of
+one host through a Unix domain socket, with no outside service: the first
+worker to take the lock file becomes the hub and relays every frame to the
+other workers; the rest connect to it. If the hub worker exits, another
+takes the lock and the others reconnect.
+
+Frames are newline-delimited JSON ``[topic, message, key]``. Select the
+transport with ``IHUB_BUS=local|unix``.
+"""
+
+BUS_BACKEND = os.environ.get('IHUB_BUS', 'local')
+BUS_PATH = os.environ.get('IHUB_BUS_PATH', os.path.join(tempfile.gettempdir(), 'ihub-bus.sock'))
+
+# Largest frame accepted from a peer
+MAX_FRAME = 1024 * 1024
+
+# Bytes buffered for a peer before frames to it are dropped
+MAX_PEER_BUFFER = 8 * 1024 * 1024
+
+# Seconds between attempts to reach or become the hub
+RECONNECT_DELAY = 0.2
+
+# Called with (topic, message, key) for every message, local or remote
+Handler = Callable[[str, str, Optional[str]], Any]
+
+
+class InProcessBus:
+    """Delivers messages to this process only."""
+
+    role = 'local'
+
+    def __init__(self):
+        self.handler: Optional[Handler] = None
+        self.counters = {'published': 0, 'received': 0}
+
+    async def start(self, handler: Handler) -> None:
+        self.handler = handler
+
+    def publish(self, topic: str, message: str, key: Optional[str] = None) -> None:
+        self.counters['published'] += 1
+        if self.handler:
+            self.handler(topic, message, key)
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': 'local', 'role': self.role, **self.counters}
+
+
+class UnixSocketBus:
+    """Relays messages between the workers of one host over a Unix socket."""
+
+    def __init__(self, path: str = BUS_PATH):
+        """Initialize the bus.
+
+        Args:
+            path: Socket path shared by all workers; ``<path>.lock`` elects the hub
+        """
+        self.path = path
+        self.handler: Optional[Handler] = None
+        self.role: Optional[str] = None
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._peers: Set[asyncio.StreamWriter] = set()
+        self._hub: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+        self.counters = {'published': 0, 'received': 0, 'forwarded': 0, 'dropped': 0, 'reconnects': 0}
+
+    async def start(self, handler: Handler) -> None:
+        """Join the bus, as hub or peer, and deliver incoming messages to ``handler``."""
+        self.handler = handler
+        await self._join()
+
+    def _try_lock(self) -> bool:
+        fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    async def _join(self) -> None:
+        while not self._closed:
+            if self._try_lock():
+                # the lock holder owns the path; anything there is stale
+                try:
+                    os.unlink(self.path)
+                except FileNotFoundError:
+                    pass
+                self._server = await asyncio.start_unix_server(self._serve_peer, path=self.path, limit=MAX_FRAME)
+                self.role = 'hub'
+                return
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path, limit=MAX_FRAME)
+            except OSError:
+                # the hub holds the lock but is not listening yet
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            self._hub = writer
+            self.role = 'peer'
+            self._task = asyncio.create_task(self._read_hub(reader))
+            return
+
+    def _deliver(self, line: bytes) -> None:
+        try:
+            topic, message, key = json.loads(line)
+        except (ValueError, TypeError):
+            return
+        self.counters['received'] += 1
+        if self.handler:
+            self.handler(topic, message, key)
+
+    def _send(self, writer: asyncio.StreamWriter, frame: bytes) -> None:
+        if writer.is_closing() or writer.transport.get_write_buffer_size() > MAX_PEER_BUFFER:
+            self.counters['dropped'] += 1
+            return
+        writer.write(frame)
+
+    async def _serve_peer(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Hub side: relay each frame from a peer to every other peer and deliver it here."""
+        self._peers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                for peer in list(self._peers):
+                    if peer is not writer:
+                        self._send(peer, line)
+                        self.counters['forwarded'] += 1
+                self._deliver(line)
+        except (OSError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # shutdown; asyncio would log a cancelled connection handler as an error
+            pass
+        finally:
+            self._peers.discard(writer)
+            writer.close()
+
+    async def _read_hub(self, reader: asyncio.StreamReader) -> None:
+        """Peer side: deliver frames from the hub; rejoin when it goes away."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._deliver(line)
+        except (OSError, asyncio.LimitOverrunError, ValueError):
+            pass
+        if self._hub is not None:
+            self._hub.close()
+            self._hub = None
+        if not self._closed:
+            self.counters['reconnects'] += 1
+            await self._join()
+
+    def publish(self, topic: str, message: str, key: Optional[str] = None) -> None:
+        """Deliver a message locally and send it to every other worker.
+
+        Messages published while a peer is reconnecting reach local clients only.
+        """
+        self.counters['published'] += 1
+        if self.handler:
+            self.handler(topic, message, key)
+        frame = (json.dumps([topic, message, key], separators=(',', ':')) + '\n').encode('utf-8')
+        if self.role == 'hub':
+            for peer in list(self._peers):
+                self._send(peer, frame)
+        elif self._hub is not None:
+            self._send(self._hub, frame)
+
+    async def close(self) -> None:
+        """Leave the bus, releasing the hub role if held."""
+        self._closed = True
+        if self._task:
+            self._task.cancel()
+        if self._hub is not None:
+            self._hub.close()
+        if self._server is not None:
+            self._server.close()
+            for peer in list(self._peers):
+                peer.close()
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': 'unix', 'role': self.role, 'path': self.path, 'peers': len(self._peers), **self.counters}
+
+
+def create_bus(backend: str = BUS_BACKEND):
+    """Return the bus for a backend name.
+
+    Raises:
+        ValueError: If the backend is unknown
+    """
+    if backend == 'local':
+        return InProcessBus()
+    if backend == 'unix':
+        return UnixSocketBus()
+    raise ValueError(f'Unknown bus backend: {backend}')
@@ -0,0 +1,197 @@
+import base64
+import json
+import logging
+import os
+import re
+import struct
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Iterator, Tuple
+
+"""
+Opt-in capture of inbound WebSocket traffic for deterministic replay.
+
+With ``IHUB_RECORD=1`` every /ws-vad and /ws-video session is recorded;
+with ``IHUB_RECORD=query`` only those opened with ``?record=1``. Each
+connection writes one file to ``IHUB_RECORD_DIR`` named
+``<time>-<session>-<endpoint>.ihrec``, where the session comes from the
+``?session=`` query parameter when the client sends one, so the audio and
+video sockets of one client can be replayed together.
+
+File format (little-endian):
+
+    b'IHREC' version:u8  meta_length:u32  meta:json
+    then per message:  offset:f64  kind:u8  length:u32  payload
+
+``offset`` is seconds since the connection opened, taken when the handler
+read the message. Audio payloads are the sample rate (u32) followed by the
+raw int16 PCM, video payloads the JPEG bytes, both stored decoded, which is
+a quarter smaller than their base64 JSON. Any other message is stored as
+its JSON text. ``bench.replay`` feeds recordings back to a server.
+"""
+
+# 'off', '1' to record every session, or 'query' for sessions opened with ?record=1
+RECORD = os.environ.get('IHUB_RECORD', 'off')
+
+# Directory recordings are written to
+RECORD_DIR = os.environ.get('IHUB_RECORD_DIR', os.path.join(os.path.dirname(__file__), 'recordings'))
+
+# Recording of a session stops once its file reaches this size
+RECORD_MAX_BYTES = int(os.environ.get('IHUB_RECORD_MAX_BYTES', str(256 * 1024 * 1024)))
+
+MAGIC = b'IHREC'
+VERSION = 1
+RECORD_HEADER = struct.Struct('<dBI')
+U32 = struct.Struct('<I')
+
+AUDIO = 1
+TEXT = 2
+VIDEO = 3
+
+_SESSION_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+logger = logging.getLogger('ihub.recorder')
+
+
+class SessionRecorder:
+    """Appends one connection's inbound messages to a recording file."""
+
+    def __init__(self, path: str, endpoint: str, session: str, max_bytes: int = RECORD_MAX_BYTES):
+        """Create the file and write its header.
+
+        Args:
+            path: File to create
+            endpoint: WebSocket path being recorded, e.g. '/ws-vad'
+            session: Session ID shared by a client's connections
+            max_bytes: Size at which recording stops
+        """
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.started = time.monotonic()
+        self.messages = 0
+        self.truncated = False
+        meta = {
+            'endpoint': endpoint,
+            'session': session,
+            'started': time.time(),
+            'started_at': datetime.now(timezone.utc).isoformat(),
+        }
+        encoded = json.dumps(meta).encode('utf-8')
+        self._file = open(path, 'wb', buffering=256 * 1024)
+        self._file.write(MAGIC + bytes((VERSION,)) + U32.pack(len(encoded)) + encoded)
+        self.size = self._file.tell()
+
+    def _write(self, kind: int, *parts: bytes) -> None:
+        if self._file is None:
+            return
+        length = sum(len(p) for p in parts)
+        if self.size + RECORD_HEADER.size + length > self.max_bytes:
+            if not self.truncated:
+                self.truncated = True
+                logger.warning('Recording %s reached %d bytes; later messages are not recorded', self.path, self.max_bytes)
+            return
+        self._file.write(RECORD_HEADER.pack(time.monotonic() - self.started, kind, length))
+        for part in parts:
+            self._file.write(part)
+        self.size += RECORD_HEADER.size + length
+        self.messages += 1
+
+    def audio(self, sample_rate: int, pcm: bytes) -> None:
+        """Record an audio chunk as raw int16 PCM."""
+        self._write(AUDIO, U32.pack(sample_rate), pcm)
+
+    def video(self, jpeg: bytes) -> None:
+        """Record a video frame as JPEG bytes."""
+        self._write(VIDEO, jpeg)
+
+    def text(self, message: str) -> None:
+        """Record any other message verbatim."""
+        self._write(TEXT, message.encode('utf-8'))
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def open_recording(websocket, endpoint: str) -> Optional[SessionRecorder]:
+    """Start recording a connection if recording is enabled for it.
+
+    Args:
+        websocket: Accepted connection; its query string may carry 'record' and 'session'
+        endpoint: WebSocket path being recorded
+
+    Returns:
+        Recorder for the connection, or None when it is not recorded
+    """
+    if RECORD in ('', '0', 'off'):
+        return None
+    params = websocket.query_params
+    if RECORD == 'query' and params.get('record') not in ('1', 'true'):
+        return None
+    session = params.get('session', '')
+    if not _SESSION_ID.match(session):
+        session = uuid.uuid4().hex[:12]
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S')
+    name = f"{stamp}-{session}-{endpoint.strip('/').replace('/', '_')}.ihrec"
+    try:
+        return SessionRecorder(os.path.join(RECORD_DIR, name), endpoint, session)
+    except OSError as e:
+        logger.warning('Cannot record session %s: %s', session, e)
+        return None
+
+
+def read_recording(path: str) -> Tuple[Dict[str, Any], Iterator[Tuple[float, int, bytes]]]:
+    """Open a recording.
+
+    Returns:
+        The header metadata, and an iterator of (offset, kind, payload).
+        A message cut short by a crash ends the iteration.
+
+    Raises:
+        ValueError: If the file is not a recording or has an unknown version
+    """
+    f = open(path, 'rb')
+    head = f.read(len(MAGIC) + 1 + U32.size)
+    if len(head) < len(MAGIC) + 1 + U32.size or not head.startswith(MAGIC):
+        f.close()
+        raise ValueError(f'Not a session recording: {path}')
+    if head[len(MAGIC)] != VERSION:
+        f.close()
+        raise ValueError(f'Unsupported recording version {head[len(MAGIC)]}: {path}')
+    (meta_length,) = U32.unpack_from(head, len(MAGIC) + 1)
+    meta = json.loads(f.read(meta_length).decode('utf-8'))
+
+    def messages() -> Iterator[Tuple[float, int, bytes]]:
+        with f:
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    return
+                offset, kind, length = RECORD_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    return
+                yield offset, kind, payload
+
+    return meta, messages()
+
+
+def to_message(kind: int, payload: bytes) -> str:
+    """Rebuild the client message a recorded payload came from.
+
+    Raises:
+        ValueError: If the kind is unknown
+    """
+    if kind == AUDIO:
+        (sample_rate,) = U32.unpack_from(payload)
+        pcm = payload[U32.size:]
+        return json.dumps({'type': 'audio', 'sampleRate': sample_rate, 'data': base64.b64encode(pcm).decode()})
+    if kind == VIDEO:
+        return json.dumps({'type': 'video_frame', 'data': base64.b64encode(payload).decode()})
+    if kind == TEXT:
+        return payload.decode('utf-8')
+    raise ValueError(f'Unknown recorded message kind: {kind}')
@@ -0,0 +1,480 @@
+import asyncio
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Dict, List, Any, Set, Tuple
+from urllib.parse import quote
+
+try:
+    from database import db, DEFAULT_DIR, DatabaseManager, ai_response_dict, decode_audio_segments
+except Exception:
+    try:
+        from backend.database import db, DEFAULT_DIR, DatabaseManager, ai_response_dict, decode_audio_segments
+    except Exception:
+        from .database import db, DEFAULT_DIR, DatabaseManager, ai_response_dict, decode_audio_segments
+
+try:
+    from cache_manager import audio_cache, CacheManager
+except Exception:
+    try:
+        from backend.cache_manager import audio_cache, CacheManager
+    except Exception:
+        from .cache_manager import audio_cache, CacheManager
+
+"""
+Retention and archival for the conversation database.
+
+Off unless ``IHUB_RETENTION_DAYS`` is set. Rows older than ``RETENTION_DAYS`` are moved, in small batches, from the live
+database into monthly archive files (``archive-YYYY-MM.db``) with the same
+schema. Audio that was only referenced by archived rows is removed from the
+cache, and the pages freed in the live database are returned to the OS with
+``incremental_vacuum`` a slice at a time, so no step holds the write lock for
+long. Deletes and vacuum slices go through the database writer thread.
+
+Databases created before retention existed have ``auto_vacuum`` off, so
+archiving frees pages inside the file but never shrinks it; progress then
+reports the vacuum as unavailable. ``POST /admin/retention/vacuum``, or
+
+    python -m retention migrate-vacuum
+
+(with the server stopped), switches such a database to incremental
+auto_vacuum with a one-off ``VACUUM``. That rewrites the whole file and
+holds the write lock while it runs.
+
+Archives stay queryable: ``open_history`` attaches them read-only next to
+the live database and ``query_history`` reads across all of them.
+"""
+
+# Age after which rows are archived, in days; 0 (the default) disables retention
+RETENTION_DAYS = float(os.environ.get('IHUB_RETENTION_DAYS', '0'))
+
+ARCHIVE_DIR = os.environ.get('IHUB_ARCHIVE_DIR', os.path.join(DEFAULT_DIR, 'archive'))
+
+# Seconds between retention runs
+RETENTION_INTERVAL = float(os.environ.get('IHUB_RETENTION_INTERVAL', '3600'))
+
+# Rows moved per transaction
+ARCHIVE_BATCH = int(os.environ.get('IHUB_ARCHIVE_BATCH', '500'))
+
+# Audio IDs checked per reference query when removing orphans
+ORPHAN_LOOKUP_BATCH = 400
+
+# Pages freed per incremental_vacuum slice, and the pause between slices
+VACUUM_PAGES = int(os.environ.get('IHUB_VACUUM_PAGES', '256'))
+SLICE_PAUSE = 0.05
+
+TABLES = ('messages', 'ai_responses')
+
+ARCHIVE_PREFIX = 'archive-'
+
+
+def archive_name(created_at: str) -> str:
+    """Return the archive filename for a row's ISO timestamp."""
+    return f'{ARCHIVE_PREFIX}{created_at[:7]}.db'
+
+
+def list_archives(directory: str = ARCHIVE_DIR) -> List[str]:
+    """Return archive file paths, oldest first."""
+    try:
+        names = sorted(n for n in os.listdir(directory) if n.startswith(ARCHIVE_PREFIX) and n.endswith('.db'))
+    except OSError:
+        return []
+    return [os.path.join(directory, n) for n in names]
+
+
+def _audio_ids(row: sqlite3.Row) -> List[str]:
+    """Return every audio ID a row references (all segments of a reply)."""
+    segments = row['audio_segments'] if 'audio_segments' in row.keys() else None
+    return decode_audio_segments(segments, row['audio_id'])
+
+
+def _columns(conn: sqlite3.Connection, table: str, schema: str = 'main') -> List[Tuple[str, str]]:
+    """Return the (name, type) of each column of a table."""
+    return [(r[1], r[2]) for r in conn.execute(f'PRAGMA {schema}.table_info({table})')]
+
+
+class RetentionManager:
+    """Moves old rows to archive databases and reclaims what they used."""
+
+    def __init__(
+        self,
+        database: DatabaseManager = db,
+        cache: CacheManager = audio_cache,
+        archive_dir: str = ARCHIVE_DIR,
+        max_age_days: float = RETENTION_DAYS,
+        audio_grace: float = RETENTION_INTERVAL
+    ):
+        """Initialize the manager.
+
+        Args:
+            database: Live database
+            cache: Audio cache holding files referenced by rows
+            archive_dir: Directory for archive files
+            max_age_days: Age after which rows are archived
+            audio_grace: Seconds since last use within which orphaned audio
+                is kept, so a cache hit whose reply is not yet stored keeps it
+        """
+        self.db = database
+        self.cache = cache
+        self.archive_dir = archive_dir
+        self.max_age_days = max_age_days
+        self.audio_grace = audio_grace
+        self._lock = asyncio.Lock()
+        self.progress: Dict[str, Any] = {
+            'state': 'idle',
+            'runs': 0,
+            'last_started': None,
+            'last_duration': None,
+            'last_error': None,
+            'cutoff': None,
+            'rows_archived': 0,
+            'run_rows_archived': 0,
+            'audio_removed': 0,
+            'audio_bytes_freed': 0,
+            'pages_vacuumed': 0,
+            'freelist_pages': None,
+            'auto_vacuum': None,
+            'vacuum': None,
+        }
+
+    def _schema(self, table: str) -> List[str]:
+        """Return the statements that create a table and its indexes (not its search triggers)."""
+        rows = self.db._reader().execute(
+            "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('table', 'index') "
+            "AND sql IS NOT NULL ORDER BY type DESC", (table,)
+        ).fetchall()
+        return [r[0].replace('CREATE TABLE ', 'CREATE TABLE IF NOT EXISTS ', 1)
+                    .replace('CREATE INDEX ', 'CREATE INDEX IF NOT EXISTS ', 1) for r in rows]
+
+    def _open_archive(self, name: str, opened: Dict[str, sqlite3.Connection]) -> sqlite3.Connection:
+        conn = opened.get(name)
+        if conn is None:
+            os.makedirs(self.archive_dir, exist_ok=True)
+            # batches of one run may execute on different worker threads
+            conn = sqlite3.connect(os.path.join(self.archive_dir, name), check_same_thread=False)
+            for table in TABLES:
+                for statement in self._schema(table):
+                    conn.execute(statement)
+                # archives created before a live column was added
+                present = {name for name, _ in _columns(conn, table)}
+                for name, kind in _columns(self.db._reader(), table):
+                    if name not in present:
+                        conn.execute(f'ALTER TABLE {table} ADD COLUMN {name} {kind}')
+            conn.commit()
+            opened[name] = conn
+        return conn
+
+    def archive_batch(self, table: str, cutoff: str, opened: Dict[str, sqlite3.Connection]) -> Tuple[int, Set[str]]:
+        """Move one batch of rows older than ``cutoff`` into archive files.
+
+        Rows are committed to their archive before they are deleted from the
+        live database, and inserted with ``OR IGNORE``, so an interrupted run
+        is simply repeated.
+
+        Returns:
+            Rows moved and the audio IDs they referenced
+
+        Raises:
+            RuntimeError: If reading, archiving or deleting fails
+        """
+        try:
+            rows = self.db._reader().execute(
+                f'SELECT * FROM {table} WHERE created_at < ? ORDER BY created_at, id LIMIT ?',
+                (cutoff, ARCHIVE_BATCH)
+            ).fetchall()
+            if not rows:
+                return 0, set()
+            columns = rows[0].keys()
+            insert = (f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) "
+                      f"VALUES ({', '.join('?' * len(columns))})")
+            groups: Dict[str, List[tuple]] = {}
+            for row in rows:
+                groups.setdefault(archive_name(row['created_at']), []).append(tuple(row))
+            for name, values in groups.items():
+                conn = self._open_archive(name, opened)
+                conn.executemany(insert, values)
+                conn.commit()
+        except sqlite3.Error as e:
+            raise RuntimeError(f'Failed to archive {table}: {e}')
+
+        ids = [row['id'] for row in rows]
+        self.db.submit_write(
+            lambda conn: conn.execute(f"DELETE FROM {table} WHERE id IN ({', '.join('?' * len(ids))})", ids).rowcount
+        ).result()
+        audio = {a for row in rows for a in _audio_ids(row)}
+        return len(rows), audio
+
+    def remove_orphans(self, candidates: Set[str]) -> Tuple[int, int]:
+        """Delete cached audio referenced by archived rows but by no live row.
+
+        Only the candidate IDs are looked up. Entries used or written within
+        ``audio_grace`` seconds are kept: the TTS result cache may have just
+        handed one to a turn that has not stored its reply yet.
+
+        Returns:
+            Entries removed and bytes freed
+        """
+        if not candidates:
+            return 0, 0
+        reader = self.db._reader()
+        referenced = set()
+        ids = list(candidates)
+        for i in range(0, len(ids), ORPHAN_LOOKUP_BATCH):
+            chunk = ids[i:i + ORPHAN_LOOKUP_BATCH]
+            marks = ', '.join('?' * len(chunk))
+            referenced.update(r[0] for r in reader.execute(
+                f'SELECT audio_id FROM messages WHERE audio_id IN ({marks}) '
+                f'UNION SELECT audio_id FROM audio_refs WHERE audio_id IN ({marks})', chunk * 2
+            ))
+        unused_since = time.time() - self.audio_grace
+        removed, freed = 0, 0
+        for eid in candidates - referenced:
+            size = self.cache.remove(eid, unused_since)
+            if size:
+                removed += 1
+                freed += size
+        return removed, freed
+
+    def _vacuum_state(self) -> Tuple[int, int]:
+        """Return the auto_vacuum mode and the free page count."""
+        reader = self.db._reader()
+        return (reader.execute('PRAGMA auto_vacuum').fetchone()[0],
+                reader.execute('PRAGMA freelist_count').fetchone()[0])
+
+    def _vacuum_slice(self) -> int:
+        """Free up to ``VACUUM_PAGES`` pages; return the free pages left."""
+        def job(conn):
+            # sqlite3 steps a row-less PRAGMA only once, and each step frees one page
+            for _ in range(VACUUM_PAGES):
+                conn.execute('PRAGMA incremental_vacuum(1)')
+            return conn.execute('PRAGMA freelist_count').fetchone()[0]
+
+        return self.db.submit_write(job).result()
+
+    @property
+    def running(self) -> bool:
+        """Return whether a retention run or vacuum migration is in progress."""
+        return self._lock.locked()
+
+    @property
+    def enabled(self) -> bool:
+        """Return whether a maximum age is configured."""
+        return self.max_age_days > 0
+
+    def migrate_vacuum(self) -> Dict[str, Any]:
+        """Switch the live database to incremental auto_vacuum with a full VACUUM.
+
+        Returns:
+            The auto_vacuum mode and file size before and after
+
+        Raises:
+            RuntimeError: If the VACUUM fails
+        """
+        def job(conn):
+            before = conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+            if before != 2:
+                conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                conn.execute('VACUUM')
+                # in WAL mode the rewritten pages reach the file at a checkpoint
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            return before, conn.execute('PRAGMA auto_vacuum').fetchone()[0]
+
+        size_before = os.path.getsize(self.db.path)
+        before, after = self.db.submit_exclusive(job).result()
+        modes = {0: 'none', 1: 'full', 2: 'incremental'}
+        return {
+            'auto_vacuum_before': modes.get(before, before),
+            'auto_vacuum': modes.get(after, after),
+            'bytes_before': size_before,
+            'bytes_after': os.path.getsize(self.db.path),
+        }
+
+    async def run_migrate_vacuum(self) -> Dict[str, Any]:
+        """Run ``migrate_vacuum`` unless a retention run is in progress.
+
+        Raises:
+            RuntimeError: If retention is running or the VACUUM fails
+        """
+        if self.running:
+            raise RuntimeError('Retention is running; try again when it is idle')
+        async with self._lock:
+            self.progress['state'] = 'migrating_vacuum'
+            try:
+                result = await asyncio.to_thread(self.migrate_vacuum)
+            finally:
+                self.progress['state'] = 'idle'
+            self.progress['auto_vacuum'] = result['auto_vacuum']
+            self.progress['vacuum'] = 'incremental'
+            return result
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Archive expired rows, drop orphaned audio and vacuum, reporting progress.
+
+        Does nothing while retention is disabled.
+
+        Returns:
+            The progress counters after the run
+        """
+        if not self.enabled or self.running:
+            return self.progress
+        async with self._lock:
+            progress = self.progress
+            started = time.monotonic()
+            progress.update(state='archiving', last_started=datetime.utcnow().isoformat() + 'Z',
+                            last_error=None, run_rows_archived=0)
+            cutoff = (datetime.utcnow() - timedelta(days=self.max_age_days)).isoformat() + 'Z'
+            progress['cutoff'] = cutoff
+            opened: Dict[str, sqlite3.Connection] = {}
+            try:
+                orphans: Set[str] = set()
+                for table in TABLES:
+                    while True:
+                        moved, audio = await asyncio.to_thread(self.archive_batch, table, cutoff, opened)
+                        if not moved:
+                            break
+                        orphans |= audio
+                        progress['rows_archived'] += moved
+                        progress['run_rows_archived'] += moved
+                        # let live traffic in between batches
+                        await asyncio.sleep(0)
+
+                progress['state'] = 'removing_audio'
+                removed, freed = await asyncio.to_thread(self.remove_orphans, orphans)
+                progress['audio_removed'] += removed
+                progress['audio_bytes_freed'] += freed
+
+                progress['state'] = 'vacuuming'
+                mode, free = await asyncio.to_thread(self._vacuum_state)
+                progress['auto_vacuum'] = {0: 'none', 1: 'full', 2: 'incremental'}.get(mode, mode)
+                if mode == 2:
+                    progress['vacuum'] = 'incremental'
+                elif mode == 1:
+                    progress['vacuum'] = 'automatic'
+                else:
+                    # freed pages stay in the file until migrate_vacuum switches the mode
+                    progress['vacuum'] = 'unavailable: auto_vacuum is off, run POST /admin/retention/vacuum'
+                while mode == 2 and free > 0:
+                    left = await asyncio.to_thread(self._vacuum_slice)
+                    progress['pages_vacuumed'] += free - left
+                    free = left
+                    await asyncio.sleep(SLICE_PAUSE)
+                progress['freelist_pages'] = free
+            except Exception as e:
+                progress['last_error'] = str(e)
+            finally:
+                for conn in opened.values():
+                    conn.close()
+                progress['runs'] += 1
+                progress['state'] = 'idle'
+                progress['last_duration'] = time.monotonic() - started
+            return progress
+
+    async def run_scheduler(self, interval: float = RETENTION_INTERVAL) -> None:
+        """Run retention every ``interval`` seconds until cancelled."""
+        while True:
+            await self.run_once()
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return progress counters, settings and archive files."""
+        return {
+            **self.progress,
+            'enabled': self.enabled,
+            'max_age_days': self.max_age_days,
+            'archives': [os.path.basename(p) for p in list_archives(self.archive_dir)],
+        }
+
+
+def open_history(database: DatabaseManager = db, archive_dir: str = ARCHIVE_DIR) -> Tuple[sqlite3.Connection, List[str]]:
+    """Open the live database read-only with the archives attached, newest first.
+
+    SQLite caps attached databases (10 by default), so only the most recent
+    archives are attached when there are more.
+
+    Returns:
+        Connection and the schema names to query, starting with 'main'
+
+    Raises:
+        RuntimeError: If the databases cannot be opened
+    """
+    try:
+        conn = sqlite3.connect(f'file:{quote(database.path)}?mode=ro', uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        schemas = ['main']
+        limit = conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) if hasattr(conn, 'getlimit') else 10
+        for path in reversed(list_archives(archive_dir)[-limit:]):
+            schema = 'a_' + os.path.basename(path)[len(ARCHIVE_PREFIX):-3].replace('-', '_')
+            conn.execute('ATTACH DATABASE ? AS ' + schema, (f'file:{quote(path)}?mode=ro',))
+            schemas.append(schema)
+        return conn, schemas
+    except sqlite3.Error as e:
+        raise RuntimeError(f'Failed to open history databases: {e}')
+
+
+def query_history(
+    table: str,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: int = 100,
+    database: DatabaseManager = db,
+    archive_dir: str = ARCHIVE_DIR
+) -> List[Dict[str, Any]]:
+    """Return rows of a table from the live database and every attached archive.
+
+    Args:
+        table: 'messages' or 'ai_responses'
+        since: Only rows created at or after this ISO timestamp
+        until: Only rows created before this ISO timestamp
+        limit: Maximum rows, newest first
+
+    Returns:
+        Row dictionaries, with timelines and audio segments decoded
+
+    Raises:
+        ValueError: If the table is unknown
+        RuntimeError: If the query fails
+    """
+    if table not in TABLES:
+        raise ValueError(f'Unknown table: {table}')
+    conn, schemas = open_history(database, archive_dir)
+    try:
+        where, args = [], []
+        if since:
+            where.append('created_at >= ?')
+            args.append(since)
+        if until:
+            where.append('created_at < ?')
+            args.append(until)
+        clause = ('WHERE ' + ' AND '.join(where)) if where else ''
+        # select the live columns by name; older archives may lack some of them
+        columns = [name for name, _ in _columns(conn, table)]
+        selects = []
+        for schema in schemas:
+            present = {name for name, _ in _columns(conn, table, schema)}
+            fields = ', '.join(c if c in present else f'NULL AS {c}' for c in columns)
+            selects.append(f'SELECT {fields} FROM {schema}.{table} {clause}')
+        rows = conn.execute(' UNION ALL '.join(selects) + ' ORDER BY created_at DESC, id DESC LIMIT ?',
+                            args * len(schemas) + [limit])
+        results = [ai_response_dict(r) if table == 'ai_responses' else dict(r) for r in rows]
+    except sqlite3.Error as e:
+        raise RuntimeError(f'Failed to query history: {e}')
+    finally:
+        conn.close()
+    return results
+
+
+retention = RetentionManager()
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Conversation database retention')
+    parser.add_argument('command', choices=['run', 'migrate-vacuum'])
+    args = parser.parse_args()
+    if args.command == 'migrate-vacuum':
+        print(json.dumps(retention.migrate_vacuum(), indent=2))
+    else:
+        print(json.dumps(asyncio.run(retention.run_once()), indent=2))
@@ -0,0 +1,154 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from pipeline import tts
+
+"""
+TTS client against the local IndexTTS stand-in (``tools.fake_indextts``).
+
+Covers the voice-reference upload cache: uploads are reused, an upload the
+remote has forgotten is uploaded again once and the job retried, and each
+voice reference gets its own entry. Also covers reconnecting to an event
+stream that drops mid-body.
+"""
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture(scope='module')
+def stand_in():
+    """Run the stand-in on a free port for the module's tests."""
+    port = _free_port()
+    base = f'http://127.0.0.1:{port}'
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'tools.fake_indextts:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=BACKEND_DIR,
+    )
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                httpx.get(f'{base}/_control/counters', timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    pytest.fail('TTS stand-in did not start')
+                time.sleep(0.2)
+        yield base
+    finally:
+        process.terminate()
+        process.wait(10)
+
+
+@pytest.fixture
+def base(stand_in, monkeypatch):
+    """Point the TTS client at the stand-in with a fresh upload cache and counters."""
+    httpx.post(f'{stand_in}/_control/reset').raise_for_status()
+    monkeypatch.setattr(tts, 'BASE', stand_in)
+    monkeypatch.setattr(tts, 'UPLOAD_URL', f'{stand_in}/gradio_api/upload?upload_id=python_upload')
+    monkeypatch.setattr(tts, 'QUEUE_URL', f'{stand_in}/gradio_api/queue/join?__theme=system')
+    monkeypatch.setattr(tts, 'DATA_URL_TEMPLATE', f'{stand_in}/gradio_api/queue/data?session_hash={{session_hash}}')
+    monkeypatch.setattr(tts, 'voice_cache', tts.VoiceReferenceCache())
+    return stand_in
+
+
+@pytest.fixture
+def voices(tmp_path):
+    """Two voice references with different contents."""
+    paths = []
+    for i in range(2):
+        path = tmp_path / f'voice_{i}.mp3'
+        path.write_bytes(bytes([i]) * 2048)
+        paths.append(str(path))
+    return paths
+
+
+def counters(base: str) -> dict:
+    return httpx.get(f'{base}/_control/counters').json()
+
+
+def synthesize(texts_and_voices, cache_dir: str, before_each=None) -> list:
+    """Synthesize each (text, voice) in turn with one client; return the filenames."""
+    async def run():
+        client = tts.AsyncTTSClient()
+        try:
+            results = []
+            for i, (text, voice) in enumerate(texts_and_voices):
+                if before_each is not None:
+                    await before_each(i)
+                results.append(await client.synthesize(text, cache_dir, voice, timeout=20))
+            return results
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_second_synthesis_reuses_upload(base, voices, tmp_path):
+    files = synthesize([('hello there', voices[0]), ('how are you', voices[0])], str(tmp_path))
+
+    assert all(os.path.exists(tmp_path / name) for name in files)
+    c = counters(base)
+    assert c['upload'] == 1
+    assert c['join'] == 2
+
+
+def test_expired_upload_is_uploaded_again_once(base, voices, tmp_path):
+    async def expire_before_second(i):
+        if i == 1:
+            async with httpx.AsyncClient() as http:
+                (await http.post(f'{base}/_control/expire_uploads')).raise_for_status()
+
+    files = synthesize([('hello there', voices[0]), ('how are you', voices[0])], str(tmp_path), expire_before_second)
+
+    assert os.path.exists(tmp_path / files[1])
+    c = counters(base)
+    # the cached upload is rejected once, uploaded again and the job retried
+    assert c['rejected'] == 1
+    assert c['upload'] == 2
+    assert c['join'] == 3
+
+
+def test_voice_references_have_separate_entries(base, voices, tmp_path):
+    synthesize([('hello there', voices[0]), ('hello there', voices[1]), ('again', voices[1])], str(tmp_path))
+
+    assert counters(base)['upload'] == 2
+    digests = [tts.voice_cache.content_hash(v) for v in voices]
+    assert digests[0] != digests[1]
+    entries = [tts.voice_cache.get(d) for d in digests]
+    assert all(entries)
+    assert entries[0]['path'] != entries[1]['path']
+
+
+def test_dropped_event_stream_reconnects(base, voices, tmp_path, monkeypatch):
+    monkeypatch.setattr(tts, 'STREAM_RECONNECT_DELAY', 0.01)
+    httpx.post(f'{base}/_control/faults', json={'drop_streams': 1}).raise_for_status()
+
+    files = synthesize([('hello there', voices[0])], str(tmp_path))
+
+    assert os.path.exists(tmp_path / files[0])
+    c = counters(base)
+    assert c['join'] == 1
+    assert c['data'] == 2
+
+
+def test_stream_drops_past_reconnects_fail(base, voices, tmp_path, monkeypatch):
+    monkeypatch.setattr(tts, 'STREAM_RECONNECT_DELAY', 0.01)
+    httpx.post(f'{base}/_control/faults', json={'drop_streams': tts.STREAM_RECONNECTS + 1}).raise_for_status()
+
+    with pytest.raises(RuntimeError, match='after .* attempts'):
+        synthesize([('hello there', voices[0])], str(tmp_path))
+    assert counters(base)['data'] == tts.STREAM_RECONNECTS + 1
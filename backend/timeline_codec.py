@@ -0,0 +1,159 @@
+import json
+import struct
+import zlib
+from typing import Optional, List, Dict, Any, Union
+
+"""
+Compact storage encoding for animation timelines.
+
+Timelines repeat the same trigger and expression names in every row, so
+names are stored as one-byte indexes into a fixed dictionary, and times and
+speeds as packed doubles. Layout (little-endian):
+
+    header   version:u8 flags:u8
+    body     events:u16 extras:u8 {len:u8 name}*extras
+             {time:f64 speed:f64 n_expr:u8 n_trig:u8 index:u8*(n_expr+n_trig)}*events
+
+Names missing from the dictionary are listed once in ``extras`` and indexed
+after it. The body is zlib-compressed when that makes it smaller
+(``FLAG_ZLIB``). Timelines that do not fit this shape are stored as JSON
+text, which is also how rows written before this format are read.
+"""
+
+TIMELINE_VERSION = 1
+FLAG_ZLIB = 0x01
+
+# Append-only: stored rows refer to names by position
+NAMES = (
+    # triggers
+    'madtrigger', 'embarrassedtrigger', 'headnodtrigger', 'confusedtrigger',
+    'disappointedtrigger', 'happytrigger', 'winktrigger', 'happyagreetrigger',
+    'lightmadtrigger', 'sadtiredtrigger', 'sadtrigger', 'happynotrigger',
+    'bothertrigger', 'shaketrigger',
+    # expressions
+    'Angry.exp3', 'f01.exp3', 'Normal.exp3', 'f02.exp3', 'Smile.exp3',
+    'Blushing.exp3', 'Surprised.exp3', 'Sad.exp3',
+)
+_NAME_INDEX = {name: i for i, name in enumerate(NAMES)}
+
+EVENT_KEYS = frozenset(('time', 'expressions', 'triggers', 'trigger_speed'))
+
+_HEADER = struct.Struct('<BB')
+_COUNTS = struct.Struct('<HB')
+_EVENT = struct.Struct('<ddBB')
+
+
+def _pack(timeline: Any) -> Optional[bytes]:
+    """Pack a timeline into the binary body, or None if it does not fit the format."""
+    if not isinstance(timeline, list) or len(timeline) > 0xFFFF:
+        return None
+    extras: List[str] = []
+    extra_index: Dict[str, int] = {}
+    body = bytearray()
+    for event in timeline:
+        if not isinstance(event, dict) or event.keys() != EVENT_KEYS:
+            return None
+        time, speed = event['time'], event['trigger_speed']
+        names = event['expressions'], event['triggers']
+        # only floats round-trip exactly through f64
+        if type(time) is not float or type(speed) is not float:
+            return None
+        if not all(isinstance(group, list) and len(group) <= 0xFF for group in names):
+            return None
+        body += _EVENT.pack(time, speed, len(names[0]), len(names[1]))
+        for name in names[0] + names[1]:
+            if not isinstance(name, str):
+                return None
+            index = _NAME_INDEX.get(name)
+            if index is None:
+                index = extra_index.get(name)
+                if index is None:
+                    index = extra_index[name] = len(NAMES) + len(extras)
+                    extras.append(name)
+            if index > 0xFF:
+                return None
+            body.append(index)
+
+    head = bytearray(_COUNTS.pack(len(timeline), len(extras)))
+    for name in extras:
+        raw = name.encode('utf-8')
+        if len(raw) > 0xFF:
+            return None
+        head.append(len(raw))
+        head += raw
+    return bytes(head + body)
+
+
+def _unpack(body: bytes) -> List[Dict[str, Any]]:
+    """Inverse of ``_pack``."""
+    count, n_extras = _COUNTS.unpack_from(body, 0)
+    offset = _COUNTS.size
+    names = list(NAMES)
+    for _ in range(n_extras):
+        size = body[offset]
+        names.append(body[offset + 1:offset + 1 + size].decode('utf-8'))
+        offset += 1 + size
+
+    timeline = []
+    for _ in range(count):
+        time, speed, n_expr, n_trig = _EVENT.unpack_from(body, offset)
+        offset += _EVENT.size
+        indexes = body[offset:offset + n_expr + n_trig]
+        offset += n_expr + n_trig
+        timeline.append({
+            'time': time,
+            'expressions': [names[i] for i in indexes[:n_expr]],
+            'triggers': [names[i] for i in indexes[n_expr:]],
+            'trigger_speed': speed,
+        })
+    return timeline
+
+
+def encode_timeline(timeline: Optional[List[Dict[str, Any]]]) -> Union[bytes, str, None]:
+    """Encode a timeline for the ``ai_responses.timeline`` column.
+
+    Args:
+        timeline: List of timeline events, or None
+
+    Returns:
+        Versioned binary blob, JSON text for timelines outside the compact
+        format, or None
+    """
+    if timeline is None:
+        return None
+    body = _pack(timeline)
+    if body is None:
+        return json.dumps(timeline)
+    flags = 0
+    compressed = zlib.compress(body, 6)
+    if len(compressed) < len(body):
+        body, flags = compressed, FLAG_ZLIB
+    return _HEADER.pack(TIMELINE_VERSION, flags) + body
+
+
+def decode_timeline(value: Union[bytes, str, None]) -> Optional[List[Dict[str, Any]]]:
+    """Decode a stored timeline, compact or legacy JSON.
+
+    Args:
+        value: Column value as returned by SQLite
+
+    Returns:
+        List of timeline events, or None if empty or unreadable
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return None
+    try:
+        version, flags = _HEADER.unpack_from(value, 0)
+        if version != TIMELINE_VERSION:
+            return None
+        body = bytes(value[_HEADER.size:])
+        if flags & FLAG_ZLIB:
+            body = zlib.decompress(body)
+        return _unpack(body)
+    except (struct.error, zlib.error, IndexError, UnicodeDecodeError):
+        return None
@@ -0,0 +1 @@
+# Development tools and local stand-ins
@@ -0,0 +1,192 @@
+import asyncio
+import hashlib
+import io
+import json
+import math
+import os
+import random
+import struct
+import time
+import uuid
+import wave
+from typing import Dict, Any, Optional
+
+from fastapi import FastAPI, Request, UploadFile, File
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+try:
+    from tools.latency import parse_latency
+except ImportError:
+    from .latency import parse_latency
+
+"""
+Local stand-in for the IndexTTS Gradio space.
+
+Implements just enough of the Gradio queue API used by ``pipeline.tts``
+(upload, queue/join, queue/data SSE stream and file download) to exercise
+the TTS client without network access. Point the backend at it with
+``IHUB_TTS_BASE=http://127.0.0.1:7860`` and run:
+
+    uvicorn tools.fake_indextts:app --port 7860
+
+Control endpoints under ``/_control`` let a test expire uploads (to
+simulate the space restarting), inject latency and errors, and read request
+counters.
+
+``IHUB_FAKE_TTS_LATENCY`` (or ``/_control/latency``) sets the synthesis
+time as a distribution, e.g. ``lognormal:1.5,0.5`` (see ``tools.latency``);
+it replaces the fixed latency and jitter faults.
+"""
+
+app = FastAPI(title="IndexTTS stand-in")
+
+SAMPLE_RATE = 16000
+
+state: Dict[str, Any] = {
+    'uploads': {},       # upload path -> bytes
+    'jobs': {},          # session_hash -> job payload
+    'files': {},         # result path -> wav bytes
+    'counters': {'upload': 0, 'join': 0, 'data': 0, 'file': 0, 'rejected': 0, 'failed': 0},
+    # latency: fixed seconds before completion, jitter: extra uniform seconds,
+    # error_rate: share of joins answered with HTTP 500,
+    # fail_rate: share of jobs completed with success=false,
+    # drop_streams: number of upcoming data streams cut off before the result
+    'faults': {'latency': 0.0, 'jitter': 0.0, 'error_rate': 0.0, 'fail_rate': 0.0, 'drop_streams': 0.0},
+    # synthesis time distribution; overrides latency and jitter when set
+    'latency_spec': os.environ.get('IHUB_FAKE_TTS_LATENCY', ''),
+}
+state['sample_latency'] = parse_latency(state['latency_spec']) if state['latency_spec'] else None
+
+
+def _sine_wav(text: str, seconds: Optional[float] = None) -> bytes:
+    """Render a short deterministic tone whose length follows the text length."""
+    seconds = seconds or min(4.0, 0.25 + 0.04 * len(text))
+    freq = 200 + int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:2], 16)
+    n = int(SAMPLE_RATE * seconds)
+    frames = b''.join(
+        struct.pack('<h', int(12000 * math.sin(2 * math.pi * freq * i / SAMPLE_RATE)))
+        for i in range(n)
+    )
+    buf = io.BytesIO()
+    with wave.open(buf, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(frames)
+    return buf.getvalue()
+
+
+@app.post('/gradio_api/upload')
+async def upload(files: UploadFile = File(...)):
+    state['counters']['upload'] += 1
+    data = await files.read()
+    path = f"/tmp/gradio/{hashlib.sha256(data).hexdigest()[:16]}/{uuid.uuid4().hex[:6]}/{files.filename}"
+    state['uploads'][path] = data
+    return [path]
+
+
+@app.post('/gradio_api/queue/join')
+async def queue_join(request: Request):
+    state['counters']['join'] += 1
+    if random.random() < state['faults']['error_rate']:
+        return JSONResponse({'detail': 'Injected error'}, status_code=500)
+    payload = await request.json()
+    file_info = payload['data'][1]
+    if file_info and file_info.get('path') not in state['uploads']:
+        state['counters']['rejected'] += 1
+        return JSONResponse({'detail': 'File not found'}, status_code=404)
+    event_id = uuid.uuid4().hex
+    state['jobs'][payload['session_hash']] = {'event_id': event_id, 'text': payload['data'][2]}
+    return {'event_id': event_id}
+
+
+@app.get('/gradio_api/queue/data')
+async def queue_data(session_hash: str, request: Request):
+    state['counters']['data'] += 1
+    faults = state['faults']
+    drop = faults['drop_streams'] >= 1
+    if drop:
+        faults['drop_streams'] -= 1
+    # a dropped stream leaves the job queued for the client's next connection
+    job = state['jobs'].get(session_hash) if drop else state['jobs'].pop(session_hash, None)
+    base = str(request.base_url).rstrip('/')
+
+    async def events():
+        if job is None:
+            yield 'data: ' + json.dumps({'msg': 'close_stream'}) + '\n\n'
+            return
+        if drop:
+            yield 'data: ' + json.dumps({'msg': 'estimation', 'event_id': job['event_id'], 'rank': 0}) + '\n\n'
+            # abort the response mid-body, like a dropped connection
+            raise ConnectionResetError('Injected stream drop')
+        yield 'data: ' + json.dumps({'msg': 'estimation', 'event_id': job['event_id'], 'rank': 0}) + '\n\n'
+        yield 'data: ' + json.dumps({'msg': 'process_starts', 'event_id': job['event_id']}) + '\n\n'
+        sample = state['sample_latency']
+        await asyncio.sleep(sample() if sample else faults['latency'] + random.random() * faults['jitter'])
+        if random.random() < faults['fail_rate']:
+            state['counters']['failed'] += 1
+            yield 'data: ' + json.dumps({'msg': 'process_completed', 'event_id': job['event_id'],
+                                         'output': {'error': 'Injected failure'}, 'success': False}) + '\n\n'
+            return
+        path = f"/tmp/gradio/out/{uuid.uuid4().hex}.wav"
+        state['files'][path] = _sine_wav(job['text'])
+        output = {'data': [{'value': {'path': path, 'url': f"{base}/gradio_api/file={path}"}}]}
+        yield 'data: ' + json.dumps({'msg': 'process_completed', 'event_id': job['event_id'],
+                                     'output': output, 'success': True}) + '\n\n'
+        yield 'data: ' + json.dumps({'msg': 'close_stream'}) + '\n\n'
+
+    return StreamingResponse(events(), media_type='text/event-stream')
+
+
+@app.get('/gradio_api/file={path:path}')
+async def get_file(path: str):
+    state['counters']['file'] += 1
+    data = state['files'].get(path)
+    if data is None:
+        return JSONResponse({'detail': 'File not found'}, status_code=404)
+    return Response(data, media_type='audio/wav')
+
+
+@app.post('/_control/expire_uploads')
+async def expire_uploads():
+    """Forget every upload, as the real space does when it restarts."""
+    state['uploads'].clear()
+    return {'ok': True}
+
+
+@app.post('/_control/faults')
+async def set_faults(request: Request):
+    """Update injected latency and error rates; omitted keys keep their value."""
+    update = await request.json()
+    for key in state['faults']:
+        if key in update:
+            state['faults'][key] = float(update[key])
+    return state['faults']
+
+
+@app.post('/_control/latency')
+async def set_latency(request: Request):
+    """Set the synthesis time distribution; an empty spec restores the fixed faults."""
+    spec = (await request.json()).get('spec', '')
+    try:
+        state['sample_latency'] = parse_latency(spec) if spec else None
+    except ValueError as e:
+        return JSONResponse({'detail': str(e)}, status_code=400)
+    state['latency_spec'] = spec
+    return {'spec': spec}
+
+
+@app.get('/_control/counters')
+async def counters():
+    return state['counters']
+
+
+@app.post('/_control/reset')
+async def reset():
+    for key in ('uploads', 'jobs', 'files'):
+        state[key].clear()
+    for key in state['counters']:
+        state['counters'][key] = 0
+    for key in state['faults']:
+        state['faults'][key] = 0.0
+    return {'ok': True, 'time': time.time()}
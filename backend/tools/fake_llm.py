@@ -0,0 +1,103 @@
+import os
+import random
+import threading
+import time
+from typing import Optional, Dict, Any
+
+try:
+    from tools.latency import parse_latency
+except ImportError:
+    from .latency import parse_latency
+
+"""
+Offline stand-in for the Gemini response generator.
+
+``FakeLLM`` has the same ``generate`` interface as ``pipeline.llm.LLM`` and
+returns well-formed replies (text boxes plus an animation timeline) after a
+latency drawn from ``IHUB_FAKE_LLM_LATENCY`` (see ``tools.latency``). Reply
+text varies from turn to turn, so TTS is not served from its result cache
+more than real traffic would be. Select it with ``IHUB_LLM_BACKEND=fake``.
+"""
+
+# Distribution of the time a reply takes, e.g. 'lognormal:0.8,0.4'
+LATENCY = os.environ.get('IHUB_FAKE_LLM_LATENCY', 'lognormal:0.8,0.4')
+
+# Share of calls that fail, exercising the fallback path and circuit breaker
+ERROR_RATE = float(os.environ.get('IHUB_FAKE_LLM_ERROR_RATE', '0'))
+
+# Most text boxes per reply; each reply has between one and this many
+MAX_BOXES = int(os.environ.get('IHUB_FAKE_LLM_MAX_BOXES', '3'))
+
+# Seed for reproducible replies and latencies; unset draws a fresh sequence per process
+SEED = int(os.environ['IHUB_FAKE_LLM_SEED']) if os.environ.get('IHUB_FAKE_LLM_SEED') else None
+
+TRIGGERS = ('headnodtrigger', 'happytrigger', 'confusedtrigger', 'winktrigger', 'happyagreetrigger')
+EXPRESSIONS = ('Normal.exp3', 'Smile.exp3', 'Surprised.exp3', 'Blushing.exp3')
+PHRASES = (
+    'That sounds interesting', 'Tell me more about it', 'I was thinking the same',
+    'Really, is that so', 'Let us try something new', 'I like where this is going',
+)
+
+
+class FakeLLM:
+    """Canned replies with realistic timing."""
+
+    def __init__(self, latency: str = LATENCY, error_rate: float = ERROR_RATE, seed: Optional[int] = SEED):
+        """Initialize the stand-in.
+
+        Args:
+            latency: Latency distribution spec
+            error_rate: Share of calls that fail
+            seed: Seed for reproducible latencies and replies
+        """
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._sample = parse_latency(latency, self._rng)
+        self.error_rate = error_rate
+        self.calls = 0
+
+    def generate(
+        self,
+        user_input: str,
+        user_expression: Optional[str] = None,
+        raise_errors: bool = False
+    ) -> Dict[str, Any]:
+        """Return a reply shaped like ``LLM.generate`` after a sampled delay.
+
+        Raises:
+            RuntimeError: If the call is chosen to fail and raise_errors is set
+        """
+        with self._lock:
+            self.calls += 1
+            turn = self.calls
+            delay = self._sample()
+            failed = self._rng.random() < self.error_rate
+            count = self._rng.randint(1, max(1, MAX_BOXES))
+            phrases = [self._rng.choice(PHRASES) for _ in range(count)]
+        time.sleep(delay)
+        if failed:
+            if raise_errors:
+                raise RuntimeError('LLM generation failed: injected failure')
+            try:
+                from pipeline.llm import fallback_response
+            except ImportError:
+                from ..pipeline.llm import fallback_response
+            return fallback_response()
+
+        ai_text, timeline, at = [], [], 0.0
+        for i, phrase in enumerate(phrases):
+            text = f'{phrase} ({turn}.{i})'
+            duration = round(0.6 + 0.06 * len(text), 2)
+            ai_text.append({'text': text, 'duration': duration, 'pos': i % 4, 'type': i % 4})
+            timeline.append({
+                'time': round(at, 2),
+                'expressions': [EXPRESSIONS[(turn + i) % len(EXPRESSIONS)]],
+                'triggers': [TRIGGERS[(turn + i) % len(TRIGGERS)]],
+                'trigger_speed': 1.0,
+            })
+            at += duration
+        return {
+            'ai_text': ai_text,
+            'timeline': timeline,
+            'text': ' '.join(box['text'] for box in ai_text),
+        }
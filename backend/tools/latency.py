@@ -0,0 +1,72 @@
+import math
+import random
+from typing import Callable, Optional
+
+"""
+Latency distributions for the offline stand-ins.
+
+A distribution is written as ``kind:params`` (seconds), so it fits in an
+environment variable:
+
+- ``0.5`` or ``fixed:0.5``
+- ``uniform:0.2,1.5``
+- ``normal:0.8,0.2`` (mean, standard deviation)
+- ``lognormal:0.8,0.5`` (median, sigma; long right tail like real APIs)
+- ``exp:0.5`` (mean)
+
+Samples are never negative.
+"""
+
+
+def parse_latency(spec: str, rng: Optional[random.Random] = None) -> Callable[[], float]:
+    """Return a function drawing latencies from the distribution ``spec``.
+
+    Args:
+        spec: Distribution in the format described above; empty means zero
+        rng: Random generator to draw from; defaults to the module's
+
+    Raises:
+        ValueError: If the spec is malformed or names an unknown distribution
+    """
+    rng = rng or random.Random()
+    spec = (spec or '').strip()
+    if not spec:
+        return lambda: 0.0
+    kind, _, params = spec.partition(':')
+    if not params:
+        kind, params = 'fixed', kind
+    try:
+        args = [float(x) for x in params.split(',')]
+    except ValueError:
+        raise ValueError(f'Invalid latency spec: {spec}')
+
+    def need(count: int) -> None:
+        if len(args) != count:
+            raise ValueError(f'{kind} latency takes {count} parameter(s): {spec}')
+
+    if kind == 'fixed':
+        need(1)
+        value = max(0.0, args[0])
+        return lambda: value
+    if kind == 'uniform':
+        need(2)
+        low, high = args
+        return lambda: max(0.0, rng.uniform(low, high))
+    if kind == 'normal':
+        need(2)
+        mean, stddev = args
+        return lambda: max(0.0, rng.gauss(mean, stddev))
+    if kind == 'lognormal':
+        need(2)
+        median, sigma = args
+        if median <= 0:
+            raise ValueError(f'lognormal median must be positive: {spec}')
+        mu = math.log(median)
+        return lambda: rng.lognormvariate(mu, sigma)
+    if kind == 'exp':
+        need(1)
+        if args[0] <= 0:
+            raise ValueError(f'exp mean must be positive: {spec}')
+        rate = 1.0 / args[0]
+        return lambda: rng.expovariate(rate)
+    raise ValueError(f'Unknown latency distribution: {kind}')
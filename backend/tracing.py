@@ -0,0 +1,84 @@
+import contextvars
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional, Dict, Iterator
+
+try:
+    from metrics import stage_seconds
+except ImportError:
+    from .metrics import stage_seconds
+
+"""
+Per-turn trace IDs.
+
+A turn runs inside a ``Trace`` held in a context variable, so tasks created
+during the turn and ``asyncio.to_thread`` calls (STT, LLM) see it without
+it being passed around. Stage timings are recorded both in the stage
+histograms of ``metrics`` and on the trace, and the trace ID and timings
+are sent to the client with the turn's events.
+"""
+
+_current: contextvars.ContextVar = contextvars.ContextVar('ihub_trace', default=None)
+
+
+class Trace:
+    """One turn: its ID and the seconds spent in each stage."""
+
+    __slots__ = ('id', 'started', 'timings')
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.id = trace_id or uuid.uuid4().hex[:16]
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        # stages that run more than once per turn (TTS per text box) add up
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+
+def current_trace() -> Optional[Trace]:
+    """Return the trace of the running turn, if any."""
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    """Return the ID of the running turn's trace, if any."""
+    trace = _current.get()
+    return trace.id if trace is not None else None
+
+
+@contextmanager
+def start_trace(trace_id: Optional[str] = None) -> Iterator[Trace]:
+    """Run the enclosed block as a new turn.
+
+    Args:
+        trace_id: ID to use, e.g. one supplied by the client; generated if omitted
+
+    Yields:
+        The new trace
+    """
+    trace = Trace(trace_id)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        _current.reset(token)
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record a stage duration in the stage histogram and the current trace."""
+    stage_seconds.labels(stage).observe(seconds)
+    trace = _current.get()
+    if trace is not None:
+        trace.record(stage, seconds)
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """Record the time spent in the enclosed block as ``stage``."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started)
@@ -5,18 +5,40 @@ import numpy as np
 import time
 import torch
 from pipeline.pipeline import Pipeline
+from pipeline.scheduler import turn_scheduler, TurnRejected
 from database import db
+from metrics import sessions, audio_frames, vad_frame_seconds
+from tracing import current_trace_id
+from recorder import open_recording
 import os
 import uuid
 import video_ws
 
+# Close code for sessions refused while the server is saturated ("try again later")
+CLOSE_SATURATED = 1013
+
 def register_vad(app, manager=None):
+    vad_sessions = sessions.labels('vad')
+
     @app.websocket("/ws-vad")
     async def websocket_vad(websocket: WebSocket):
         await websocket.accept()
 
+        if not turn_scheduler.open_session():
+            # Refuse before loading any model; the client may retry later
+            try:
+                await websocket.send_text(json.dumps({'event': 'busy', 'reason': 'saturated'}))
+                await websocket.close(code=CLOSE_SATURATED)
+            except Exception:
+                pass
+            return
+
         device = torch.device("cpu")
-        pipeline = Pipeline(device=device)
+        try:
+            pipeline = Pipeline(device=device)
+        except Exception:
+            turn_scheduler.close_session()
+            raise
 
         speaking = False
         speech_start = 0.0
@@ -28,6 +50,25 @@ def register_vad(app, manager=None):
         audio_buffer = []
         response_mode = 'audio'  # Track current response mode for audio input
 
+        async def send_audio_segment(segment):
+            # Deliver each synthesized text box as soon as it is ready
+            try:
+                await websocket.send_text(json.dumps({'event': 'audio_segment', 'responseMode': 'audio', **segment}))
+            except Exception:
+                pass
+
+        async def send_queued(position, waiting):
+            # Tell the client its turn is waiting for a slot and where it stands
+            await websocket.send_text(json.dumps({'event': 'queued', 'position': position, 'waiting': waiting, 'trace_id': current_trace_id()}))
+
+        async def send_rejected(error):
+            try:
+                await websocket.send_text(json.dumps({'event': 'turn_rejected', 'reason': error.reason}))
+            except Exception:
+                pass
+
+        recorder = open_recording(websocket, '/ws-vad')
+        vad_sessions.inc()
         try:
             while True:
                 try:
@@ -38,17 +79,20 @@ def register_vad(app, manager=None):
                 try:
                     payload = json.loads(msg)
                     if payload.get("type") == "text":
+                        if recorder:
+                            recorder.text(msg)
                         user_text = payload.get('text', '')
                         response_mode = payload.get('responseMode', 'audio')  # Update current response mode
                         user_expression = video_ws.current_user_expression
                         try:
-                            result = pipeline.handle_input(audio_frames=[], user_text=user_text, response_mode=response_mode, user_expression=user_expression)
+                            result = await pipeline.ahandle_input(audio_frames=[], user_text=user_text, response_mode=response_mode, user_expression=user_expression, on_audio_segment=send_audio_segment, on_queued=send_queued)
                             # send user_message event
                             try:
                                 user_ev = {
                                     'event': 'user_message',
                                     'text': user_text or result.get('user_text') or '',
                                     'created_at': (result.get('user_row') or {}).get('created_at') if result.get('user_row') else None,
+                                    'trace_id': result.get('trace_id'),
                                 }
                                 await websocket.send_text(json.dumps(user_ev))
                             except Exception:
@@ -60,13 +104,21 @@ def register_vad(app, manager=None):
                                     'response': ' '.join([item['text'] for item in result.get('ai_text', [])]) if isinstance(result.get('ai_text'), list) else '',
                                     'timeline': result.get('timeline'),
                                     'audio_id': result.get('audio_id'),
+                                    'audio_segments': result.get('audio_segments'),
+                                    'lipsync': result.get('lipsync'),
+                                    'time_to_first_audio': result.get('time_to_first_audio'),
                                     'text': result.get('ai_text'),
-                                    'responseMode': response_mode,
+                                    'responseMode': result.get('response_mode', response_mode),
+                                    'degraded': result.get('degraded'),
+                                    'trace_id': result.get('trace_id'),
+                                    'timings': result.get('timings'),
                                     'created_at': (result.get('ai_row') or {}).get('created_at') if result.get('ai_row') else None,
                                 }
                                 await websocket.send_text(json.dumps(ai_payload))
                             except Exception:
                                 pass
+                        except TurnRejected as e:
+                            await send_rejected(e)
                         except Exception:
                             pass
                         continue
@@ -78,7 +130,10 @@ def register_vad(app, manager=None):
                     if not b64:
                         continue
 
+                    frame_started = time.perf_counter()
                     raw = base64.b64decode(b64)
+                    if recorder:
+                        recorder.audio(sr_rate, raw)
                     pcm = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
                     audio_buffer.append(pcm)
 
@@ -91,6 +146,8 @@ def register_vad(app, manager=None):
                         speech_frames = 0
 
                     is_speech = speech_frames >= SPEECH_THRESHOLD
+                    vad_frame_seconds.observe(time.perf_counter() - frame_started)
+                    audio_frames.inc()
 
                     if is_speech:
                         if not speaking:
@@ -99,7 +156,7 @@ def register_vad(app, manager=None):
                             await websocket.send_text(json.dumps({"event": "speech_started"}))
                             # Broadcast to all general /ws connections so all frontend components can react
                             if manager:
-                                await manager.broadcast(json.dumps({"event": "speech_started"}))
+                                await manager.broadcast({"event": "speech_started"}, topic="speech")
                         silence_frames = 0
                     else:
                         if speaking and silence_frames >= SILENCE_THRESHOLD:
@@ -110,13 +167,14 @@ def register_vad(app, manager=None):
                             # Concatenate audio and create user message record
                             user_expression = video_ws.current_user_expression
                             try:
-                                result = pipeline.handle_input(audio_frames=audio_buffer, user_text=None, response_mode=response_mode, user_expression=user_expression)
+                                result = await pipeline.ahandle_input(audio_frames=audio_buffer, user_text=None, response_mode=response_mode, user_expression=user_expression, on_audio_segment=send_audio_segment, on_queued=send_queued)
                                 # send user_message event
                                 try:
                                     user_ev = {
                                             'event': 'user_message',
                                             'text': (result.get('user_row') or {}).get('text') if result.get('user_row') else (result.get('user_text') or ''),
                                             'created_at': (result.get('user_row') or {}).get('created_at') if result.get('user_row') else None,
+                                            'trace_id': result.get('trace_id'),
                                         }
                                     await websocket.send_text(json.dumps(user_ev))
                                 except Exception:
@@ -128,14 +186,22 @@ def register_vad(app, manager=None):
                                         'response': ' '.join([item['text'] for item in result.get('ai_text', [])]) if isinstance(result.get('ai_text'), list) else '',
                                         'timeline': result.get('timeline'),
                                         'audio_id': result.get('audio_id'),
+                                        'audio_segments': result.get('audio_segments'),
+                                        'lipsync': result.get('lipsync'),
+                                        'time_to_first_audio': result.get('time_to_first_audio'),
                                         'text': result.get('ai_text'),
-                                        'responseMode': 'audio',
+                                        'responseMode': result.get('response_mode', 'audio'),
+                                        'degraded': result.get('degraded'),
+                                        'trace_id': result.get('trace_id'),
+                                        'timings': result.get('timings'),
                                         'duration': duration,
                                         'created_at': (result.get('ai_row') or {}).get('created_at') if result.get('ai_row') else None,
                                     }
                                     await websocket.send_text(json.dumps(ai_payload))
                                 except Exception:
                                     pass
+                            except TurnRejected as e:
+                                await send_rejected(e)
                             except Exception:
                                 pass
 
@@ -146,4 +212,7 @@ def register_vad(app, manager=None):
                 except Exception:
                     continue
         finally:
-            pass
+            vad_sessions.dec()
+            turn_scheduler.close_session()
+            if recorder:
+                recorder.close()
@@ -14,12 +14,16 @@ import io
 import asyncio
 from PIL import Image
 from load_model import load_emotion_model, detect_emotion
+from metrics import sessions, video_frames, stage_seconds
+from recorder import open_recording
 
 # Global state for tracking current user expression
 current_user_expression = None
 
 def register_video(app):
     """Register video streaming WebSocket endpoint with keep-alive support"""
+    video_sessions = sessions.labels('video')
+    emotion_seconds = stage_seconds.labels('emotion')
     
     @app.websocket("/ws-video")
     async def websocket_video(websocket: WebSocket):
@@ -30,6 +34,8 @@ def register_video(app):
         except Exception:
             return
         
+        video_sessions.inc()
+
         # Load emotion model once per connection
         try:
             model, processor = load_emotion_model()
@@ -38,9 +44,11 @@ def register_video(app):
                 await websocket.send_text(json.dumps({"error": "Failed to load emotion model"}))
             except:
                 pass
+            video_sessions.dec()
             await websocket.close()
             return
         
+        recorder = open_recording(websocket, '/ws-video')
         frame_count = 0
         start_time = time.time()
         last_activity = time.time()
@@ -111,16 +119,20 @@ def register_video(app):
                     
                     if payload.get("type") == "video_frame":
                         frame_count += 1
+                        video_frames.inc()
                         
                         try:
                             # Decode base64 image
                             image_data = base64.b64decode(payload.get('data', ''))
+                            if recorder:
+                                recorder.video(image_data)
                             image = Image.open(io.BytesIO(image_data)).convert('RGB')
                             
                             # Run emotion detection on frame
                             if model is not None and processor is not None:
                                 try:
-                                    result = detect_emotion(image, model, processor)
+                                    with emotion_seconds.time():
+                                        result = detect_emotion(image, model, processor)
                                     current_user_expression = result.get('label')
                                     await websocket.send_text(json.dumps({
                                         "status": f"Processing frame {frame_count}",
@@ -161,7 +173,10 @@ def register_video(app):
         finally:
             connection_active = False
             current_user_expression = None
+            video_sessions.dec()
             monitor_task.cancel()
+            if recorder:
+                recorder.close()
             try:
                 await websocket.close()
             except:
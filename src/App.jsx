@@ -6,7 +6,7 @@ import TopChat from './components/TopChat';
 import WSClient from './ws';
 import { BACKEND_API_WS, BACKEND_API } from './constants';
 import { executeAnimationTimeline } from './api_unity/anim_controller';
-import { playBlobWithUnity } from './utils/audioPipeline';
+import { playBlobWithUnity, audioAcceptHeader } from './utils/audioPipeline';
 import { setTextBox, ClearText } from './api_unity/index';
 
 function App() {
@@ -35,21 +35,52 @@ function App() {
     const pipelineUrl = `${base}/ws-vad`;
     const pipelineClient = new WSClient(pipelineUrl);
     pipelineClient.connect();
+    // audio segments play back-to-back in arrival (= text box) order
+    let segmentQueue = Promise.resolve();
     const offPipeline = pipelineClient.onMessage((m) => {
       let d = m;
       try { d = JSON.parse(m); } catch { /* ignore parse errors */ }
       try {
+        if (d && d.event === 'audio_segment' && d.audio_id) {
+          // start downloading right away, play once the previous segment has finished
+          const audioUrl = `${BACKEND_API}/audio/${encodeURIComponent(d.audio_id)}`;
+          const pending = fetch(audioUrl, { headers: { Accept: audioAcceptHeader() } }).then((resp) => (resp.ok ? resp.blob() : null)).catch(() => null);
+          segmentQueue = segmentQueue.then(async () => {
+            const blob = await pending;
+            if (!blob) return;
+            const res = await playBlobWithUnity(blob, { latencyMs: 120, lipsync: d.lipsync });
+            // the first delivered segment carries the timeline and text boxes
+            if (d.timeline || d.ai_text) {
+              if (d.timeline) {
+                executeAnimationTimeline(d.timeline, { startAt: res.plannedStart }).catch(() => {
+                  // Ignore timeline errors
+                });
+              }
+              if (d.ai_text && Array.isArray(d.ai_text)) {
+                setTextBox(d.ai_text);
+              }
+            }
+            const ctx = window.__globalAudioContext;
+            const remaining = ctx ? res.plannedStart - ctx.currentTime + res.duration : res.duration;
+            await new Promise((r) => setTimeout(r, Math.max(0, remaining * 1000)));
+          }).catch(() => {
+            // Ignore segment playback errors
+          });
+        }
         if (d && d.event === 'ai_response') {
+          // Segmented replies were already played, animated and shown as their audio arrived
+          if (d.responseMode === 'audio' && Array.isArray(d.audio_segments) && d.audio_segments.length) return;
           (async () => {
             let plannedStart;
             // Only fetch and play audio if responseMode is 'audio'
             if (d.responseMode === 'audio' && d.audio_id) {
               const audioUrl = `${BACKEND_API}/audio/${encodeURIComponent(d.audio_id)}`;
               try {
-                const resp = await fetch(audioUrl);
+                const resp = await fetch(audioUrl, { headers: { Accept: audioAcceptHeader() } });
                 if (resp.ok) {
                   const blob = await resp.blob();
-                  const res = await playBlobWithUnity(blob, { latencyMs: 120 });
+                  const lipsync = Array.isArray(d.lipsync) ? d.lipsync[0] : null;
+                  const res = await playBlobWithUnity(blob, { latencyMs: 120, lipsync });
                   plannedStart = res.plannedStart;
                 }
               } catch { 
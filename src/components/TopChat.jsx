@@ -1,6 +1,7 @@
 import React, { useEffect, useState, useRef } from 'react';
 import { FiPlay, FiVolume2, FiMessageSquare } from 'react-icons/fi';
 import { BACKEND_API } from '../constants';
+import { audioAcceptHeader } from '../utils/audioPipeline';
 
 export default function TopChat({ wsClient, responseMode, onResponseModeChange }) {
   const [items, setItems] = useState([]);
@@ -24,7 +25,7 @@ export default function TopChat({ wsClient, responseMode, onResponseModeChange }
         if (!mounted) return;
         let list = (data.items || []).map((it, idx) => {
           if (it.type === 'message') return { id: it.id, text: it.text, created_at: it.created_at, _uid: `user-${it.id ?? 'x'}-${it.created_at ?? ''}-${idx}` };
-          return { id: it.id, text: it.text, audio_id: it.audio_id, timeline: it.timeline, created_at: it.created_at, _uid: `ai-${it.id ?? 'x'}-${it.created_at ?? ''}-${idx}` };
+          return { id: it.id, text: it.text, ai: true, audio_id: it.audio_id, audio_segments: it.audio_segments, created_at: it.created_at, _uid: `ai-${it.id ?? 'x'}-${it.created_at ?? ''}-${idx}` };
         });
         // sort oldest -> newest by created_at
         list = list.sort((a, b) => (a.created_at || '') > (b.created_at || '') ? 1 : -1);
@@ -46,7 +47,7 @@ export default function TopChat({ wsClient, responseMode, onResponseModeChange }
       let data = msg;
       try { data = JSON.parse(msg); } catch { /* ignore parse errors */ }
       if (data && data.event === 'ai_response') {
-        const item = { text: data.response, timeline: data.timeline, audio_id: data.audio_id, created_at: data.created_at || new Date().toISOString(), _uid: makeUid('ai') };
+        const item = { text: data.response, ai: true, timeline: data.timeline, audio_id: data.audio_id, audio_segments: data.audio_segments, created_at: data.created_at || new Date().toISOString(), _uid: makeUid('ai') };
         setItems((s) => [...s, item]);
       }
       if (data && data.event === 'user_message') {
@@ -67,10 +68,18 @@ export default function TopChat({ wsClient, responseMode, onResponseModeChange }
     }, 50);
   }, [items]);
 
-  const playAudio = async (audioId) => {
+  // a reply synthesized in segments lists them in audio_segments, in playback order
+  const playAudio = async (item) => {
+    const segments = item.audio_segments && item.audio_segments.length ? item.audio_segments : [item.audio_id];
+    for (const audioId of segments) {
+      if (audioId) await playSegment(audioId);
+    }
+  };
+
+  const playSegment = async (audioId) => {
     try {
       const url = `${BACKEND_API}/audio/${encodeURIComponent(audioId)}`;
-      const resp = await fetch(url);
+      const resp = await fetch(url, { headers: { Accept: audioAcceptHeader() } });
       if (!resp.ok) throw new Error('Failed to fetch audio');
       const arrayBuffer = await resp.arrayBuffer();
       const AudioCtx = window.__globalAudioContext || (window.AudioContext || window.webkitAudioContext);
@@ -88,6 +97,8 @@ export default function TopChat({ wsClient, responseMode, onResponseModeChange }
         // fallback to immediate start
         try { src.start(0); } catch { /* ignore audio start error */ }
       }
+      // resolve when this segment finishes so the next one follows it
+      await new Promise((r) => { src.onended = r; });
     } catch {
       // Failed to play audio - error will be silently ignored
     }
@@ -123,8 +134,8 @@ export default function TopChat({ wsClient, responseMode, onResponseModeChange }
         {loading && <div className="text-xs text-white/60">Loading...</div>}
         {items.length === 0 && !loading && <div className="text-xs text-white/60">No messages yet</div>}
   {items.map((it) => {
-          // consider it an AI message if it has a timeline or audio_id
-          const isAI = !!(it.timeline || it.audio_id);
+          // AI items are marked when they are added; history comes without timelines
+          const isAI = !!it.ai;
           // strip trailing ' (ai reply)' if present
           const displayText = typeof it.text === 'string' ? it.text.replace(/\s*\(ai reply\)\s*$/i, '') : it.text;
           const time = it.created_at ? new Date(it.created_at) : null;
@@ -137,7 +148,7 @@ export default function TopChat({ wsClient, responseMode, onResponseModeChange }
               </div>
               <div className="text-white text-sm">{displayText}</div>
               {it.audio_id && (
-                <button onClick={() => playAudio(it.audio_id)} className="mt-2 text-xs text-blue-200 flex items-center gap-2">
+                <button onClick={() => playAudio(it)} className="mt-2 text-xs text-blue-200 flex items-center gap-2">
                   <FiPlay className="w-4 h-4" />
                   <span>Play</span>
                 </button>
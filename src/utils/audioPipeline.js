@@ -1,7 +1,21 @@
 import { sendAudioBuffer, playVoice, updateMouthVolume, waitForUnityReady } from '../api_unity/index';
 
+// Accept header for /audio requests: ask for the compact Opus variant when the browser can decode it
+export function audioAcceptHeader() {
+  try {
+    if (new Audio().canPlayType('audio/ogg; codecs="opus"')) {
+      return 'audio/ogg, audio/wav;q=0.8, */*;q=0.5';
+    }
+  } catch {
+    // Ignore capability probe errors
+  }
+  return '*/*';
+}
+
 export async function playBlobWithUnity(blob, opts = {}) {
-  const { latencyMs = 120, frameMs = 50, maxAttempts = 4 } = opts;
+  // opts.lipsync: precomputed { frame_ms, envelope } track sent by the backend
+  const { latencyMs = 120, maxAttempts = 4, lipsync = null } = opts;
+  let { frameMs = 50 } = opts;
 
   const AudioCtx = window.AudioContext || window.webkitAudioContext;
   const audioCtx = new AudioCtx();
@@ -31,19 +45,26 @@ export async function playBlobWithUnity(blob, opts = {}) {
   const samples = decoded.getChannelData(0);
   const sr = decoded.sampleRate;
 
-  // compute simple RMS envelope
-  const frameSize = Math.max(1, Math.floor(sr * (frameMs / 1000)));
-  const envelope = [];
-  let maxRms = 0;
-  for (let i = 0; i < samples.length; i += frameSize) {
-    let sum = 0;
-    const end = Math.min(i + frameSize, samples.length);
-    for (let j = i; j < end; j++) sum += samples[j] * samples[j];
-    const rms = Math.sqrt(sum / (end - i));
-    envelope.push(rms);
-    if (rms > maxRms) maxRms = rms;
+  let norm;
+  if (lipsync && Array.isArray(lipsync.envelope)) {
+    // use the server-computed envelope as is
+    norm = lipsync.envelope;
+    frameMs = lipsync.frame_ms || frameMs;
+  } else {
+    // compute simple RMS envelope
+    const frameSize = Math.max(1, Math.floor(sr * (frameMs / 1000)));
+    const envelope = [];
+    let maxRms = 0;
+    for (let i = 0; i < samples.length; i += frameSize) {
+      let sum = 0;
+      const end = Math.min(i + frameSize, samples.length);
+      for (let j = i; j < end; j++) sum += samples[j] * samples[j];
+      const rms = Math.sqrt(sum / (end - i));
+      envelope.push(rms);
+      if (rms > maxRms) maxRms = rms;
+    }
+    norm = envelope.map((v) => (maxRms > 0 ? v / maxRms : 0));
   }
-  const norm = envelope.map((v) => (maxRms > 0 ? v / maxRms : 0));
 
   const plannedStart = audioCtx.currentTime + Math.max(0, latencyMs) / 1000;
 
@@ -87,4 +108,5 @@ export async function playBlobWithUnity(blob, opts = {}) {
 
 export default {
   playBlobWithUnity,
+  audioAcceptHeader,
 };